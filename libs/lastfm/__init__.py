@@ -15,22 +15,64 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lastfm.album import Album
-from lastfm.api import Api
-from lastfm.artist import Artist
-from lastfm.error import LastfmError
-from lastfm.event import Event
-from lastfm.geo import Location, Country
-from lastfm.group import Group
-from lastfm.playlist import Playlist
-from lastfm.util import ObjectCache
-from lastfm.tag import Tag
-from lastfm.tasteometer import Tasteometer
-from lastfm.track import Track
-from lastfm.user import User
-from lastfm.venue import Venue
-from lastfm.shout import Shout
-
-__all__ = ['LastfmError', 'Api', 'Album', 'Artist', 'Event',
-           'Location', 'Country', 'Group', 'Playlist', 'Tag',
-           'Tasteometer', 'Track', 'User', 'Venue', 'ObjectCache']
\ No newline at end of file
+from types import ModuleType
+
+# where each public name lives. The modules are imported on the first access
+# to one of their names, so that importing the package stays cheap for the
+# programs which only use a few of them.
+_lazy = {
+    'Album': 'lastfm.album',
+    'Api': 'lastfm.api',
+    'ApiPool': 'lastfm.apipool',
+    'Artist': 'lastfm.artist',
+    'ArtistIndex': 'lastfm.recommend',
+    'LastfmError': 'lastfm.error',
+    'Event': 'lastfm.event',
+    'fill_many': 'lastfm.prefetch',
+    'EventIndex': 'lastfm.geoindex',
+    'Location': 'lastfm.geo',
+    'Country': 'lastfm.geo',
+    'CrawlCoordinator': 'lastfm.crawl',
+    'Group': 'lastfm.group',
+    'ListeningHistory': 'lastfm.history',
+    'Playlist': 'lastfm.playlist',
+    'ObjectCache': 'lastfm.util',
+    'Tag': 'lastfm.tag',
+    'TagCooccurrence': 'lastfm.tagmatrix',
+    'Tasteometer': 'lastfm.tasteometer',
+    'TasteIndex': 'lastfm.tasteometer',
+    'Track': 'lastfm.track',
+    'User': 'lastfm.user',
+    'Venue': 'lastfm.venue',
+    'Shout': 'lastfm.shout',
+    'UserSnapshot': 'lastfm.snapshot',
+    'RecentTracksSync': 'lastfm.sync',
+    'SearchIndex': 'lastfm.searchindex',
+    'WriteQueue': 'lastfm.writequeue',
+}
+
+__all__ = ['LastfmError', 'Api', 'ApiPool', 'Album', 'Artist', 'ArtistIndex', 'Event', 'EventIndex',
+           'Location', 'Country', 'CrawlCoordinator', 'fill_many', 'Group', 'ListeningHistory', 'Playlist', 'Tag', 'TagCooccurrence',
+           'Tasteometer', 'TasteIndex', 'Track', 'User', 'UserSnapshot', 'Venue', 'ObjectCache',
+           'RecentTracksSync', 'SearchIndex', 'WriteQueue']
+
+class _LazyModule(ModuleType):
+    """The lastfm package, importing the modules of the public names on first access"""
+    def __getattr__(self, name):
+        if name not in _lazy:
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+        value = getattr(__import__(_lazy[name], {}, {}, [name]), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_lazy))
+
+def _install():
+    module = _LazyModule(__name__, __doc__)
+    module.__dict__.update(sys.modules[__name__].__dict__)
+    # the replaced module is kept alive, as its globals are cleared when it is collected
+    module._module = sys.modules[__name__]
+    sys.modules[__name__] = module
+
+_install()
@@ -6,10 +6,10 @@ __version__ = "0.2"
 __license__ = "GNU Lesser General Public License"
 __package__ = "lastfm"
 
-from threading import Lock
+from threading import RLock
 from lastfm.util import Wormhole, logging
 from lastfm.decorators import cached_property, async_callback
-_lock = Lock()
+_lock = RLock()
 
 class Api(object):
     """The class representing the last.fm web services API."""
@@ -22,6 +22,25 @@ class Api(object):
     
     FETCH_INTERVAL = 1
     """The minimum interval between successive HTTP request, in seconds"""
+
+    ERROR_CACHE_TIMEOUTS = {
+        2: 3600, # invalid service
+        3: 3600, # invalid method
+        5: 3600, # invalid format
+        6: 600,  # invalid parameters, like an artist not found
+        7: 600,  # invalid resource
+        12: 600, # subscribers only
+    }
+    """File cache timeouts of the error responses, in seconds, by error code.
+    The responses with other errors are not cached."""
+
+    TRANSIENT_ERRORS = [8, 11, 16, 29]
+    """Codes of the errors expected to go away: operation failed, service
+    offline, temporary error and rate limit exceeded. They are never cached,
+    and the next requests are delayed, more after each consecutive one."""
+
+    MAX_BACKOFF = 60
+    """The longest delay after the transient errors, in seconds"""
     
     SEARCH_XMLNS = "http://a9.com/-/spec/opensearch/1.1/"
     
@@ -73,7 +92,10 @@ class Api(object):
         self._input_encoding = input_encoding
         self._no_cache = no_cache
         self._logfile = logfile
-        self._last_fetch_time = datetime.now()
+        self._rate_limiter = RateLimiter()
+        self._transient_errors = 0
+        self._backoff_until = 0
+        self._search_index = None
         
         if debug is not None:
             if debug in Api.DEBUG_LEVELS:
@@ -111,6 +133,15 @@ class Api(object):
         """
         self._secret = secret
 
+    def set_search_index(self, search_index = None):
+        """
+        Set the local index the search methods try before calling the web service.
+        
+        @param search_index: the index, or None to always search with the web service
+        @type search_index:  L{SearchIndex}
+        """
+        self._search_index = search_index
+
     @property
     def session_key(self):
         """
@@ -164,6 +195,17 @@ class Api(object):
         """
         self._cache = cache
 
+    def set_rate_limiter(self, rate_limiter):
+        """
+        Override the default rate limiter, which spaces out the requests made
+        by this process only. Pass a L{SharedRateLimiter} to share one request
+        budget between the processes using the same API key.
+
+        @param rate_limiter: an instance that supports the same API as the L{RateLimiter}
+        @type rate_limiter: L{RateLimiter}
+        """
+        self._rate_limiter = rate_limiter
+
     def set_urllib(self, urllib):
         """
         Override the default urllib implementation.
@@ -219,6 +261,8 @@ class Api(object):
         @see:            L{Album.get_info}
         @see:            L{async_callback}
         """
+        from lastfm.album import Album
+        from lastfm.artist import Artist
         if isinstance(artist, Artist):
             artist = artist.name
         return Album.get_info(self, artist, album, mbid)
@@ -241,6 +285,11 @@ class Api(object):
         @see:             L{Album.search}
         @see:             L{async_callback}
         """
+        from lastfm.album import Album
+        if self._search_index is not None:
+            found = self._search_index.lookup(Album, album, limit)
+            if found is not None:
+                return found
         return Album.search(self, search_item = album, limit = limit)
 
     @async_callback
@@ -264,6 +313,7 @@ class Api(object):
         @see:            L{Artist.get_info}
         @see:            L{async_callback}
         """
+        from lastfm.artist import Artist
         return Artist.get_info(self, artist, mbid)
     
     @async_callback
@@ -284,6 +334,11 @@ class Api(object):
         @see:             L{Artist.search}
         @see:             L{async_callback}
         """
+        from lastfm.artist import Artist
+        if self._search_index is not None:
+            found = self._search_index.lookup(Artist, artist, limit)
+            if found is not None:
+                return found
         return Artist.search(self, search_item = artist, limit = limit)
 
     @async_callback
@@ -304,6 +359,7 @@ class Api(object):
         @see:             L{Event.get_info}
         @see:             L{async_callback}
         """
+        from lastfm.event import Event
         return Event.get_info(self, event)
     
     @async_callback
@@ -321,6 +377,7 @@ class Api(object):
         
         @see:           L{async_callback}
         """
+        from lastfm.geo import Location
         return Location(self, city = city)
 
     @async_callback
@@ -338,6 +395,7 @@ class Api(object):
         
         @see:           L{async_callback}
         """
+        from lastfm.geo import Country
         return Country(self, name = name)
     
     @async_callback
@@ -355,6 +413,7 @@ class Api(object):
         
         @see:           L{async_callback}
         """
+        from lastfm.group import Group
         return Group(self, name = name)
 
     @async_callback
@@ -373,6 +432,7 @@ class Api(object):
         @see:           L{Playlist.fetch}
         @see:           L{async_callback}
         """
+        from lastfm.playlist import Playlist
         return Playlist.fetch(self, url)
     
     @async_callback
@@ -390,6 +450,7 @@ class Api(object):
         
         @see:           L{async_callback}
         """
+        from lastfm.tag import Tag
         return Tag(self, name = name)
 
     @async_callback
@@ -405,6 +466,7 @@ class Api(object):
         
         @see:           L{async_callback}
         """
+        from lastfm.tag import Tag
         return Tag.get_top_tags(self)
 
     @async_callback
@@ -425,6 +487,11 @@ class Api(object):
         @see:             L{Tag.search}
         @see:             L{async_callback}
         """
+        from lastfm.tag import Tag
+        if self._search_index is not None:
+            found = self._search_index.lookup(Tag, tag, limit)
+            if found is not None:
+                return found
         return Tag.search(self, search_item = tag, limit = limit)
 
     @async_callback
@@ -457,6 +524,7 @@ class Api(object):
         @see:            L{Tasteometer.compare}
         @see:            L{async_callback}
         """
+        from lastfm.tasteometer import Tasteometer
         return Tasteometer.compare(self, type1, type2, value1, value2, limit)
 
     @async_callback
@@ -486,6 +554,8 @@ class Api(object):
         @see:            L{Track.get_info}
         @see:            L{async_callback}
         """
+        from lastfm.artist import Artist
+        from lastfm.track import Track
         if isinstance(artist, Artist):
             artist = artist.name
         return Track.get_info(self, artist, track, mbid)
@@ -514,8 +584,14 @@ class Api(object):
         @see:             L{Track.search}
         @see:             L{async_callback}
         """
+        from lastfm.artist import Artist
+        from lastfm.track import Track
         if isinstance(artist, Artist):
             artist = artist.name
+        if self._search_index is not None:
+            found = self._search_index.lookup(Track, track, limit, artist = artist)
+            if found is not None:
+                return found
         return Track.search(self, search_item = track, limit = limit, artist = artist)
 
     @async_callback
@@ -536,6 +612,7 @@ class Api(object):
         @see:           L{User.get_info}
         @see:           L{async_callback}
         """
+        from lastfm.user import User
         return User.get_info(self, name = name)
 
     @async_callback
@@ -552,6 +629,7 @@ class Api(object):
         @see:        L{User.get_authenticated_user}
         @see:        L{async_callback}
         """
+        from lastfm.user import User
         if self.session_key is not None:
             return User.get_authenticated_user(self)
         else:
@@ -605,6 +683,7 @@ class Api(object):
         @see:             L{Venue.search}
         @see:             L{async_callback}
         """
+        from lastfm.venue import Venue
         return Venue.search(self, search_item = venue, limit = limit, country = country)
 
     @Wormhole.entrance('lfm-api-url')
@@ -665,16 +744,17 @@ class Api(object):
             keys.sort()
             return urllib.urlencode([(k, self._encode(parameters[k])) for k in keys if parameters[k] is not None])
 
+    @Wormhole.entrance('lfm-api-network')
     def _read_url_data(self, opener, url, data = None):
-        with _lock:
-            now = datetime.now()
-            delta = now - self._last_fetch_time
-            delta = delta.seconds + float(delta.microseconds)/1000000
-            if delta < Api.FETCH_INTERVAL:
-                time.sleep(Api.FETCH_INTERVAL - delta)
-            url_data = opener.open(url, data).read()
-            self._last_fetch_time = datetime.now()
-        return url_data
+        backoff = self._backoff_until - time.time()
+        if backoff > 0:
+            time.sleep(backoff)
+        # only the start time of the request is reserved, so requests
+        # start at most once per FETCH_INTERVAL but may overlap
+        delay = self._rate_limiter.reserve(Api.FETCH_INTERVAL)
+        if delay > 0:
+            time.sleep(delay)
+        return opener.open(url, data).read()
 
     @Wormhole.entrance('lfm-api-raw-data')
     def _fetch_url(self, url, parameters = None, no_cache = False):
@@ -685,36 +765,101 @@ class Api(object):
 
         # Open and return the URL immediately if we're not going to cache
         if no_cache or not self._cache or not self._cache_timeout:
-            try:
-                url_data = self._read_url_data(opener, url)
-            except urllib2.HTTPError, e:
-                url_data = e.read()
+            url_data, transient = self._read_response(opener, url)
         else:
             # Unique keys are a combination of the url and the username
             key = url.encode('utf-8')
 
-            # See if it has been cached before
-            last_cached = self._cache.GetCachedTime(key)
-
             # If the cached version is outdated then fetch another and store it
-            if not last_cached or time.time() >= last_cached + self._cache_timeout:
-                try:
-                    url_data = self._read_url_data(opener, url)
-                except urllib2.HTTPError, e:
-                    url_data = e.read()
-                self._cache.Set(key, url_data)
-            else:
-                url_data = self._cache.Get(key)
+            url_data = self._get_cached(key)
+            if url_data is None:
+                lock = getattr(self._cache, 'Lock', None)
+                if lock is None:
+                    url_data = self._refresh_cache(opener, url, key)
+                else:
+                    # only one of the threads or processes sharing the cache
+                    # fetches the url, the others use what it has stored
+                    with lock(key):
+                        url_data = self._get_cached(key)
+                        if url_data is None:
+                            url_data = self._refresh_cache(opener, url, key)
 
         # Always return the latest version
         return url_data
 
+    def _get_cached(self, key):
+        # the cached response, if it is fresh. Errors known to persist, like
+        # an artist not found, are kept for the timeout of their code.
+        last_cached = self._cache.GetCachedTime(key)
+        if not last_cached:
+            return None
+        age = time.time() - last_cached
+        if age >= self._cache_timeout:
+            return None
+        url_data = self._cache.Get(key)
+        code = Api._error_code(url_data)
+        if code is not None and age >= Api.ERROR_CACHE_TIMEOUTS.get(code, 0):
+            return None
+        return url_data
+
+    def _refresh_cache(self, opener, url, key):
+        url_data, transient = self._read_response(opener, url)
+        if transient:
+            # a stale response is better than a failure which will go away
+            stale = self._cache.Get(key)
+            if stale is not None and Api._error_code(stale) is None:
+                return stale
+            return url_data
+        code = Api._error_code(url_data)
+        if code is None or code in Api.ERROR_CACHE_TIMEOUTS:
+            self._cache.Set(key, url_data)
+        return url_data
+
+    def _read_response(self, opener, url):
+        # the response, and whether it is a transient failure
+        try:
+            url_data = self._read_url_data(opener, url)
+            code = Api._error_code(url_data)
+        except urllib2.HTTPError, e:
+            url_data = e.read()
+            code = Api._error_code(url_data)
+            if code is None:
+                # an error page not from the web service, like a proxy error
+                code = 16
+        with _lock:
+            if code in Api.TRANSIENT_ERRORS:
+                self._transient_errors += 1
+                self._backoff_until = time.time() + min(
+                    Api.MAX_BACKOFF, Api.FETCH_INTERVAL * 2 ** self._transient_errors)
+            else:
+                self._transient_errors = 0
+        return (url_data, code in Api.TRANSIENT_ERRORS)
+
+    @staticmethod
+    def _error_code(url_data):
+        # a failed response is small, its error code is found without parsing it
+        if not url_data or 'status="failed"' not in url_data[:200]:
+            return None
+        match = _ERROR_CODE.search(url_data)
+        return match and int(match.group(1)) or None
+
     @Wormhole.entrance('lfm-api-processed-data')
     def _fetch_data(self,
                    params,
                    sign = False,
                    session = False,
-                   no_cache = False):
+                   no_cache = False,
+                   stream = False):
+        xml = self._fetch_raw_data(params, sign, session, no_cache)
+        if stream:
+            return self._stream_xml(xml)
+        return self._check_xml(xml)
+
+    def _fetch_raw_data(self,
+                        params,
+                        sign = False,
+                        session = False,
+                        no_cache = False):
         params = params.copy()
         params['api_key'] = self.api_key
 
@@ -727,8 +872,7 @@ class Api(object):
         if sign:
             params['api_sig'] = self._get_api_sig(params)
 
-        xml = self._fetch_url(Api.API_ROOT_URL, params, no_cache = self._no_cache or no_cache)
-        return self._check_xml(xml)
+        return self._fetch_url(Api.API_ROOT_URL, params, no_cache = self._no_cache or no_cache)
 
     @Wormhole.entrance('lfm-api-raw-data')
     def _post_url(self,
@@ -767,6 +911,13 @@ class Api(object):
         else:
             raise AuthenticationFailedError("api secret must be present to call this method")
 
+    @Wormhole.entrance('lfm-api-parse')
+    def _stream_xml(self, xml):
+        # only the head of the response is parsed here, the rows are parsed
+        # as they are read, see L{ResponseCursor}
+        return ResponseCursor(xml, self._check_xml)
+
+    @Wormhole.entrance('lfm-api-parse')
     def _check_xml(self, xml):
         data = None
         try:
@@ -785,27 +936,18 @@ class Api(object):
     def __repr__(self):
         return "<lastfm.Api: %s>" % self._api_key
 
-from datetime import datetime
+import re
 import sys
 import time
 import urllib
 import urllib2
 import urlparse
 
-from lastfm.album import Album
-from lastfm.artist import Artist
 from lastfm.error import error_map, LastfmError, OperationFailedError, AuthenticationFailedError,\
     InvalidParametersError
-from lastfm.event import Event
-from lastfm.util import FileCache
-from lastfm.geo import Location, Country
-from lastfm.group import Group
-from lastfm.playlist import Playlist
-from lastfm.tag import Tag
-from lastfm.tasteometer import Tasteometer
-from lastfm.track import Track
-from lastfm.user import User
-from lastfm.venue import Venue
+from lastfm.util import FileCache, RateLimiter, ResponseCursor
+
+_ERROR_CODE = re.compile(r'<error code="(\d+)"')
 
 if sys.version < '2.6':
     import md5
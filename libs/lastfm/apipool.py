@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""Module for spreading the web service requests over several API keys"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from threading import Lock
+from lastfm.api import Api
+from lastfm.util import Wormhole
+
+class ApiPool(Api):
+    """
+    An L{Api} which spreads its read requests over several API keys. Each key
+    has its own token bucket, and every request goes to the healthy key with
+    the earliest available token, so the pool sustains the sum of the rates
+    of its keys. A key answering with an error about the key or its rate is
+    taken out of rotation for a cooldown period, which doubles with each
+    consecutive failure, and the request is retried with the next key. While
+    no key is healthy, the requests wait for the first one to recover, at
+    most max_wait seconds. A key reported invalid or suspended is not used
+    again. Network errors are not the fault of a key: they are raised as they
+    are, without taking the key out of rotation.
+
+    A rate limiter set with L{set_rate_limiter}, like the L{SharedRateLimiter}
+    of a L{CrawlCoordinator}, spaces out the requests of all the processes
+    sharing it at the rate of the whole pool, on top of the token buckets of
+    the keys, which only count the requests of this process.
+
+    The pool is an Api, so the entities created with it run their requests
+    through it unchanged. Cached responses are shared by all the keys. The
+    signed requests and the writes are always made with the first key, as
+    the session and the signatures belong to it.
+    """
+    INVALID_KEY_ERRORS = [10, 26]
+    """Error codes taking a key out of rotation for good: invalid and suspended API key"""
+
+    RETRY_ERRORS = [8, 11, 16, 29]
+    """Error codes retried with another key: operation failed, service offline,
+    temporary error and rate limit exceeded"""
+
+    def __init__(self, keys, rate = 1.0, burst = 5, cooldown = 30, max_wait = 10, **kwargs):
+        """
+        Create a pool of API keys.
+
+        @param keys:        the API keys, as key/secret pairs or plain keys. The
+                            first one is used for the authenticated methods.
+        @type keys:         L{list} of (L{str}, L{str}) OR L{list} of L{str}
+        @param rate:        requests per second allowed for each key (optional)
+        @type rate:         L{float}
+        @param burst:       requests a key can make at once after being idle (optional)
+        @type burst:        L{int}
+        @param cooldown:    time a failing key is left out of rotation, in seconds (optional)
+        @type cooldown:     L{float}
+        @param max_wait:    longest wait for a key to recover when none is
+                            healthy, in seconds, after which it is used
+                            anyway (optional)
+        @type max_wait:     L{float}
+        @param kwargs:      the other arguments of L{Api.__init__}
+
+        @raise InvalidParametersError: No key is given.
+        """
+        keys = [isinstance(k, basestring) and (k, None) or tuple(k) for k in keys]
+        if not keys:
+            raise InvalidParametersError("at least one API key has to be provided")
+        Api.__init__(self, keys[0][0], keys[0][1], **kwargs)
+        self._cooldown = cooldown
+        self._max_wait = max_wait
+        self._keys = [_Key(k, rate, burst) for k, s in keys]
+        self._keys_lock = Lock()
+        # the token buckets space out the requests of this process, a shared
+        # limiter set later spaces out those of all the processes
+        self._rate_limiter = None
+        self._interval = 1.0 / (rate * len(keys))
+
+    @property
+    def keys(self):
+        """
+        the state of the keys in the pool
+        @rtype: L{list} of L{dict}
+        """
+        now = time.time()
+        with self._keys_lock:
+            return [{'api_key': k.api_key,
+                     'healthy': k.disabled_until <= now,
+                     'requests': k.requests,
+                     'failures': k.failures}
+                    for k in self._keys]
+
+    @Wormhole.entrance('lfm-api-network')
+    def _read_url_data(self, opener, url, data = None):
+        self._wait(self._backoff_until - time.time())
+        # posts and signed requests are bound to the first key
+        if data is not None or 'api_sig=' in url:
+            key = self._keys[0]
+            self._wait(self._reserve(key))
+            self._wait_shared()
+            return opener.open(url, data).read()
+
+        tried = []
+        while True:
+            key, delay = self._acquire(tried)
+            if key is None:
+                # every key failed, the last response is the one reported
+                return url_data
+            tried.append(key)
+            self._wait(delay)
+            self._wait_shared()
+            try:
+                url_data = opener.open(_with_key(url, key.api_key)).read()
+            except urllib2.HTTPError, e:
+                url_data = e.read()
+            code = Api._error_code(url_data)
+            if code in ApiPool.INVALID_KEY_ERRORS:
+                self._failed(key, permanent = True)
+            elif code in ApiPool.RETRY_ERRORS:
+                self._failed(key)
+            else:
+                self._succeeded(key)
+                return url_data
+
+    def _acquire(self, tried):
+        # the healthy key with the earliest token, or the key recovering first
+        # when all of them are out of rotation, waiting for its cooldown up to
+        # max_wait. None when every key usable was tried.
+        with self._keys_lock:
+            now = time.time()
+            keys = [k for k in self._keys
+                    if k not in tried and k.disabled_until != float('inf')]
+            if not keys:
+                if tried:
+                    return (None, 0)
+                raise InvalidApiKeyError("every API key of the pool is invalid or suspended", 10)
+            healthy = [k for k in keys if k.disabled_until <= now]
+            if healthy:
+                key = min(healthy, key = lambda k: k.available(now))
+                start = now
+            else:
+                key = min(keys, key = lambda k: k.disabled_until)
+                start = min(key.disabled_until, now + self._max_wait)
+            key.requests += 1
+            return (key, start - now + key.take(start))
+
+    def _reserve(self, key):
+        with self._keys_lock:
+            key.requests += 1
+            return key.take(time.time())
+
+    def _wait_shared(self):
+        if self._rate_limiter is not None:
+            self._wait(self._rate_limiter.reserve(self._interval))
+
+    def _wait(self, delay):
+        if delay > 0:
+            time.sleep(delay)
+
+    def _failed(self, key, permanent = False):
+        with self._keys_lock:
+            key.failures += 1
+            if permanent:
+                key.disabled_until = float('inf')
+            else:
+                key.disabled_until = time.time() + self._cooldown * 2 ** min(key.failures - 1, 6)
+
+    def _succeeded(self, key):
+        with self._keys_lock:
+            key.failures = 0
+
+    def __repr__(self):
+        return "<lastfm.ApiPool: %s key(s)>" % len(self._keys)
+
+class _Key(object):
+    """An API key and its token bucket"""
+    def __init__(self, api_key, rate, burst):
+        self.api_key = api_key
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.disabled_until = 0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now):
+        """Time when the next token is available."""
+        tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        return tokens >= 1 and now or now + (1 - tokens) / self.rate
+
+    def take(self, now):
+        """Take a token, returning the time to wait for it."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - 1
+        self.updated = now
+        return self.tokens < 0 and -self.tokens / self.rate or 0
+
+def _with_key(url, api_key):
+    return _API_KEY.sub('api_key=%s' % urllib.quote_plus(api_key), url, 1)
+
+import re
+import time
+import urllib
+import urllib2
+
+from lastfm.error import InvalidApiKeyError, InvalidParametersError
+
+_API_KEY = re.compile(r'(?<=[?&])api_key=[^&]*')
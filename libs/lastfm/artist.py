@@ -88,16 +88,16 @@ class Artist(LastfmBase):
                           Artist(
                                  self._api,
                                  subject = self,
-                                 name = a.findtext('name'),
-                                 mbid = a.findtext('mbid'),
+                                 name = r['name'],
+                                 mbid = r['mbid'],
                                  stats = Stats(
-                                               subject = a.findtext('name'),
-                                               match = float(a.findtext('match')),
+                                               subject = r['name'],
+                                               match = r['match'],
                                                ),
-                                 url = 'http://' + a.findtext('url'),
-                                 image = {'large': a.findtext('image')}
+                                 url = 'http://' + r['url'],
+                                 image = {'large': r['image']}
                                  )
-                          for a in data.findall('artist')
+                          for r in _SIMILAR_ARTIST.decode_all(data, 'artist')
                           ]
         return self._similar[:]
 
@@ -132,10 +132,14 @@ class Artist(LastfmBase):
                               Tag(
                                   self._api,
                                   subject = self,
-                                  name = t.findtext('name'),
-                                  url = t.findtext('url')
+                                  name = r['name'],
+                                  url = r['url'],
+                                  stats = Stats(
+                                                subject = r['name'],
+                                                count = r['count']
+                                                )
                                   )
-                              for t in data.findall('tag')
+                              for r in _TOP_TAG.decode_all(data, 'tag')
                               ]
         return self._top_tags[:]
 
@@ -404,3 +408,17 @@ from lastfm.tag import Tag
 from lastfm.track import Track
 from lastfm.user import User
 from lastfm.wiki import Wiki
+from lastfm.util.decoder import Decoder, integer
+
+_SIMILAR_ARTIST = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    match = ('match', float),
+    url = 'url',
+    image = 'image',
+)
+_TOP_TAG = Decoder(
+    name = 'name',
+    url = 'url',
+    count = ('count', integer),
+)
@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+"""Benchmarks for the lastfm package, runnable as scripts with C{python -m}"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.benchmarks"
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Cold-start import time of the lastfm package. Every sample is taken in a
+fresh interpreter. The 'eager' case loads every public name, which is what
+C{import lastfm} cost before the modules were loaded lazily.
+
+Usage: python -m lastfm.benchmarks.importtime [runs]
+"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.benchmarks"
+
+import os
+import subprocess
+import sys
+
+CASES = [
+    ('import lastfm', 'import lastfm'),
+    ('lastfm.Api', 'import lastfm; lastfm.Api'),
+    ('lastfm.User', 'import lastfm; lastfm.User'),
+    ('eager (all names)', 'from lastfm import *'),
+]
+"""Name and statement of the measured cases"""
+
+_TEMPLATE = "import time; t = time.time(); %s; print(time.time() - t)"
+
+def measure(statement, runs = 20):
+    """
+    Time a statement in fresh interpreters.
+
+    @param statement:    the statement
+    @type statement:     L{str}
+    @param runs:         number of interpreters started (optional)
+    @type runs:          L{int}
+
+    @return:             the times taken, in seconds, sorted
+    @rtype:              L{list} of L{float}
+    """
+    path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH = path)
+    times = []
+    for i in xrange(runs):
+        output = subprocess.Popen([sys.executable, '-c', _TEMPLATE % statement],
+                                  stdout = subprocess.PIPE, env = env).communicate()[0]
+        times.append(float(output.strip().splitlines()[-1]))
+    times.sort()
+    return times
+
+def main(runs = 20):
+    print "%-20s %10s %10s" % ('case', 'min (ms)', 'median (ms)')
+    for name, statement in CASES:
+        times = measure(statement, runs)
+        print "%-20s %10.2f %10.2f" % (name, times[0] * 1000, times[len(times)/2] * 1000)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
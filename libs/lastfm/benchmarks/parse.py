@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+Time taken to turn the web service responses into entities, for the
+response types read with a L{Decoder}. The responses are generated, with
+the given number of rows, and served without the network. For each type,
+'xml' is the parsing of the response, 'rows' the decoding of its rows, and
+'findtext' the same decoding done with one C{findtext} per field, as the
+entity modules did before. 'total' is the whole call of the entity method.
+The responses of a single entity, like C{event.getInfo}, have one row.
+
+Usage: python -m lastfm.benchmarks.parse [rows] [runs]
+"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.benchmarks"
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import lastfm
+from lastfm import chart, event, geo, tag, user, artist
+from lastfm.api import ElementTree
+
+_IMAGES = '<image size="small">http://img/s</image><image size="large">http://img/l</image>'
+_POINT = '<geo:point xmlns:geo="%s"><geo:lat>51.5</geo:lat><geo:long>-0.1</geo:long></geo:point>' % geo.Location.XMLNS
+_ARTIST = '<artist><name>Artist %(i)d</name><mbid>mbid-%(i)d</mbid><url>http://a/%(i)d</url></artist>'
+
+_ROWS = {
+    'weekly_artist': ('<artist rank="%(i)d"><name>Artist %(i)d</name><mbid/>'
+                      '<playcount>%(i)d</playcount><url>http://a/%(i)d</url></artist>'),
+    'weekly_album': ('<album rank="%(i)d"><artist mbid="m">Artist %(i)d</artist><name>Album %(i)d</name>'
+                     '<mbid/><playcount>%(i)d</playcount><url>http://b/%(i)d</url></album>'),
+    'weekly_track': ('<track rank="%(i)d"><artist mbid="m">Artist %(i)d</artist><name>Track %(i)d</name>'
+                     '<mbid/><playcount>%(i)d</playcount><url>http://t/%(i)d</url></track>'),
+    'recent_track': ('<track><artist mbid="m">Artist %(i)d</artist><name>Track %(i)d</name>'
+                     '<streamable>1</streamable><mbid/><album mbid="">Album %(i)d</album>'
+                     '<url>http://t/%(i)d</url>' + _IMAGES + '<date uts="1234567890">13 Feb 2009, 23:31</date></track>'),
+    'loved_track': ('<track><name>Track %(i)d</name><mbid/><url>http://t/%(i)d</url>'
+                    '<date uts="1234567890">13 Feb 2009, 23:31</date>' + _ARTIST + _IMAGES + '</track>'),
+    'top_album': ('<album rank="%(i)d"><name>Album %(i)d</name><playcount>%(i)d</playcount><mbid/>'
+                  '<url>http://b/%(i)d</url>' + _ARTIST + _IMAGES + '</album>'),
+    'top_artist': ('<artist rank="%(i)d"><name>Artist %(i)d</name><playcount>%(i)d</playcount><mbid/>'
+                   '<url>http://a/%(i)d</url><streamable>1</streamable>' + _IMAGES + '</artist>'),
+    'top_track': ('<track rank="%(i)d"><name>Track %(i)d</name><playcount>%(i)d</playcount>'
+                  '<tagcount>%(i)d</tagcount><mbid/><url>http://t/%(i)d</url>'
+                  '<streamable fulltrack="0">1</streamable>' + _ARTIST + _IMAGES + '</track>'),
+    'tag_top_album': ('<album rank="%(i)d"><name>Album %(i)d</name><tagcount>%(i)d</tagcount><mbid/>'
+                      '<url>http://b/%(i)d</url>' + _ARTIST + _IMAGES + '</album>'),
+    'similar_artist': ('<artist><name>Artist %(i)d</name><mbid/><match>0.5</match>'
+                       '<url>a/%(i)d</url><image>http://img/l</image></artist>'),
+    'event': ('<event><id>%(i)d</id><title>Event %(i)d</title><artists><artist>Artist %(i)d</artist>'
+              '<artist>Artist 0</artist><headliner>Artist %(i)d</headliner></artists><venue>'
+              '<name>Venue %(i)d</name><location><city>London</city><country>United Kingdom</country>'
+              '<street>Street %(i)d</street><postalcode>N1</postalcode>' + _POINT + '</location>'
+              '<url>http://www.last.fm/venue/%(i)d</url></venue><startDate>Thu, 12 Feb 2009</startDate>'
+              '<startTime>20:00</startTime><description>Event %(i)d</description>' + _IMAGES +
+              '<attendance>%(i)d</attendance><reviews>0</reviews><tag>lastfm:event=%(i)d</tag>'
+              '<url>http://www.last.fm/event/%(i)d</url></event>'),
+}
+
+CASES = [
+    # name, method, wrapper, row tag, row, decoder, call
+    ('weekly artist chart', 'user.getWeeklyArtistChart',
+     '<weeklyartistchart user="u" from="1" to="2">%s</weeklyartistchart>', 'artist',
+     'weekly_artist', chart._WEEKLY_ARTIST, lambda api: user.User(api, name = 'u').get_weekly_artist_chart()),
+    ('weekly album chart', 'user.getWeeklyAlbumChart',
+     '<weeklyalbumchart user="u" from="1" to="2">%s</weeklyalbumchart>', 'album',
+     'weekly_album', chart._WEEKLY_ALBUM, lambda api: user.User(api, name = 'u').get_weekly_album_chart()),
+    ('weekly track chart', 'user.getWeeklyTrackChart',
+     '<weeklytrackchart user="u" from="1" to="2">%s</weeklytrackchart>', 'track',
+     'weekly_track', chart._WEEKLY_TRACK, lambda api: user.User(api, name = 'u').get_weekly_track_chart()),
+    ('recent tracks', 'user.getRecentTracks',
+     '<recenttracks user="u">%s</recenttracks>', 'track',
+     'recent_track', user._RECENT_TRACK, lambda api: user.User(api, name = 'u').get_recent_tracks()),
+    ('loved tracks', 'user.getLovedTracks',
+     '<lovedtracks user="u">%s</lovedtracks>', 'track',
+     'loved_track', user._LOVED_TRACK, lambda api: _uncached(user.User(api, name = 'u'), 'loved_tracks')),
+    ('user top albums', 'user.getTopAlbums',
+     '<topalbums user="u">%s</topalbums>', 'album',
+     'top_album', user._TOP_ALBUM, lambda api: user.User(api, name = 'u').get_top_albums()),
+    ('user top artists', 'user.getTopArtists',
+     '<topartists user="u">%s</topartists>', 'artist',
+     'top_artist', user._TOP_ARTIST, lambda api: user.User(api, name = 'u').get_top_artists()),
+    ('user top tracks', 'user.getTopTracks',
+     '<toptracks user="u">%s</toptracks>', 'track',
+     'top_track', user._TOP_TRACK, lambda api: user.User(api, name = 'u').get_top_tracks()),
+    ('tag top albums', 'tag.getTopAlbums',
+     '<topalbums tag="t">%s</topalbums>', 'album',
+     'tag_top_album', tag._TOP_ALBUM, lambda api: _uncached(tag.Tag(api, name = 't'), 'top_albums')),
+    ('tag top tracks', 'tag.getTopTracks',
+     '<toptracks tag="t">%s</toptracks>', 'track',
+     'top_track', tag._TOP_TRACK, lambda api: _uncached(tag.Tag(api, name = 't'), 'top_tracks')),
+    ('geo top tracks', 'geo.getTopTracks',
+     '<toptracks country="c">%s</toptracks>', 'track',
+     'top_track', geo._TOP_TRACK, lambda api: geo.Geo.get_top_tracks(api, 'c')),
+    ('similar artists', 'artist.getSimilar',
+     '<similarartists artist="a">%s</similarartists>', 'artist',
+     'similar_artist', artist._SIMILAR_ARTIST, lambda api: artist.Artist(api, name = 'a').get_similar()),
+    ('artist events', 'artist.getEvents',
+     '<events artist="a">%s</events>', 'event',
+     'event', event._EVENT, lambda api: _uncached(artist.Artist(api, name = 'a'), 'events')),
+    ('event info', 'event.getInfo',
+     '%s', 'event',
+     'event', event._EVENT, lambda api: event.Event.get_info(api, 1)),
+]
+"""The measured response types"""
+
+def _uncached(entity, name):
+    # read a cached property again
+    setattr(entity, "_%s" % name, None)
+    return getattr(entity, name)
+
+def _single(wrapper):
+    # the response of a single entity has no enclosing element
+    return wrapper == '%s'
+
+class _CannedApi(lastfm.Api):
+    """An Api serving the generated responses"""
+    def __init__(self, responses):
+        lastfm.Api.__init__(self, 'key', no_cache = True)
+        self._responses = responses
+
+    def _fetch_url(self, url, parameters = None, no_cache = False):
+        return self._responses[parameters['method']]
+
+def response(wrapper, row, rows):
+    """
+    Generate a response.
+
+    @param wrapper:    the enclosing element of the rows, with a C{%s} for the rows
+    @type wrapper:     L{str}
+    @param row:        a row, with C{%(i)d} for its number
+    @type row:         L{str}
+    @param rows:       the number of rows
+    @type rows:        L{int}
+
+    @return:           the response
+    @rtype:            L{str}
+    """
+    return '<lfm status="ok">%s</lfm>' % (wrapper % "".join(row % {'i': i + 1} for i in xrange(rows)))
+
+def findtext_decode(decoder, element, tag):
+    """Decode the rows of an element with one lookup per field, for comparison."""
+    rows = []
+    for child in element.findall(tag):
+        values = {}
+        for key, spec in decoder._fields.items():
+            path, converter = isinstance(spec, tuple) and spec or (spec, None)
+            if path.startswith('@'):
+                value = child.get(path[1:])
+            elif path.endswith('[]'):
+                value = [i.text for i in child.findall(path[:-2])]
+            elif path.endswith(']'):
+                tag_name, attribute = path[:-1].split('[', 1)
+                value = dict((i.get(attribute), i.text) for i in child.findall(tag_name))
+            elif '@' in path:
+                tag_name, attribute = path.split('@', 1)
+                found = child.find(tag_name)
+                value = None
+                if found is not None:
+                    value = found.get(attribute)
+            else:
+                value = child.findtext(path)
+            if converter is not None and value is not None and not isinstance(value, (dict, list)):
+                value = converter(value)
+            values[key] = value
+        rows.append(values)
+    return rows
+
+def best(func, runs):
+    """
+    Time a function.
+
+    @return:    the smallest time taken by a call, in seconds
+    @rtype:     L{float}
+    """
+    times = []
+    for i in xrange(runs):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+def main(rows = 200, runs = 20):
+    responses = {}
+    for name, method, wrapper, tag_name, row, decoder, call in CASES:
+        responses[method] = response(wrapper, _ROWS[row], _single(wrapper) and 1 or rows)
+    api = _CannedApi(responses)
+
+    print "%d rows per response, best of %d runs" % (rows, runs)
+    print "%-20s %10s %10s %13s %10s" % ('response', 'xml (ms)', 'rows (ms)', 'findtext (ms)', 'total (ms)')
+    for name, method, wrapper, tag_name, row, decoder, call in CASES:
+        xml = responses[method]
+        element = ElementTree.XML(xml)
+        if not _single(wrapper):
+            element = element[0]
+        assert decoder.decode_all(element, tag_name) == findtext_decode(decoder, element, tag_name)
+        print "%-20s %10.2f %10.2f %13.2f %10.2f" % (
+            name,
+            best(lambda: ElementTree.XML(xml), runs) * 1000,
+            best(lambda: decoder.decode_all(element, tag_name), runs) * 1000,
+            best(lambda: findtext_decode(decoder, element, tag_name), runs) * 1000,
+            best(lambda: call(api), runs) * 1000)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
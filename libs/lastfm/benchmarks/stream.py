@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Time to the first row and time to all the rows of a large response, read
+as a tree with C{_fetch_data} and as a stream with
+C{_fetch_data(stream = True)}. The rows are events, as in a page of
+C{geo.getEvents}, and are turned into L{Event} objects in both cases. The
+tree holds every row until the page is done, the stream one row at a time.
+
+Usage: python -m lastfm.benchmarks.stream [rows] [runs]
+"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.benchmarks"
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import lastfm
+from lastfm.event import Event
+
+_EVENT = ('<event><id>%(i)d</id><title>Event %(i)d</title>'
+          '<artists><artist>Artist %(i)d</artist><headliner>Artist %(i)d</headliner></artists>'
+          '<venue><name>Venue</name><location><city>City</city><country>Country</country>'
+          '<street>Street</street><postalcode>1</postalcode>'
+          '<geo:point xmlns:geo="http://www.w3.org/2003/01/geo/wgs84_pos#">'
+          '<geo:lat>51.5</geo:lat><geo:long>-0.1</geo:long></geo:point></location>'
+          '<url>http://www.last.fm/venue/%(i)d</url></venue>'
+          '<startDate>Fri, 05 Jun 2009</startDate><description>%(text)s</description>'
+          '<image size="large">http://img/%(i)d</image><url>http://www.last.fm/event/%(i)d</url>'
+          '<attendance>%(i)d</attendance><reviews>0</reviews><tag>lastfm:event=%(i)d</tag></event>')
+
+class _CannedApi(lastfm.Api):
+    """An Api serving one generated response"""
+    def __init__(self, xml):
+        lastfm.Api.__init__(self, 'key', no_cache = True)
+        self._xml = xml
+
+    def _fetch_url(self, url, parameters = None, no_cache = False):
+        return self._xml
+
+def tree(api):
+    data = api._fetch_data({'method': 'geo.getEvents'}).find('events')
+    for e in data.findall('event'):
+        yield Event.create_from_data(api, e)
+
+def stream(api):
+    data = api._fetch_data({'method': 'geo.getEvents'}, stream = True)
+    for e in data.rows('event'):
+        yield Event.create_from_data(api, e)
+
+def measure(read, api, runs):
+    """
+    Time the reading of a response.
+
+    @return:    the best time to the first row and to all the rows, in seconds
+    @rtype:     (L{float}, L{float})
+    """
+    first, total = [], []
+    for i in xrange(runs):
+        start = time.time()
+        rows = read(api)
+        rows.next()
+        first.append(time.time() - start)
+        for row in rows:
+            pass
+        total.append(time.time() - start)
+    return (min(first), min(total))
+
+def main(rows = 1000, runs = 5):
+    xml = '<lfm status="ok"><events location="x" page="1" totalpages="1">%s</events></lfm>' % \
+        "".join(_EVENT % {'i': i + 1, 'text': 'x' * 200} for i in xrange(rows))
+    api = _CannedApi(xml)
+    print "%d events (%d KB), best of %d runs" % (rows, len(xml) / 1024, runs)
+    print "%-10s %16s %16s" % ('mode', 'first row (ms)', 'all rows (ms)')
+    for name, read in [('tree', tree), ('stream', stream)]:
+        first, total = measure(read, api, runs)
+        print "%-10s %16.2f %16.2f" % (name, first * 1000, total * 1000)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -5,7 +5,6 @@ __version__ = "0.2"
 __license__ = "GNU Lesser General Public License"
 __package__ = "lastfm"
 
-from functools import reduce
 from lastfm.base import LastfmBase
 from lastfm.mixin import mixin
 from lastfm.util import logging
@@ -142,45 +141,37 @@ class WeeklyAlbumChart(AlbumChart, WeeklyChart):
     """A class for representing the weekly album charts"""
     @staticmethod
     def create_from_data(api, subject, data):
-        w = WeeklyChart(
-                        subject = subject,
-                        start = datetime.utcfromtimestamp(int(data.attrib['from'])),
-                        end = datetime.utcfromtimestamp(int(data.attrib['to'])),
-                        )
+        start, end = _decode_week(data)
+        w = WeeklyChart(subject = subject, start = start, end = end)
+        rows = _WEEKLY_ALBUM.decode_all(data, 'album')
         return WeeklyAlbumChart(
             subject = subject,
-            start = datetime.utcfromtimestamp(int(data.attrib['from'])),
-            end = datetime.utcfromtimestamp(int(data.attrib['to'])),
+            start = start,
+            end = end,
             stats = Stats(
                 subject = subject,
-                playcount = reduce(
-                    lambda x,y:(
-                        x + int(y.findtext('playcount'))
-                    ),
-                    data.findall('album'),
-                    0
-                )
+                playcount = sum(r['playcount'] for r in rows)
             ),
             albums = [
                 Album(
                       api,
                       subject = w,
-                      name = a.findtext('name'),
-                      mbid = a.findtext('mbid'),
+                      name = r['name'],
+                      mbid = r['mbid'],
                       artist = Artist(
                           api,
                           subject = w,
-                          name = a.findtext('artist'),
-                          mbid = a.find('artist').attrib['mbid'],
+                          name = r['artist'],
+                          mbid = r['artist_mbid'],
                           ),
                       stats = Stats(
-                          subject = a.findtext('name'),
-                          rank = int(a.attrib['rank']),
-                          playcount = int(a.findtext('playcount')),
+                          subject = r['name'],
+                          rank = r['rank'],
+                          playcount = r['playcount'],
                           ),
-                      url = a.findtext('url'),
+                      url = r['url'],
                       )
-                for a in data.findall('album')
+                for r in rows
                 ]
             )
     
@@ -188,41 +179,34 @@ class WeeklyArtistChart(ArtistChart, WeeklyChart):
     """A class for representing the weekly artist charts"""
     @staticmethod
     def create_from_data(api, subject, data):
-        w = WeeklyChart(
-                        subject = subject,
-                        start = datetime.utcfromtimestamp(int(data.attrib['from'])),
-                        end = datetime.utcfromtimestamp(int(data.attrib['to'])),
-                        )
-        count_attribute = data.find('artist').findtext('playcount') and 'playcount' or 'weight'
-        def get_count_attribute(artist):
-            return {count_attribute: int(eval(artist.findtext(count_attribute)))}
-        def get_count_attribute_sum(artists):
-            return {count_attribute: reduce(
-                        lambda x, y:(x + int(eval(y.findtext(count_attribute)))), artists, 0
-                    )}
+        start, end = _decode_week(data)
+        w = WeeklyChart(subject = subject, start = start, end = end)
+        rows = _WEEKLY_ARTIST.decode_all(data, 'artist')
+        # the charts of the tags have weights instead of playcounts
+        count_attribute = rows and rows[0]['playcount'] is not None and 'playcount' or 'weight'
             
         return WeeklyArtistChart(
             subject = subject,
-            start = datetime.utcfromtimestamp(int(data.attrib['from'])),
-            end = datetime.utcfromtimestamp(int(data.attrib['to'])),
+            start = start,
+            end = end,
             stats = Stats(
                           subject = subject,
-                          **get_count_attribute_sum(data.findall('artist'))
+                          **{count_attribute: sum(r[count_attribute] for r in rows)}
                     ),
             artists = [
                       Artist(
                             api,
                             subject = w,
-                            name = a.findtext('name'),
-                            mbid = a.findtext('mbid'),
+                            name = r['name'],
+                            mbid = r['mbid'],
                             stats = Stats(
-                                          subject = a.findtext('name'),
-                                          rank = int(a.attrib['rank']),
-                                          **get_count_attribute(a)
+                                          subject = r['name'],
+                                          rank = r['rank'],
+                                          **{count_attribute: r[count_attribute]}
                                           ),
-                            url = a.findtext('url'),
+                            url = r['url'],
                             )
-                      for a in data.findall('artist')
+                      for r in rows
                       ]
             )
     
@@ -230,44 +214,36 @@ class WeeklyTrackChart(TrackChart, WeeklyChart):
     """A class for representing the weekly track charts"""
     @staticmethod
     def create_from_data(api, subject, data):
-        w = WeeklyChart(
-            subject = subject,
-            start = datetime.utcfromtimestamp(int(data.attrib['from'])),
-            end = datetime.utcfromtimestamp(int(data.attrib['to'])),
-            )
+        start, end = _decode_week(data)
+        w = WeeklyChart(subject = subject, start = start, end = end)
+        rows = _WEEKLY_TRACK.decode_all(data, 'track')
         return WeeklyTrackChart(
             subject = subject,
-            start = datetime.utcfromtimestamp(int(data.attrib['from'])),
-            end = datetime.utcfromtimestamp(int(data.attrib['to'])),
+            start = start,
+            end = end,
             stats = Stats(
                 subject = subject,
-                playcount = reduce(
-                                   lambda x,y:(
-                                               x + int(y.findtext('playcount'))
-                                               ),
-                                   data.findall('track'),
-                                   0
-                )
+                playcount = sum(r['playcount'] for r in rows)
             ),
             tracks = [
                       Track(
                             api,
                             subject = w,
-                            name = t.findtext('name'),
-                            mbid = t.findtext('mbid'),
+                            name = r['name'],
+                            mbid = r['mbid'],
                             artist = Artist(
                                             api,
-                                            name = t.findtext('artist'),
-                                            mbid = t.find('artist').attrib['mbid'],
+                                            name = r['artist'],
+                                            mbid = r['artist_mbid'],
                                             ),
                             stats = Stats(
-                                          subject = t.findtext('name'),
-                                          rank = int(t.attrib['rank']),
-                                          playcount = int(t.findtext('playcount')),
+                                          subject = r['name'],
+                                          rank = r['rank'],
+                                          playcount = r['playcount'],
                                           ),
-                            url = t.findtext('url'),
+                            url = r['url'],
                             )
-                      for t in data.findall('track')
+                      for r in rows
                      ]
            )
         
@@ -579,4 +555,27 @@ from lastfm.artist import Artist
 from lastfm.error import InvalidParametersError, LastfmError
 from lastfm.stats import Stats
 from lastfm.track import Track
-from lastfm.tag import Tag
\ No newline at end of file
+from lastfm.tag import Tag
+from lastfm.util.decoder import Decoder, integer, timestamp
+
+def _decode_week(data):
+    return (timestamp(data.get('from')), timestamp(data.get('to')))
+
+_WEEKLY_ALBUM = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    artist = 'artist',
+    artist_mbid = 'artist@mbid',
+    rank = ('@rank', integer),
+    playcount = ('playcount', integer),
+    url = 'url',
+)
+_WEEKLY_ARTIST = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    rank = ('@rank', integer),
+    playcount = ('playcount', integer),
+    weight = ('weight', integer),
+    url = 'url',
+)
+_WEEKLY_TRACK = _WEEKLY_ALBUM
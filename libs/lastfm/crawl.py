@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+"""Module for crawling the last.fm graphs with many worker processes"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from contextlib import contextmanager
+from threading import Lock
+
+class CrawlCoordinator(object):
+    """
+    The shared state of a crawl of a graph of crawlable entities, like the
+    similar artists or the neighbour users, by many worker processes on a host.
+    The frontier and the visited set are kept in one sqlite database, which
+    the workers attach to by opening a coordinator on the same file.
+
+    A worker leases a batch of entities from the frontier, fetches their
+    neighbours and reports them. The neighbours not seen before by any worker
+    are added to the frontier, breadth first. A lease expires if it is not
+    reported in time, so the entities of a worker which died are leased again
+    by the others, and the crawl resumes where it stopped when the workers are
+    restarted. Entities failing too many times are given up.
+
+    The workers share one request budget through the rate limiter given by
+    L{attach}, so the throughput grows with the number of workers up to the
+    rate allowed for the API key, or the sum of the rates of the keys of an
+    L{ApiPool}.
+    """
+    PENDING, LEASED, DONE, FAILED = range(4)
+    """States of the entities of the frontier"""
+
+    def __init__(self, path, kind, lease_time = 300, max_attempts = 3, max_depth = None):
+        """
+        Open the coordinator of a crawl, creating it if needed.
+
+        @param path:            path of the database of the crawl
+        @type path:             L{str}
+        @param kind:            the class of the entities crawled
+        @type kind:             L{Artist} OR L{User} OR L{Event} OR L{Location} OR L{Country}
+        @param lease_time:      time a worker has to report an entity, in seconds (optional)
+        @type lease_time:       L{float}
+        @param max_attempts:    number of times an entity is leased before it is
+                                given up (optional)
+        @type max_attempts:     L{int}
+        @param max_depth:       distance from the seeds beyond which the neighbours
+                                are not crawled, no limit if not given (optional)
+        @type max_depth:        L{int}
+
+        @raise InvalidParametersError: The class is not crawlable, or the database
+                                       belongs to the crawl of another class.
+        """
+        if not hasattr(kind, '_crawl_spec'):
+            raise InvalidParametersError("%s is not crawlable" % kind.__name__)
+        self._path = path
+        self._kind = kind
+        self._lease_time = lease_time
+        self._max_attempts = max_attempts
+        self._max_depth = max_depth
+        self._lock = Lock()
+        self._conn = None
+        self._pid = None
+        with self._transaction() as c:
+            c.execute("""CREATE TABLE IF NOT EXISTS frontier (
+                         key TEXT PRIMARY KEY, depth INTEGER, state INTEGER,
+                         worker TEXT, lease_until REAL, attempts INTEGER)""")
+            c.execute("""CREATE INDEX IF NOT EXISTS frontier_state
+                         ON frontier (state, depth)""")
+            c.execute("""CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)""")
+            c.execute("INSERT OR IGNORE INTO meta VALUES ('kind', ?)", (kind.__name__,))
+            stored = c.execute("SELECT value FROM meta WHERE name = 'kind'").fetchone()[0]
+        if stored != kind.__name__:
+            raise InvalidParametersError("%s is the crawl of %s" % (path, stored))
+
+    @property
+    def stats(self):
+        """
+        number of entities in each state
+        @rtype: L{dict}
+        """
+        names = {CrawlCoordinator.PENDING: 'pending', CrawlCoordinator.LEASED: 'leased',
+                 CrawlCoordinator.DONE: 'done', CrawlCoordinator.FAILED: 'failed'}
+        stats = dict((n, 0) for n in names.values())
+        with self._transaction() as c:
+            for state, count in c.execute(
+                    "SELECT state, COUNT(*) FROM frontier GROUP BY state"):
+                stats[names[state]] = count
+        return stats
+
+    def attach(self, api):
+        """
+        Make an L{Api} share the request budget of the workers of the crawl.
+
+        @param api:    the Api of a worker
+        @type api:     L{Api}
+        """
+        api.set_rate_limiter(SharedRateLimiter("%s.ratelimit" % self._path))
+
+    def seed(self, entities):
+        """
+        Add the entities the crawl starts from. The entities already in the
+        frontier are ignored.
+
+        @param entities:    the seeds
+        @type entities:     L{list} of L{LastfmBase}
+        """
+        keys = [_key(self._kind._crawl_spec(e)[1], e) for e in entities]
+        with self._transaction() as c:
+            c.executemany("""INSERT OR IGNORE INTO frontier
+                             VALUES (?, 0, %d, NULL, NULL, 0)""" % CrawlCoordinator.PENDING,
+                          [(k,) for k in keys])
+
+    def lease(self, worker, count = 1):
+        """
+        Lease entities of the frontier, the nearest to the seeds first.
+
+        @param worker:    name of the worker
+        @type worker:     L{str}
+        @param count:     number of entities leased (optional)
+        @type count:      L{int}
+
+        @return:          the hash attributes of the entities leased, an empty
+                          list if there are none to lease now
+        @rtype:           L{list} of L{dict}
+        """
+        now = time.time()
+        with self._transaction() as c:
+            # the expired leases are of workers which died, or are too slow
+            c.execute("""UPDATE frontier SET state = CASE WHEN attempts < ? THEN %d ELSE %d END
+                         WHERE state = %d AND lease_until < ?""" %
+                      (CrawlCoordinator.PENDING, CrawlCoordinator.FAILED, CrawlCoordinator.LEASED),
+                      (self._max_attempts, now))
+            keys = [row[0] for row in c.execute(
+                "SELECT key FROM frontier WHERE state = %d ORDER BY depth LIMIT ?" %
+                CrawlCoordinator.PENDING, (count,))]
+            c.executemany("""UPDATE frontier SET state = %d, worker = ?, lease_until = ?,
+                             attempts = attempts + 1 WHERE key = ?""" % CrawlCoordinator.LEASED,
+                          [(worker, now + self._lease_time, k) for k in keys])
+        return [_hash_dict(k) for k in keys]
+
+    def report(self, worker, item, neighbours):
+        """
+        Report the neighbours of a leased entity, which is then done. The
+        report is ignored if the lease of the worker expired, and the entity
+        was leased again or given up since.
+
+        @param worker:        name of the worker
+        @type worker:         L{str}
+        @param item:          the hash attributes of the entity, as leased
+        @type item:           L{dict}
+        @param neighbours:    the neighbours of the entity
+        @type neighbours:     L{list} of L{LastfmBase}
+
+        @return:              True if the report was recorded, False if the
+                              worker no longer held the lease
+        @rtype:               L{bool}
+        """
+        key = _key(item.keys(), item)
+        with self._transaction() as c:
+            c.execute("UPDATE frontier SET state = %d WHERE key = ? AND worker = ? AND state = %d" %
+                      (CrawlCoordinator.DONE, CrawlCoordinator.LEASED), (key, worker))
+            if not c.rowcount:
+                return False
+            depth = c.execute("SELECT depth FROM frontier WHERE key = ?", (key,)).fetchone()[0] + 1
+            if self._max_depth is None or depth <= self._max_depth:
+                c.executemany("""INSERT OR IGNORE INTO frontier
+                                 VALUES (?, ?, %d, NULL, NULL, 0)""" % CrawlCoordinator.PENDING,
+                              [(_key(item.keys(), n), depth) for n in neighbours])
+        return True
+
+    def fail(self, worker, item):
+        """
+        Return a leased entity to the frontier after a failure, or give it up
+        if it failed too many times. Ignored if the worker no longer holds the
+        lease.
+
+        @param worker:    name of the worker
+        @type worker:     L{str}
+        @param item:      the hash attributes of the entity, as leased
+        @type item:       L{dict}
+        """
+        with self._transaction() as c:
+            c.execute("""UPDATE frontier SET state = CASE WHEN attempts < ? THEN %d ELSE %d END
+                         WHERE key = ? AND worker = ? AND state = %d""" %
+                      (CrawlCoordinator.PENDING, CrawlCoordinator.FAILED, CrawlCoordinator.LEASED),
+                      (self._max_attempts, _key(item.keys(), item), worker))
+
+    def items(self, state = DONE):
+        """
+        Iterate over the entities of the crawl in a state.
+
+        @param state:    one of the states, L{CrawlCoordinator.DONE} by default (optional)
+        @type state:     L{int}
+
+        @return:         the hash attributes of the entities
+        @rtype:          C{generator} of L{dict}
+        """
+        with self._transaction() as c:
+            keys = [row[0] for row in c.execute(
+                "SELECT key FROM frontier WHERE state = ? ORDER BY depth", (state,))]
+        for k in keys:
+            yield _hash_dict(k)
+
+    def run(self, api, worker = None, batch = 10, limit = None, poll = 1.0):
+        """
+        Crawl as a worker until the frontier is exhausted.
+
+        @param api:       the Api of the worker
+        @type api:        L{Api}
+        @param worker:    name of the worker, made from the host and the process
+                          ID if not given (optional)
+        @type worker:     L{str}
+        @param batch:     number of entities leased at once (optional)
+        @type batch:      L{int}
+        @param limit:     number of entities after which the worker stops (optional)
+        @type limit:      L{int}
+        @param poll:      wait between two attempts to lease when the frontier is
+                          empty but other workers still hold leases, in seconds
+                          (optional)
+        @type poll:       L{float}
+
+        @return:          number of entities crawled by the worker
+        @rtype:           L{int}
+        """
+        if worker is None:
+            worker = "%s:%s" % (socket.gethostname(), os.getpid())
+        crawled = 0
+        while limit is None or crawled < limit:
+            items = self.lease(worker, limit is None and batch or min(batch, limit - crawled))
+            if not items:
+                if not self.stats['leased']:
+                    break
+                time.sleep(poll)
+                continue
+            for item in items:
+                try:
+                    seed, hash_attrs, spider = self._kind._crawl_spec(self._kind(api, **item))
+                    neighbours = list(spider(api, item))
+                except (LastfmError, IOError), e:
+                    logging.log_silenced_exceptions(e)
+                    self.fail(worker, item)
+                    continue
+                if self.report(worker, item, neighbours):
+                    crawled += 1
+        return crawled
+
+    def close(self):
+        """Close the database of this process."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            # a connection is not carried over a fork
+            if self._conn is None or self._pid != os.getpid():
+                self._conn = sqlite3.connect(self._path, timeout = 60,
+                                             isolation_level = None,
+                                             check_same_thread = False)
+                self._pid = os.getpid()
+            c = self._conn.cursor()
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                yield c
+            except:
+                c.execute("ROLLBACK")
+                raise
+            c.execute("COMMIT")
+
+    def __repr__(self):
+        return "<lastfm.CrawlCoordinator: %s crawl at %s>" % (self._kind.__name__, self._path)
+
+def _key(hash_attrs, item):
+    if isinstance(item, dict):
+        values = dict((a, item[a]) for a in hash_attrs)
+    else:
+        values = dict((a, getattr(item, a)) for a in hash_attrs)
+    return json.dumps(values, sort_keys = True)
+
+def _hash_dict(key):
+    return dict((str(a), v) for a, v in json.loads(key).items())
+
+import os
+import socket
+import sqlite3
+import time
+
+from lastfm.error import InvalidParametersError, LastfmError
+from lastfm.util import SharedRateLimiter, logging
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
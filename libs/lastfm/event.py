@@ -113,14 +113,15 @@ class Event(LastfmBase):
         
         @note: Use the L{Api.get_event} method instead of using this method directly.
         """
+        values = _EVENT(data)
         start_date = None
 
-        if data.findtext('startTime') is not None:
+        if values['start_time'] is not None:
             start_date = datetime(*(
                 time.strptime(
                     "%s %s" % (
-                        data.findtext('startDate').strip(),
-                        data.findtext('startTime').strip()
+                        values['start_date'].strip(),
+                        values['start_time'].strip()
                     ),
                     '%a, %d %b %Y %H:%M'
                 )[0:6])
@@ -129,7 +130,7 @@ class Event(LastfmBase):
             try:
                 start_date = datetime(*(
                     time.strptime(
-                        data.findtext('startDate').strip(),
+                        values['start_date'].strip(),
                         '%a, %d %b %Y %H:%M:%S'
                     )[0:6])
                 )
@@ -137,51 +138,48 @@ class Event(LastfmBase):
                 try:
                     start_date = datetime(*(
                         time.strptime(
-                            data.findtext('startDate').strip(),
+                            values['start_date'].strip(),
                             '%a, %d %b %Y'
                         )[0:6])
                     )
                 except ValueError:
                     pass
 
-        latitude = data.findtext('venue/location/{%s}point/{%s}lat' % ((Location.XMLNS,)*2))
-        longitude = data.findtext('venue/location/{%s}point/{%s}long' % ((Location.XMLNS,)*2))
-        
         return Event(
                      api,
-                     id = int(data.findtext('id')),
-                     title = data.findtext('title'),
-                     artists = [Artist(api, name = a.text) for a in data.findall('artists/artist')],
-                     headliner = Artist(api, name = data.findtext('artists/headliner')),
+                     id = values['id'],
+                     title = values['title'],
+                     artists = [Artist(api, name = a) for a in values['artists']],
+                     headliner = Artist(api, name = values['headliner']),
                      venue = Venue(
                                    api,
-                                   id = int(data.findtext('venue/url').split('/')[-1]),
-                                   name = data.findtext('venue/name'),
+                                   id = int(values['venue_url'].split('/')[-1]),
+                                   name = values['venue_name'],
                                    location = Location(
                                        api,
-                                       city = data.findtext('venue/location/city'),
+                                       city = values['city'],
                                        country = Country(
                                             api,
-                                            name = data.findtext('venue/location/country')
+                                            name = values['country']
                                             ),
-                                       street = data.findtext('venue/location/street'),
-                                       postal_code = data.findtext('venue/location/postalcode'),
-                                       latitude = (latitude.strip()!= '') and float(latitude) or None,
-                                       longitude = (longitude.strip()!= '') and float(longitude) or None,
+                                       street = values['street'],
+                                       postal_code = values['postal_code'],
+                                       latitude = values['latitude'],
+                                       longitude = values['longitude'],
                                        #timezone = data.findtext('venue/location/timezone')
                                        ),
-                                   url = data.findtext('venue/url')
+                                   url = values['venue_url']
                                    ),
                      start_date = start_date,
-                     description = data.findtext('description'),
-                     image = dict([(i.get('size'), i.text) for i in data.findall('image')]),
-                     url = data.findtext('url'),
+                     description = values['description'],
+                     image = values['image'],
+                     url = values['url'],
                      stats = Stats(
-                                   subject = int(data.findtext('id')),
-                                   attendance = int(data.findtext('attendance')),
-                                   reviews = int(data.findtext('reviews')),
+                                   subject = values['id'],
+                                   attendance = values['attendance'],
+                                   reviews = values['reviews'],
                                    ),
-                     tag = data.findtext('tag')
+                     tag = values['tag']
                     )
 
     @staticmethod
@@ -228,4 +226,37 @@ from lastfm.artist import Artist
 from lastfm.error import InvalidParametersError
 from lastfm.geo import Location, Country
 from lastfm.stats import Stats
+from lastfm.util.decoder import Decoder
 from lastfm.venue import Venue
+
+def _coordinate(text):
+    # a blank coordinate is None
+    text = text.strip()
+    if not text:
+        return None
+    return float(text)
+
+_POINT = '{%s}point/{%s}%%s' % ((Location.XMLNS,)*2)
+
+_EVENT = Decoder(
+    id = ('id', int),
+    title = 'title',
+    artists = 'artists/artist[]',
+    headliner = 'artists/headliner',
+    venue_name = 'venue/name',
+    venue_url = 'venue/url',
+    city = 'venue/location/city',
+    country = 'venue/location/country',
+    street = 'venue/location/street',
+    postal_code = 'venue/location/postalcode',
+    latitude = ('venue/location/' + _POINT % 'lat', _coordinate),
+    longitude = ('venue/location/' + _POINT % 'long', _coordinate),
+    start_date = 'startDate',
+    start_time = 'startTime',
+    description = 'description',
+    image = 'image[size]',
+    url = 'url',
+    attendance = ('attendance', int),
+    reviews = ('reviews', int),
+    tag = 'tag',
+)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+"""Module for exporting the music library of a user to files"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+class LibraryExporter(object):
+    """
+    Streaming exporter for the music library of a user. Each page of the library
+    is written out as soon as it arrives, as plain records rather than entity
+    objects, so memory use does not grow with the size of the library. After
+    every page the exporter writes a checkpoint, and an export interrupted by
+    an error picks up after the last finished page when it is run again.
+    """
+    ENTITIES = {
+        'albums': ['name', 'artist', 'artist_mbid', 'mbid', 'playcount', 'url'],
+        'artists': ['name', 'mbid', 'playcount', 'tagcount', 'url'],
+        'tracks': ['name', 'artist', 'artist_mbid', 'mbid', 'playcount', 'tagcount', 'url'],
+    }
+    """Exportable library sections, with the fields of their records"""
+
+    FORMATS = ['jsonl', 'csv']
+    """Supported output formats"""
+
+    def __init__(self, library, entity, path,
+                 format = 'jsonl', checkpoint = None, limit = None):
+        """
+        Create an exporter.
+
+        @param library:       the library to export
+        @type library:        L{User.Library}
+        @param entity:        one of the keys of L{LibraryExporter.ENTITIES}
+        @type entity:         L{str}
+        @param path:          path of the output file
+        @type path:           L{str}
+        @param format:        one of L{LibraryExporter.FORMATS} (optional)
+        @type format:         L{str}
+        @param checkpoint:    path of the checkpoint file, the output path with
+                              '.checkpoint' appended by default (optional)
+        @type checkpoint:     L{str}
+        @param limit:         number of records fetched per page (optional)
+        @type limit:          L{int}
+
+        @raise InvalidParametersError: If the entity or the format is not supported
+                                       then an exception is raised.
+        """
+        if entity not in LibraryExporter.ENTITIES:
+            raise InvalidParametersError(
+                "entity has to be one of %s" % LibraryExporter.ENTITIES.keys())
+        if format not in LibraryExporter.FORMATS:
+            raise InvalidParametersError(
+                "format has to be one of %s" % LibraryExporter.FORMATS)
+        self._library = library
+        self._entity = entity
+        self._path = path
+        self._format = format
+        self._checkpoint = checkpoint or "%s.checkpoint" % path
+        self._limit = limit
+
+    @property
+    def fields(self):
+        """
+        fields of the exported records
+        @rtype: L{list} of L{str}
+        """
+        return LibraryExporter.ENTITIES[self._entity][:]
+
+    @property
+    def progress(self):
+        """
+        the saved progress of the export, with the keys 'page', 'total_pages',
+        'records' and 'offset', or None if nothing has been exported yet
+        @rtype: L{dict}
+        """
+        if not os.path.exists(self._checkpoint):
+            return None
+        fp = open(self._checkpoint)
+        try:
+            return json.load(fp)
+        finally:
+            fp.close()
+
+    def run(self, callback = None):
+        """
+        Export the library, resuming from the checkpoint if there is one. The
+        checkpoint is removed once the last page has been written.
+
+        @param callback:    function called with the page number and the total
+                            number of pages after each page is written (optional)
+        @type callback:     C{function}
+
+        @return:            the number of records in the output file
+        @rtype:             L{int}
+        """
+        progress = self.progress
+        if progress is not None and progress['entity'] != self._entity:
+            raise InvalidParametersError(
+                "%s belongs to an export of %s" % (self._checkpoint, progress['entity']))
+        if progress is None or not os.path.exists(self._path):
+            progress = {'entity': self._entity, 'page': 0,
+                        'total_pages': None, 'records': 0, 'offset': 0}
+
+        fp = open(self._path, progress['offset'] and 'r+b' or 'wb')
+        try:
+            # drop whatever was written after the last checkpoint
+            fp.seek(progress['offset'])
+            fp.truncate()
+            writer = self._writer(fp, write_header = (progress['offset'] == 0))
+            page = progress['page'] + 1
+            while progress['total_pages'] is None or page <= progress['total_pages']:
+                total_pages, records = self._fetch_page(page)
+                for r in records:
+                    writer(r)
+                    progress['records'] += 1
+                fp.flush()
+                os.fsync(fp.fileno())
+                progress.update({'page': page, 'total_pages': total_pages,
+                                 'offset': fp.tell()})
+                self._save_progress(progress)
+                if callback is not None:
+                    callback(page, total_pages)
+                page += 1
+        finally:
+            fp.close()
+        os.remove(self._checkpoint)
+        return progress['records']
+
+    def _writer(self, fp, write_header):
+        fields = self.fields
+        if self._format == 'csv':
+            w = csv.writer(fp)
+            if write_header:
+                w.writerow(fields)
+            def write(record):
+                w.writerow([self._csv_value(record[f]) for f in fields])
+        else:
+            def write(record):
+                fp.write(json.dumps(record))
+                fp.write("\n")
+        return write
+
+    @staticmethod
+    def _csv_value(value):
+        if value is None:
+            return ''
+        if isinstance(value, unicode):
+            return value.encode('utf-8')
+        return value
+
+    def _save_progress(self, progress):
+        temp_path = "%s.tmp" % self._checkpoint
+        fp = open(temp_path, 'w')
+        try:
+            json.dump(progress, fp)
+        finally:
+            fp.close()
+        if os.path.exists(self._checkpoint):
+            os.remove(self._checkpoint)
+        os.rename(temp_path, self._checkpoint)
+
+    def _fetch_page(self, page):
+        library = self._library
+        params = library._default_params({'method': 'library.get%s' % self._entity.capitalize()})
+        if self._limit is not None:
+            params.update({'limit': self._limit})
+        params.update({'page': page})
+        data = library._api._fetch_data(params).find(self._entity)
+        total_pages = int(data.attrib['totalPages'])
+
+        def int_or_none(text):
+            if text and text.strip():
+                return int(text)
+            return None
+
+        records = []
+        for e in data.findall(self._entity[:-1]):
+            record = {
+                      'name': e.findtext('name'),
+                      'mbid': e.findtext('mbid') or None,
+                      'playcount': int_or_none(e.findtext('playcount')),
+                      'url': e.findtext('url')
+                      }
+            if self._entity != 'albums':
+                record['tagcount'] = int_or_none(e.findtext('tagcount'))
+            if self._entity != 'artists':
+                record['artist'] = e.findtext('artist/name')
+                record['artist_mbid'] = e.findtext('artist/mbid') or None
+            records.append(record)
+        return (total_pages, records)
+
+    def __repr__(self):
+        return "<lastfm.LibraryExporter: %s of %s to %s>" % \
+            (self._entity, self._library.user.name, self._path)
+
+import csv
+import os
+
+from lastfm.error import InvalidParametersError
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
@@ -57,11 +57,11 @@ class Geo(object):
         if page is not None:
             params.update({'page': page})
             
-        data = api._fetch_data(params).find('events')
+        data = api._fetch_data(params, stream = True)
         total_pages = int(data.attrib['totalpages'])
         yield total_pages
         
-        for e in data.findall('event'):
+        for e in data.rows('event'):
             yield Event.create_from_data(api, e)
 
     @staticmethod
@@ -125,25 +125,25 @@ class Geo(object):
         return [
                 Track(
                        api,
-                       name = t.findtext('name'),
-                       mbid = t.findtext('mbid'),
+                       name = r['name'],
+                       mbid = r['mbid'],
                        artist = Artist(
                                        api,
-                                       name = t.findtext('artist/name'),
-                                       mbid = t.findtext('artist/mbid'),
-                                       url = t.findtext('artist/url')
+                                       name = r['artist_name'],
+                                       mbid = r['artist_mbid'],
+                                       url = r['artist_url']
                                        ),
                        stats = Stats(
-                                     subject = t.findtext('name'),
-                                     rank = int(t.attrib['rank']),
-                                     playcount = int(t.findtext('playcount'))
+                                     subject = r['name'],
+                                     rank = r['rank'],
+                                     playcount = r['playcount']
                                      ),
-                       streamable = (t.findtext('streamable') == '1'),
-                       full_track = (t.find('streamable').attrib['fulltrack'] == '1'),
-                       url = 'http://' + t.findtext('url'),
-                       image = {'large': t.findtext('image')}
+                       streamable = (r['streamable'] == '1'),
+                       full_track = (r['full_track'] == '1'),
+                       url = 'http://' + r['url'],
+                       image = {'large': r['image']}
                        )
-                for t in data.findall('track')
+                for r in _TOP_TRACK.decode_all(data, 'track')
                 ]
 
 @mixin("crawlable", "cacheable", "property_adder")
@@ -618,3 +618,18 @@ from lastfm.error import InvalidParametersError
 from lastfm.event import Event
 from lastfm.stats import Stats
 from lastfm.track import Track
+from lastfm.util.decoder import Decoder, integer
+
+_TOP_TRACK = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    url = 'url',
+    artist_name = 'artist/name',
+    artist_mbid = 'artist/mbid',
+    artist_url = 'artist/url',
+    streamable = 'streamable',
+    full_track = 'streamable@fulltrack',
+    image = 'image',
+    rank = ('@rank', integer),
+    playcount = ('playcount', integer),
+)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+"""Module for querying events and venues by place and date locally"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from threading import Lock
+import math
+
+EARTH_RADIUS = 6371.0
+"""Mean radius of the earth, in kilometers"""
+
+class EventIndex(object):
+    """
+    A local index of events and their venues, answering radius, bounding
+    box and date range queries without calling the web service. The events
+    are kept in a grid of latitude/longitude cells, so a query only looks at
+    the events of the cells it overlaps. The index is filled from events
+    fetched elsewhere or by L{refresh}, which adds new events, updates the
+    known ones and drops the events which are over.
+    """
+    def __init__(self, api, cell_size = 0.5):
+        """
+        Create an empty index.
+
+        @param api:          an instance of L{Api}
+        @type api:           L{Api}
+        @param cell_size:    size of the grid cells, in degrees (optional)
+        @type cell_size:     L{float}
+        """
+        self._api = api
+        self._cell_size = float(cell_size)
+        self._cells = {}
+        self._events = {}
+        self._venues = {}
+        self._lock = Lock()
+
+    @property
+    def events(self):
+        """
+        the indexed events, ordered by start date
+        @rtype: L{list} of L{Event}
+        """
+        with self._lock:
+            return _by_date(e for (e, c) in self._events.values())
+
+    @property
+    def venues(self):
+        """
+        the venues of the indexed events
+        @rtype: L{list} of L{Venue}
+        """
+        with self._lock:
+            return self._venues.values()
+
+    def add_event(self, event):
+        """
+        Add an event to the index, replacing the event with the same id.
+        Events whose venue has no coordinates are not indexed.
+
+        @param event:    the event
+        @type event:     L{Event}
+
+        @return:         True if the event was indexed
+        @rtype:          L{bool}
+        """
+        point = _point(event)
+        if point is None:
+            return False
+        cell = self._cell(*point)
+        with self._lock:
+            self._remove(event.id)
+            self._events[event.id] = (event, cell)
+            self._cells.setdefault(cell, set()).add(event.id)
+            if event.venue.id is not None:
+                self._venues[event.venue.id] = event.venue
+        return True
+
+    def add_events(self, events):
+        """
+        Add events to the index.
+
+        @param events:    the events
+        @type events:     iterable of L{Event}
+
+        @return:          number of events indexed
+        @rtype:           L{int}
+        """
+        return len([e for e in events if self.add_event(e)])
+
+    def remove_event(self, event):
+        """
+        Remove an event from the index.
+
+        @param event:    the event or its id
+        @type event:     L{Event} OR L{int}
+        """
+        with self._lock:
+            self._remove(getattr(event, 'id', event))
+
+    def expire(self, now = None):
+        """
+        Remove the events which started before a time.
+
+        @param now:    the time (optional)
+        @type now:     C{datetime.datetime}
+
+        @return:       number of events removed
+        @rtype:        L{int}
+        """
+        now = now or datetime.now()
+        with self._lock:
+            expired = [i for (i, (e, c)) in self._events.items()
+                       if e.start_date is not None and e.start_date < now]
+            for i in expired:
+                self._remove(i)
+        return len(expired)
+
+    def refresh(self, location = None, latitude = None, longitude = None,
+                distance = None, limit = None):
+        """
+        Fetch the events of a location from the web service into the index,
+        and drop the events which are over.
+
+        @param location:     location to fetch the events of (optional)
+        @type location:      L{str} OR L{Location}
+        @param latitude:     latitude to fetch the events around (optional)
+        @type latitude:      L{float}
+        @param longitude:    longitude to fetch the events around (optional)
+        @type longitude:     L{float}
+        @param distance:     distance around the location to fetch the events in,
+                             in kilometers (optional)
+        @type distance:      L{float}
+        @param limit:        maximum number of events fetched (optional)
+        @type limit:         L{int}
+
+        @return:             number of events fetched
+        @rtype:              L{int}
+
+        @raise InvalidParametersError: Either location or latitude and longitude
+                                       has to be provided.
+        """
+        if isinstance(location, Location):
+            location, latitude, longitude = location.city, location.latitude, location.longitude
+        events = Geo.get_events(self._api, location, latitude, longitude, distance)
+        fetched = 0
+        try:
+            for event in events:
+                if event is None:
+                    continue
+                self.add_event(event)
+                fetched += 1
+                if limit is not None and fetched >= limit:
+                    break
+        except LastfmError as ex:
+            logging.log_silenced_exceptions(ex)
+        self.expire()
+        return fetched
+
+    def within_radius(self, latitude, longitude, radius, start = None, end = None):
+        """
+        Find the events around a point.
+
+        @param latitude:     latitude of the point
+        @type latitude:      L{float}
+        @param longitude:    longitude of the point
+        @type longitude:     L{float}
+        @param radius:       distance from the point, in kilometers
+        @type radius:        L{float}
+        @param start:        only the events starting at or after this time (optional)
+        @type start:         C{datetime.datetime}
+        @param end:          only the events starting before this time (optional)
+        @type end:           C{datetime.datetime}
+
+        @return:             the events and their distances from the point in
+                             kilometers, nearest first
+        @rtype:              L{list} of (L{Event}, L{float})
+        """
+        dlat = math.degrees(radius / EARTH_RADIUS)
+        coslat = math.cos(math.radians(min(abs(latitude) + dlat, 90.0)))
+        dlong = coslat > 1e-9 and min(180.0, dlat / coslat) or 180.0
+        found = []
+        for event in self._candidates(latitude - dlat, longitude - dlong,
+                                      latitude + dlat, longitude + dlong, start, end):
+            d = distance(latitude, longitude, *_point(event))
+            if d <= radius:
+                found.append((event, d))
+        found.sort(key = lambda p: p[1])
+        return found
+
+    def within_box(self, south, west, north, east, start = None, end = None):
+        """
+        Find the events in a bounding box. The box crosses the 180th meridian
+        if west is greater than east.
+
+        @param south:    southern latitude of the box
+        @type south:     L{float}
+        @param west:     western longitude of the box
+        @type west:      L{float}
+        @param north:    northern latitude of the box
+        @type north:     L{float}
+        @param east:     eastern longitude of the box
+        @type east:      L{float}
+        @param start:    only the events starting at or after this time (optional)
+        @type start:     C{datetime.datetime}
+        @param end:      only the events starting before this time (optional)
+        @type end:       C{datetime.datetime}
+
+        @return:         the events, ordered by start date
+        @rtype:          L{list} of L{Event}
+        """
+        if west > east:
+            east += 360
+        found = []
+        for event in self._candidates(south, west, north, east, start, end):
+            lat, lng = _point(event)
+            if lng < west:
+                lng += 360
+            if south <= lat <= north and west <= lng <= east:
+                found.append(event)
+        return _by_date(found)
+
+    def between(self, start = None, end = None):
+        """
+        Find the events starting in a date range.
+
+        @param start:    only the events starting at or after this time (optional)
+        @type start:     C{datetime.datetime}
+        @param end:      only the events starting before this time (optional)
+        @type end:       C{datetime.datetime}
+
+        @return:         the events, ordered by start date
+        @rtype:          L{list} of L{Event}
+        """
+        with self._lock:
+            return _by_date(e for (e, c) in self._events.values()
+                            if _in_range(e, start, end))
+
+    def venues_within_radius(self, latitude, longitude, radius):
+        """
+        Find the venues of the indexed events around a point.
+
+        @param latitude:     latitude of the point
+        @type latitude:      L{float}
+        @param longitude:    longitude of the point
+        @type longitude:     L{float}
+        @param radius:       distance from the point, in kilometers
+        @type radius:        L{float}
+
+        @return:             the venues and their distances from the point in
+                             kilometers, nearest first
+        @rtype:              L{list} of (L{Venue}, L{float})
+        """
+        venues = {}
+        for event, d in self.within_radius(latitude, longitude, radius):
+            venues.setdefault(event.venue.id, (event.venue, d))
+        return sorted(venues.values(), key = lambda p: p[1])
+
+    def _cell(self, latitude, longitude):
+        return (int(math.floor(latitude / self._cell_size)),
+                int(math.floor(longitude / self._cell_size)))
+
+    def _candidates(self, south, west, north, east, start, end):
+        columns = int(math.ceil(360 / self._cell_size))
+        (i0, j0), (i1, j1) = self._cell(max(south, -90.0), west), \
+            self._cell(min(north, 90.0), east)
+        if j1 - j0 >= columns:
+            j0, j1 = 0, columns - 1
+        with self._lock:
+            found = []
+            for i in xrange(i0, i1 + 1):
+                for j in xrange(j0, j1 + 1):
+                    # longitudes are wrapped to [-180, 180) when indexed
+                    j = (j + columns / 2) % columns - columns / 2
+                    for event_id in self._cells.get((i, j), ()):
+                        event = self._events[event_id][0]
+                        if _in_range(event, start, end):
+                            found.append(event)
+            return found
+
+    def _remove(self, event_id):
+        # called with the lock held
+        if event_id in self._events:
+            event, cell = self._events.pop(event_id)
+            self._cells[cell].discard(event_id)
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def __len__(self):
+        return len(self._events)
+
+    def __repr__(self):
+        return "<lastfm.EventIndex: %s events at %s venues>" % \
+            (len(self._events), len(self._venues))
+
+def distance(latitude1, longitude1, latitude2, longitude2):
+    """
+    Great circle distance between two points.
+
+    @param latitude1:     latitude of the first point
+    @type latitude1:      L{float}
+    @param longitude1:    longitude of the first point
+    @type longitude1:     L{float}
+    @param latitude2:     latitude of the second point
+    @type latitude2:      L{float}
+    @param longitude2:    longitude of the second point
+    @type longitude2:     L{float}
+
+    @return:              the distance, in kilometers
+    @rtype:               L{float}
+    """
+    lat1, lat2 = math.radians(latitude1), math.radians(latitude2)
+    dlat = lat2 - lat1
+    dlong = math.radians(longitude2 - longitude1)
+    a = math.sin(dlat / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin(dlong / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+def _point(event):
+    location = event.venue is not None and event.venue.location or None
+    if location is None or location.latitude is None or location.longitude is None:
+        return None
+    longitude = (location.longitude + 180.0) % 360.0 - 180.0
+    return (location.latitude, longitude)
+
+def _in_range(event, start, end):
+    if start is None and end is None:
+        return True
+    if event.start_date is None:
+        return False
+    return (start is None or event.start_date >= start) and \
+        (end is None or event.start_date < end)
+
+def _by_date(events):
+    return sorted(events, key = lambda e: (e.start_date is None, e.start_date))
+
+from datetime import datetime
+
+from lastfm.error import LastfmError
+from lastfm.geo import Geo, Location
+from lastfm.util import logging
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""Module for building the listening history of a subject from its weekly charts"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from lastfm.util import SparseMatrix, logging
+
+class ListeningHistory(object):
+    """
+    The listening history of a user, group or tag, as a sparse item x week
+    matrix of playcounts (or weights). The weekly charts are read straight
+    from the web service responses one week at a time, so no chart, artist or
+    track objects are created or kept alive while the history is built.
+    """
+    CHART_TYPES = ['artist', 'album', 'track']
+    """Types of the weekly charts a history can be built from"""
+
+    def __init__(self, subject, chart_type = 'artist'):
+        """
+        Create an empty history for a subject. Call L{update} to fill it.
+
+        @param subject:       the subject of the charts
+        @type subject:        L{User} OR L{Group} OR L{Tag}
+        @param chart_type:    one of L{ListeningHistory.CHART_TYPES} (optional)
+        @type chart_type:     L{str}
+
+        @raise InvalidParametersError: If the chart type is not supported by
+                                       the subject then an exception is raised.
+        """
+        if chart_type not in ListeningHistory.CHART_TYPES or \
+                not hasattr(subject, 'get_weekly_%s_chart' % chart_type):
+            raise InvalidParametersError(
+                "%s does not have weekly %s charts" % (subject, chart_type))
+        self._subject = subject
+        self._chart_type = chart_type
+        self._matrix = SparseMatrix()
+        self._weeks = {}
+
+    @property
+    def subject(self):
+        """
+        subject of the history
+        @rtype: L{User} OR L{Group} OR L{Tag}
+        """
+        return self._subject
+
+    @property
+    def chart_type(self):
+        """
+        type of the charts the history is built from
+        @rtype: L{str}
+        """
+        return self._chart_type
+
+    @property
+    def matrix(self):
+        """
+        the item x week matrix. Rows are labelled by artist name, or by
+        'name::artist' for albums and tracks, and columns by the start
+        of the week as a UNIX timestamp.
+        @rtype: L{SparseMatrix}
+        """
+        return self._matrix
+
+    @property
+    def weeks(self):
+        """
+        the weeks present in the history, in chronological order
+        @rtype: L{list} of L{tuple} of C{datetime.datetime}
+        """
+        return [(datetime.utcfromtimestamp(start), datetime.utcfromtimestamp(end))
+                for (start, end) in sorted(self._weeks.items())]
+
+    @property
+    def items(self):
+        """
+        labels of the items present in the history
+        @rtype: L{list} of L{str}
+        """
+        return self._matrix.row_labels
+
+    def update(self, since = None, until = None):
+        """
+        Fetch the weekly charts that are not yet in the history and append them
+        as new columns. Charts which could not be fetched are skipped and tried
+        again on the next update.
+
+        @param since:    ignore the weeks starting before this date (optional)
+        @type since:     C{datetime.datetime}
+        @param until:    ignore the weeks ending after this date (optional)
+        @type until:     C{datetime.datetime}
+
+        @return:         the number of weeks appended
+        @rtype:          L{int}
+        """
+        since = since is not None and calendar.timegm(since.timetuple()) or None
+        until = until is not None and calendar.timegm(until.timetuple()) or None
+        appended = 0
+        for start, end in self._chart_list():
+            if start in self._weeks:
+                continue
+            if (since is not None and start < since) or \
+                    (until is not None and end > until):
+                continue
+            try:
+                cells = self._chart_cells(start, end)
+            except LastfmError as ex:
+                logging.log_silenced_exceptions(ex)
+                continue
+            self._matrix.append_column(start, cells)
+            self._weeks[start] = end
+            appended += 1
+        return appended
+
+    def series(self, item):
+        """
+        Get the weekly counts of an item.
+
+        @param item:    the item label, as in L{items}
+        @type item:     L{str}
+
+        @return:        (start of week, count) pairs in chronological order,
+                        for every week in the history
+        @rtype:         L{list} of L{tuple}
+        """
+        row = self._matrix.row(item)
+        return [(datetime.utcfromtimestamp(start), row.get(start, 0))
+                for start in sorted(self._weeks)]
+
+    def save(self, path):
+        """
+        Write the history to a file.
+
+        @param path:    path of the file
+        @type path:     L{str}
+        """
+        fp = open(path, 'wb')
+        try:
+            cPickle.dump({
+                          'subject': (self._subject.__class__.__name__, self._subject.name),
+                          'chart_type': self._chart_type,
+                          'weeks': self._weeks
+                          }, fp, cPickle.HIGHEST_PROTOCOL)
+            self._matrix.save(fp)
+        finally:
+            fp.close()
+
+    @staticmethod
+    def load(subject, path):
+        """
+        Read a history written by L{save}. The history can then be brought up to
+        date with L{update}.
+
+        @param subject:    the subject of the history
+        @type subject:     L{User} OR L{Group} OR L{Tag}
+        @param path:       path of the file
+        @type path:        L{str}
+
+        @return:           the history
+        @rtype:            L{ListeningHistory}
+
+        @raise InvalidParametersError: If the file holds the history of some other
+                                       subject then an exception is raised.
+        """
+        fp = open(path, 'rb')
+        try:
+            header = cPickle.load(fp)
+            if header['subject'] != (subject.__class__.__name__, subject.name):
+                raise InvalidParametersError(
+                    "%s does not hold the history of %s" % (path, subject))
+            history = ListeningHistory(subject, header['chart_type'])
+            history._weeks = header['weeks']
+            history._matrix = SparseMatrix.load(fp)
+        finally:
+            fp.close()
+        return history
+
+    def _chart_list(self):
+        params = self._subject._default_params(
+            {'method': '%s.getWeeklyChartList' % self._subject.__class__.__name__.lower()})
+        data = self._subject._api._fetch_data(params).find('weeklychartlist')
+        return [(int(c.attrib['from']), int(c.attrib['to']))
+                for c in data.findall('chart')]
+
+    def _chart_cells(self, start, end):
+        params = self._subject._default_params({
+            'method': '%s.getWeekly%sChart' % (
+                self._subject.__class__.__name__.lower(), self._chart_type.capitalize()),
+            'from': start,
+            'to': end
+            })
+        data = self._subject._api._fetch_data(params).find(
+            'weekly%schart' % self._chart_type)
+        cells = []
+        for e in data.findall(self._chart_type):
+            name = e.findtext('name')
+            if self._chart_type != 'artist':
+                name = "::".join((name, e.findtext('artist')))
+            count = e.findtext('playcount') or e.findtext('weight')
+            if count:
+                cells.append((name, int(float(count))))
+        return cells
+
+    def __repr__(self):
+        return "<lastfm.ListeningHistory: %s chart history of %s, %s items over %s weeks>" % \
+            (self._chart_type, self._subject, self._matrix.shape[0], len(self._weeks))
+
+from datetime import datetime
+import calendar
+import cPickle
+
+from lastfm.error import InvalidParametersError, LastfmError
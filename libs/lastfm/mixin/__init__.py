@@ -14,13 +14,23 @@ from lastfm.mixin._chartable import chartable
 from lastfm.mixin._crawlable import crawlable
 from lastfm.mixin._propertyadder import property_adder
 
+_mixins = {
+    'cacheable': cacheable,
+    'searchable': searchable,
+    'sharable': sharable,
+    'shoutable': shoutable,
+    'taggable': taggable,
+    'crawlable': crawlable,
+    'property_adder': property_adder,
+}
+
 def mixin(*mixins):
+    decorators = [_mixins[m] for m in reversed(mixins) if m in _mixins]
     def wrapper(cls):
-        for m in reversed(mixins):
-            if m in __all__:
-                cls = eval(m)(cls)
+        for d in decorators:
+            cls = d(cls)
         return cls
     return wrapper
 
-__all__ = ['cacheable', 'searchable', 'sharable', 'shoutable', 'taggable'
+__all__ = ['cacheable', 'searchable', 'sharable', 'shoutable', 'taggable',
            'chartable','crawlable', 'property_adder']
\ No newline at end of file
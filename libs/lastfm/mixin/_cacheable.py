@@ -36,6 +36,8 @@ def cacheable(cls):
             inst, already_registered = ObjectCache.register(object.__new__(cls), key)
             if not already_registered:
                 inst.init(*args, **kwds)
+        if not already_registered:
+            ObjectCache.initialised(inst)
         return inst
         
     @staticmethod
@@ -5,6 +5,7 @@ __version__ = "0.2"
 __license__ = "GNU Lesser General Public License"
 __package__ = "lastfm.mixin"
 
+from threading import Condition, Thread
 from lastfm.util import lazylist, logging
 from lastfm.decorators import cached_property
 
@@ -58,7 +59,7 @@ def chartable(*chart_types):
             params = self._default_params(
                 {'method': '%s.getWeeklyAlbumChart' % self.__class__.__name__.lower()})
             params = WeeklyChart._check_chart_params(params, self, start, end)
-            data = self._api._fetch_data(params).find('weeklyalbumchart')
+            data = self._api._fetch_data(params, stream = True)
             return WeeklyAlbumChart.create_from_data(self._api, self, data)
     
         @cached_property
@@ -154,7 +155,7 @@ def chartable(*chart_types):
             params = self._default_params(
                 {'method': '%s.getWeeklyArtistChart' % self.__class__.__name__.lower()})
             params = WeeklyChart._check_chart_params(params, self, start, end)
-            data = self._api._fetch_data(params).find('weeklyartistchart')
+            data = self._api._fetch_data(params, stream = True)
             return WeeklyArtistChart.create_from_data(self._api, self, data)
     
         @cached_property
@@ -250,7 +251,7 @@ def chartable(*chart_types):
             params = self._default_params(
                 {'method': '%s.getWeeklyTrackChart' % self.__class__.__name__.lower()})
             params = WeeklyChart._check_chart_params(params, self, start, end)
-            data = self._api._fetch_data(params).find('weeklytrackchart')
+            data = self._api._fetch_data(params, stream = True)
             return WeeklyTrackChart.create_from_data(self._api, self, data)
     
         @cached_property
@@ -443,9 +444,132 @@ def chartable(*chart_types):
             for method_name in method_names:
                 setattr(cls, method_name % chart_type, locals()[method_name % chart_type])
                 cls._mixins.append(method_name % chart_type)
+            for period in ['weekly', 'monthly']:
+                method_name = 'iter_%s_%s_charts' % (period, chart_type)
+                setattr(cls, method_name, _chart_iterator(period, chart_type))
+                cls._mixins.append(method_name)
         
         return cls
     return wrapper
 
+def _chart_iterator(period, chart_type):
+    def iter_charts(self, since = None, until = None, workers = 1):
+        if period == 'weekly':
+            dates = _weekly_chart_dates(self)
+            if chart_type == 'tag':
+                get_chart = lambda (start, end): self.get_weekly_tag_chart(start, end)
+            else:
+                get_chart = lambda (start, end): _get_weekly_chart(self, chart_type, start, end)
+        else:
+            from lastfm.chart import MonthlyChart
+            dates = [(c.start, c.end) for c in MonthlyChart.get_chart_list(self)]
+            get_chart = lambda (start, end): getattr(
+                self, 'get_monthly_%s_chart' % chart_type)(start, end)
+        dates = [(start, end) for (start, end) in dates
+                 if (since is None or start >= since) and (until is None or end <= until)]
+        def get_or_skip(dates):
+            try:
+                return get_chart(dates)
+            except LastfmError as ex:
+                logging.log_silenced_exceptions(ex)
+        for chart in _ordered_map(get_or_skip, dates, workers):
+            if chart is not None:
+                yield chart
+    iter_charts.__name__ = 'iter_%s_%s_charts' % (period, chart_type)
+    iter_charts.__doc__ = """
+            Iterate over the %(period)s %(type)s charts for the group, in
+            chronological order. Unlike L{%(period)s_%(type)s_chart_list}, the
+            charts are not kept by the group, so each one can be garbage
+            collected once the next is read; the responses are still reused
+            from the file cache of the Api. Charts which can not be fetched
+            are skipped.
+            
+            @param since:      only the charts starting at or after this date (optional)
+            @type since:       C{datetime.datetime}
+            @param until:      only the charts ending at or before this date (optional)
+            @type until:       C{datetime.datetime}
+            @param workers:    number of charts fetched concurrently, ahead of
+                               the one being read (optional)
+            @type workers:     L{int}
+            
+            @return:           the charts
+            @rtype:            C{generator} of L{%(class)s}
+            """ % {'period': period, 'type': chart_type,
+                   'class': '%s%sChart' % (period.capitalize(), chart_type.capitalize())}
+    return iter_charts
+
+def _weekly_chart_dates(subject):
+    # the dates of the weekly charts, read from the response rather than from
+    # the weekly chart list, so that no chart object is kept
+    params = subject._default_params(
+        {'method': '%s.getWeeklyChartList' % subject.__class__.__name__.lower()})
+    data = subject._api._fetch_data(params).find('weeklychartlist')
+    return [(datetime.utcfromtimestamp(int(c.attrib['from'])),
+             datetime.utcfromtimestamp(int(c.attrib['to'])))
+            for c in data.findall('chart')]
+
+def _get_weekly_chart(subject, chart_type, start, end):
+    # like get_weekly_<type>_chart, without checking the dates against the
+    # weekly chart list, as they come from it
+    from lastfm.chart import Chart, WeeklyAlbumChart, WeeklyArtistChart, WeeklyTrackChart
+    chart_class = {'album': WeeklyAlbumChart, 'artist': WeeklyArtistChart,
+                   'track': WeeklyTrackChart}[chart_type]
+    params = subject._default_params({'method': '%s.getWeekly%sChart' % (
+        subject.__class__.__name__.lower(), chart_type.capitalize())})
+    params = Chart._check_chart_params(params, subject, start, end)
+    data = subject._api._fetch_data(params, stream = True)
+    return chart_class.create_from_data(subject._api, subject, data)
+
+def _ordered_map(func, items, workers):
+    # call a function on the items over a few threads, yielding the results
+    # in order. At most twice as many results as workers are computed ahead
+    # of the one yielded, and the threads stop when the iteration does.
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+    results = {}
+    state = {'next': 0, 'consumed': 0, 'stop': False}
+    ahead = 2 * workers
+    condition = Condition()
+    def work():
+        while True:
+            with condition:
+                while not state['stop'] and state['next'] < len(items) and \
+                        state['next'] - state['consumed'] >= ahead:
+                    condition.wait()
+                if state['stop'] or state['next'] >= len(items):
+                    return
+                i = state['next']
+                state['next'] += 1
+            try:
+                result = (True, func(items[i]))
+            except Exception, e:
+                result = (False, e)
+            with condition:
+                results[i] = result
+                condition.notify_all()
+
+    for i in xrange(min(workers, len(items))):
+        thread = Thread(target = work)
+        thread.setDaemon(True)
+        thread.start()
+    try:
+        for i in xrange(len(items)):
+            with condition:
+                while i not in results:
+                    condition.wait()
+                ok, result = results.pop(i)
+                state['consumed'] = i + 1
+                condition.notify_all()
+            if not ok:
+                raise result
+            yield result
+    finally:
+        with condition:
+            state['stop'] = True
+            condition.notify_all()
+
+from datetime import datetime
 from lastfm.error import LastfmError
     
\ No newline at end of file
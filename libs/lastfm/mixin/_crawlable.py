@@ -30,6 +30,8 @@ def crawlable(cls):
         return gen()
     
     cls.get_all = get_all
+    # kept for the crawlers outside the process, see L{CrawlCoordinator}
+    cls._crawl_spec = staticmethod(_get_all)
     delattr(cls, '_get_all')
         
     if not hasattr(cls, '_mixins'):
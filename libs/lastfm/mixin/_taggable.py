@@ -28,25 +28,20 @@ def taggable(cls):
     @authentication_required
     def add_tags(self, tags):
         from lastfm.tag import Tag
-        while(len(tags) > 10):
-            section = tags[0:9]
-            tags = tags[9:]
-            self.add_tags(section)
-        
-        if len(tags) == 0: return
-
         tagnames = []
         for tag in tags:
             if isinstance(tag, Tag):
                 tagnames.append(tag.name)
-            elif isinstance(tag, str):
+            elif isinstance(tag, basestring):
                 tagnames.append(tag)
-        
-        params = self._default_params({
-            'method': '%s.addTags' % self.__class__.__name__.lower(),
-            'tags': ",".join(tagnames)
-            })       
-        self._api._post_data(params)
+
+        # the API accepts at most 10 tags per call
+        for i in xrange(0, len(tagnames), 10):
+            params = self._default_params({
+                'method': '%s.addTags' % self.__class__.__name__.lower(),
+                'tags': ",".join(tagnames[i:i + 10])
+                })
+            self._api._post_data(params)
         self._tags = None
         
     @authentication_required
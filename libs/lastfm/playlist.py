@@ -12,22 +12,72 @@ from lastfm.decorators import cached_property
 @mixin("cacheable", "property_adder")
 class Playlist(LastfmBase):
     """A class representing an XPSF playlist."""
+    TRACK_FIELDS = ['title', 'creator', 'album', 'duration',
+                    'location', 'identifier', 'image', 'info']
+    """Fields of the tracks yielded by L{iter_tracks}"""
     
     class Meta(object):
         properties = ["url"]
     
     def init(self, api, url, **kwargs):
         self._api = api
-        self._data = None
+        self._raw = None
         self._url = url
 
     @cached_property
+    def raw(self):
+        """
+        playlist's XSPF document, as sent by last.fm
+        @rtype: L{str}
+        """
+        params = {'method': 'playlist.fetch', 'playlistURL': self._url}
+        xml = self._api._fetch_raw_data(params)
+        # only the start tag of the lfm element is read for the status
+        head = xml.find('<lfm')
+        start = head >= 0 and xml.find('>', head) + 1 or 0
+        if not start or 'status="ok"' not in xml[head:start]:
+            # raises the error sent by last.fm
+            self._api._check_xml(xml)
+        # the XSPF document is the only child of the lfm element, so it is
+        # cut out of the response instead of being parsed and written again
+        end = xml.rindex('</lfm>')
+        return xml[start:end].strip()
+
+    @property
     def data(self):
         """playlist's data"""
-        params = {'method': 'playlist.fetch', 'playlistURL': self._url}
-        tmp = StringIO.StringIO()
-        ElementTree.ElementTree(self._api._fetch_data(params)[0]).write(tmp)
-        return tmp.getvalue()
+        return self.raw
+
+    def iter_tracks(self):
+        """
+        Iterate over the tracks of the playlist without building the document
+        tree, so that only one track is held in memory at a time.
+
+        @return:    the tracks, as dicts with the keys 'title', 'creator',
+                    'album', 'duration' (in milliseconds), 'location',
+                    'identifier', 'image' and 'info'
+        @rtype:     iterator of L{dict}
+        """
+        track_list = None
+        for event, elem in ElementTree.iterparse(StringIO.StringIO(self.raw), ('start', 'end')):
+            tag = elem.tag.rpartition('}')[2]
+            if event == 'start':
+                if tag == 'trackList':
+                    track_list = elem
+                continue
+            if tag != 'track':
+                continue
+            track = dict((f, None) for f in Playlist.TRACK_FIELDS)
+            for child in elem:
+                field = child.tag.rpartition('}')[2]
+                if field in track:
+                    track[field] = child.text
+            if track['duration'] is not None:
+                track['duration'] = int(track['duration'])
+            elem.clear()
+            if track_list is not None:
+                track_list.clear()
+            yield track
     
     @staticmethod
     def fetch(api, url):
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""Module for fetching the info of many entities ahead of their use"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from lastfm.decorators import async_callback
+
+@async_callback
+def fill_many(entities, fields = None, workers = 4, callback = None):
+    """
+    Fetch the info of many albums, artists or tracks concurrently, filling
+    their fillable properties, so that reading them later does not call the
+    web service. Only the entities missing one of the fields are fetched, and
+    equal entities are fetched once and filled from the same response.
+    Pass a callback to run it in the background, ahead of the use of the
+    entities.
+
+    @param entities:    the entities
+    @type entities:     L{list} of L{Album} OR L{Artist} OR L{Track}
+    @param fields:      the properties to fill, the fillable properties of
+                        the class of each entity if not given (optional)
+    @type fields:       L{list} of L{str}
+    @param workers:     number of requests made concurrently (optional)
+    @type workers:      L{int}
+    @param callback:    callback function for asynchronous invocation (optional)
+    @type callback:     C{function}
+
+    @return:            the entities which could not be filled, and the errors
+    @rtype:             L{list} of (L{LastfmBase}, L{Exception})
+
+    @see:               L{async_callback}
+    """
+    groups = {}
+    order = []
+    seen = set()
+    for entity in entities:
+        if id(entity) in seen or not hasattr(entity, '_fill_info'):
+            continue
+        seen.add(id(entity))
+        if not _missing(entity, fields):
+            continue
+        key = (entity.__class__.__name__, hash(entity))
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(entity)
+
+    def fill(group):
+        group[0]._fill_info()
+        for entity in group[1:]:
+            _copy_info(group[0], entity)
+
+    failures = []
+    for group, e in run_workers(fill, [groups[k] for k in order], workers, (Exception,)):
+        failures.extend((entity, e) for entity in group)
+    return failures
+
+def _missing(entity, fields):
+    if fields is None:
+        fields = entity.Meta.fillable_properties
+    return [f for f in fields if getattr(entity, "_%s" % f, None) is None]
+
+def _copy_info(source, target):
+    # fill the properties the target does not have from an equal entity
+    for p in target.Meta.properties + target.Meta.fillable_properties:
+        attr = "_%s" % p
+        if getattr(target, attr, None) is None and getattr(source, attr, None) is not None:
+            setattr(target, attr, getattr(source, attr))
+
+from lastfm.util import run_workers
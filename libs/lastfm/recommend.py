@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+"""Module for recommending artists locally from the similar artists and the tags"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from threading import Lock
+
+class ArtistIndex(object):
+    """
+    A local artist recommender. Each indexed artist is a row of a sparse
+    artist x feature matrix, whose features are the artist itself, its similar
+    artists weighted by their match, and its top tags weighted by their count.
+    Two artists are close when they are similar to each other, share similar
+    artists or share tags.
+
+    The recommendations for a set of seed artists, like the top artists of a
+    user, are the rows nearest to the weighted sum of the seed rows, scored
+    in one pass over the columns of the matrix. The similar artists and the
+    tags are fetched through the Api, so they come from the file cache when
+    present, and new artists can be added at any time, as they are crawled.
+    """
+    def __init__(self, api, tag_weight = 0.5):
+        """
+        Create an empty index.
+
+        @param api:           an instance of L{Api}
+        @type api:            L{Api}
+        @param tag_weight:    weight of the tags relative to the similar
+                              artists, 0 to ignore the tags (optional)
+        @type tag_weight:     L{float}
+        """
+        self._api = api
+        self._tag_weight = tag_weight
+        self._matrix = SparseMatrix('d')
+        self._indexed = set()
+        self._columns = None
+        self._lock = Lock()
+
+    @property
+    def artists(self):
+        """
+        names of the indexed artists
+        @rtype: L{list} of L{str}
+        """
+        return self._matrix.row_labels
+
+    def __contains__(self, artist):
+        return getattr(artist, 'name', artist) in self._indexed
+
+    def __len__(self):
+        return len(self._indexed)
+
+    def add_vector(self, name, similar, tags = None):
+        """
+        Index an artist from its similar artists and tags. Indexing an artist
+        again replaces its row.
+
+        @param name:       name of the artist
+        @type name:        L{str}
+        @param similar:    name to match mapping of the similar artists
+        @type similar:     L{dict}
+        @param tags:       name to count mapping of the top tags, the counts
+                           being between 0 and 100 (optional)
+        @type tags:        L{dict}
+        """
+        cells = [(('artist', name), 1.0)]
+        cells.extend((('artist', a), float(m)) for a, m in similar.iteritems()
+                     if m and a != name)
+        if tags and self._tag_weight:
+            cells.extend((('tag', t.lower()), self._tag_weight * c / 100.0)
+                         for t, c in tags.iteritems() if c)
+        with self._lock:
+            if name in self._indexed:
+                self._matrix.clear_row(name)
+                self._columns = None
+            for feature, weight in cells:
+                self._matrix.append(name, feature, weight)
+            self._indexed.add(name)
+            if self._columns is not None:
+                # keep the columns built up to date rather than rebuilding them
+                self._add_columns(self._matrix.row_id(name), cells)
+
+    def add_artist(self, artist, refresh = False):
+        """
+        Index an artist, fetching its similar artists and its top tags.
+
+        @param artist:     the artist
+        @type artist:      L{Artist} OR L{str}
+        @param refresh:    index the artist again if it is already indexed (optional)
+        @type refresh:     L{bool}
+        """
+        name = getattr(artist, 'name', artist)
+        if name in self._indexed and not refresh:
+            return
+        artist = Artist(self._api, name = name)
+        similar = dict((a.name, a.stats and a.stats.match or 0) for a in artist.get_similar())
+        tags = None
+        if self._tag_weight:
+            data = self._api._fetch_data(artist._default_params(
+                {'method': 'artist.getTopTags'})).find('toptags')
+            tags = dict((t['name'], t['count'] or 0) for t in _TOP_TAG.decode_all(data, 'tag'))
+        self.add_vector(name, similar, tags)
+
+    def add_artists(self, artists, refresh = False, workers = 4):
+        """
+        Index many artists, fetching their similar artists and top tags
+        concurrently.
+
+        @param artists:    the artists
+        @type artists:     L{list} of L{Artist} OR L{str}
+        @param refresh:    index again the artists already indexed (optional)
+        @type refresh:     L{bool}
+        @param workers:    number of artists fetched concurrently (optional)
+        @type workers:     L{int}
+
+        @return:           the artists which could not be indexed, and the errors
+        @rtype:            L{list} of (L{str}, L{Exception})
+        """
+        names = [getattr(a, 'name', a) for a in artists]
+        if not refresh:
+            names = [a for a in names if a not in self._indexed]
+        return run_workers(lambda name: self.add_artist(name, refresh), names, workers)
+
+    def add_crawl(self, coordinator, workers = 4):
+        """
+        Index the artists crawled by a L{CrawlCoordinator} which are not
+        indexed yet. Call it again as the crawl goes on.
+
+        @param coordinator:    coordinator of a crawl of similar artists
+        @type coordinator:     L{CrawlCoordinator}
+        @param workers:        number of artists fetched concurrently (optional)
+        @type workers:         L{int}
+
+        @return:               the artists which could not be indexed, and the errors
+        @rtype:                L{list} of (L{str}, L{Exception})
+        """
+        return self.add_artists([i['name'] for i in coordinator.items()
+                                 if i.get('name') not in self._indexed], workers = workers)
+
+    def recommend(self, seeds, limit = 10, period = None, exclude = None):
+        """
+        Recommend artists for a set of seed artists.
+
+        @param seeds:      the seed artists: a user, whose top artists weighted
+                           by playcount are the seeds, or an artist name to
+                           weight mapping, or a list of artists of equal weight
+        @type seeds:       L{User} OR L{dict} OR L{list} of L{Artist} OR L{str}
+        @param limit:      number of artists recommended (optional)
+        @type limit:       L{int}
+        @param period:     period of the top artists of a user, as for
+                           L{User.get_top_artists} (optional)
+        @type period:      L{str}
+        @param exclude:    artists not to recommend, besides the seeds (optional)
+        @type exclude:     L{list} of L{str}
+
+        @return:           (name, score) pairs, best first. Only the indexed
+                           artists are recommended, and the seeds which are
+                           not indexed are ignored.
+        @rtype:            L{list} of L{tuple}
+        """
+        weights = self._seed_weights(seeds, period)
+        excluded = set(weights)
+        if exclude is not None:
+            excluded.update(getattr(a, 'name', a) for a in exclude)
+        with self._lock:
+            if self._columns is None:
+                self._build()
+            matrix, columns = self._matrix, self._columns
+
+            # the profile is the weighted sum of the normalised seed rows
+            profile = defaultdict(float)
+            total = sum(w for a, w in weights.iteritems() if a in self._indexed) or 1.0
+            for name, weight in weights.iteritems():
+                if name not in self._indexed:
+                    continue
+                r = matrix.row_id(name)
+                for c, w in columns.row_cells(r):
+                    profile[c] += weight / total * w
+
+            labels = matrix.row_labels
+            scores = array('d', [0.0]) * len(labels)
+            for c, p in profile.iteritems():
+                rows, values = columns[c]
+                for k in xrange(len(rows)):
+                    scores[rows[k]] += p * values[k]
+        ranked = ((labels[r], s) for r, s in enumerate(scores)
+                  if s > 0 and labels[r] not in excluded)
+        return heapq.nlargest(limit, ranked, key = lambda x: x[1])
+
+    def save(self, path):
+        """
+        Write the index to a file.
+
+        @param path:    path of the file
+        @type path:     L{str}
+        """
+        with self._lock:
+            fp = open(path, 'wb')
+            try:
+                cPickle.dump((self._tag_weight, sorted(self._indexed)), fp,
+                             cPickle.HIGHEST_PROTOCOL)
+                self._matrix.save(fp)
+            finally:
+                fp.close()
+
+    @staticmethod
+    def load(api, path):
+        """
+        Read an index written by L{save}.
+
+        @param api:     an instance of L{Api}
+        @type api:      L{Api}
+        @param path:    path of the file
+        @type path:     L{str}
+
+        @return:        the index
+        @rtype:         L{ArtistIndex}
+        """
+        fp = open(path, 'rb')
+        try:
+            tag_weight, indexed = cPickle.load(fp)
+            index = ArtistIndex(api, tag_weight)
+            index._matrix = SparseMatrix.load(fp)
+        finally:
+            fp.close()
+        index._indexed = set(indexed)
+        return index
+
+    def _seed_weights(self, seeds, period):
+        if isinstance(seeds, dict):
+            return dict((getattr(a, 'name', a), float(w)) for a, w in seeds.iteritems())
+        if isinstance(seeds, User):
+            return dict((a.name, float(a.stats and a.stats.playcount or 1))
+                        for a in seeds.get_top_artists(period))
+        return dict((getattr(a, 'name', a), 1.0) for a in seeds)
+
+    def _build(self):
+        # the normalised matrix by columns, for the scoring
+        self._columns = _Columns()
+        for name, indices, values in self._matrix.iterrows():
+            r = self._matrix.row_id(name)
+            self._add_columns(r, [(self._matrix.col_labels[c], v) for c, v in zip(indices, values)])
+
+    def _add_columns(self, r, cells):
+        norm = math.sqrt(sum(v * v for f, v in cells))
+        for feature, value in cells:
+            self._columns.add(r, self._matrix.col_id(feature), value / norm)
+
+    def __repr__(self):
+        return "<lastfm.ArtistIndex: %s artists>" % len(self._indexed)
+
+class _Columns(object):
+    """The normalised cells of a matrix, by column and by row"""
+    def __init__(self):
+        self._columns = {}
+        self._rows = defaultdict(list)
+
+    def add(self, r, c, value):
+        if c not in self._columns:
+            self._columns[c] = (array('i'), array('d'))
+        rows, values = self._columns[c]
+        rows.append(r)
+        values.append(value)
+        self._rows[r].append((c, value))
+
+    def row_cells(self, r):
+        return self._rows.get(r, [])
+
+    def __getitem__(self, c):
+        return self._columns[c]
+
+from array import array
+from collections import defaultdict
+import cPickle
+import heapq
+import math
+
+from lastfm.artist import Artist, _TOP_TAG
+from lastfm.user import User
+from lastfm.util import SparseMatrix, run_workers
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+"""Module for searching the entities already seen, without the web service"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from bisect import bisect_left
+from threading import Lock
+import re
+import unicodedata
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+class SearchIndex(object):
+    """
+    An inverted index over the names of the artists, albums, tracks and tags
+    created by an L{Api}. Once installed, every such entity the Api parses is
+    added to the index, and the search methods of the Api answer from the
+    index when it is confident enough, calling the web service otherwise.
+
+    Names are normalised to lower case tokens without accents, and every query
+    token matches the indexed tokens it is a prefix of, so partial queries as
+    typed in an autocomplete box find the names they start. The index is
+    only confident, and only answers the searches of the Api, when the names
+    equal to the whole query fill the page asked for: a partial match may
+    rank below names the web service knows and the index does not.
+    """
+    KINDS = ['Artist', 'Album', 'Track', 'Tag']
+    """Names of the classes indexed"""
+
+    def __init__(self, api, min_results = 5):
+        """
+        Create an empty index.
+
+        @param api:            an instance of L{Api}
+        @type api:             L{Api}
+        @param min_results:    number of whole-name matches which makes the
+                               index confident when the search has no limit (optional)
+        @type min_results:     L{int}
+        """
+        self._api = api
+        self._min_results = min_results
+        self._lock = Lock()
+        self._kinds = dict((k, _Postings()) for k in SearchIndex.KINDS)
+
+    def install(self):
+        """
+        Start indexing the entities created, and answer the searches of the
+        Api from the index. The exit indexing the entities runs even while
+        the L{Wormhole} is disabled, without enabling the other exits.
+        """
+        Wormhole.add_exit('lfm-obcache-init', self._on_init, always = True)
+        self._api.set_search_index(self)
+
+    def uninstall(self):
+        """Stop indexing the entities and send all the searches to the web service."""
+        Wormhole.remove_exit('lfm-obcache-init', self._on_init)
+        if self._api._search_index is self:
+            self._api.set_search_index(None)
+
+    def add(self, entity):
+        """
+        Add an artist, album, track or tag to the index. Other entities are ignored.
+
+        @param entity:    the entity
+        @type entity:     L{Artist} OR L{Album} OR L{Track} OR L{Tag}
+        """
+        kind = entity.__class__.__name__
+        if kind not in self._kinds or not entity.name:
+            return
+        if kind in ('Album', 'Track'):
+            if entity.artist is None or not entity.artist.name:
+                return
+            key = (entity.name, entity.artist.name)
+        else:
+            key = (entity.name, None)
+        with self._lock:
+            self._kinds[kind].add(key, _tokens(entity.name))
+
+    def search(self, kind, query, limit = None, artist = None):
+        """
+        Search the index.
+
+        @param kind:      the class of the entities searched
+        @type kind:       L{Artist} OR L{Album} OR L{Track} OR L{Tag}
+        @param query:     the searched name, or its beginning
+        @type query:      L{str}
+        @param limit:     maximum number of matches returned (optional)
+        @type limit:      L{int}
+        @param artist:    only the albums or tracks of this artist (optional)
+        @type artist:     L{str}
+
+        @return:          the matches, best first, and whether the index is confident
+                          they are the answer to the query
+        @rtype:           (L{list} of L{Artist} OR L{Album} OR L{Track} OR L{Tag}, L{bool})
+        """
+        tokens = _tokens(query)
+        if not tokens:
+            return ([], False)
+        with self._lock:
+            keys = self._kinds[kind.__name__].find(tokens)
+        if artist is not None:
+            artist = _normalise(artist)
+            keys = [k for k in keys if _normalise(k[1]) == artist]
+
+        whole = u" ".join(tokens)
+        keys.sort(key = lambda k: (u" ".join(_tokens(k[0])) != whole, len(k[0]), k[0]))
+        if limit:
+            keys = keys[:limit]
+        # the whole-name matches are sorted first
+        exact = 0
+        while exact < len(keys) and u" ".join(_tokens(keys[exact][0])) == whole:
+            exact += 1
+        confident = exact > 0 and exact >= (limit or self._min_results)
+        return ([self._entity(kind, k) for k in keys], confident)
+
+    def lookup(self, kind, query, limit = None, artist = None):
+        """
+        Search the index, if it is confident about the answer.
+
+        @return:    the matches, or None if the index is not confident
+        @rtype:     L{list} of L{Artist} OR L{Album} OR L{Track} OR L{Tag}
+
+        @see:       L{search}
+        """
+        found, confident = self.search(kind, query, limit, artist)
+        return confident and found or None
+
+    def _entity(self, kind, key):
+        name, artist = key
+        if artist is None:
+            return kind(self._api, name = name)
+        return kind(self._api, name = name, artist = Artist(self._api, name = artist))
+
+    def _on_init(self, retval, *args, **kwargs):
+        self.add(retval)
+
+    def __len__(self):
+        return sum(len(p) for p in self._kinds.values())
+
+    def __repr__(self):
+        return "<lastfm.SearchIndex: %s name(s)>" % len(self)
+
+class _Postings(object):
+    """Token to names mapping, with the tokens kept sorted for the prefix lookups"""
+    def __init__(self):
+        self._postings = {}
+        self._tokens = []
+        self._keys = set()
+
+    def add(self, key, tokens):
+        if key in self._keys:
+            return
+        self._keys.add(key)
+        for token in tokens:
+            if token not in self._postings:
+                self._postings[token] = set()
+                self._tokens.insert(bisect_left(self._tokens, token), token)
+            self._postings[token].add(key)
+
+    def find(self, tokens):
+        found = None
+        for token in tokens:
+            keys = set()
+            i = bisect_left(self._tokens, token)
+            while i < len(self._tokens) and self._tokens[i].startswith(token):
+                keys |= self._postings[self._tokens[i]]
+                i += 1
+            if found is None:
+                found = keys
+            else:
+                found &= keys
+            if not found:
+                return []
+        return list(found)
+
+    def __len__(self):
+        return len(self._keys)
+
+def _normalise(text):
+    if not isinstance(text, unicode):
+        text = text.decode('utf-8', 'replace')
+    text = unicodedata.normalize('NFKD', text)
+    return u"".join(c for c in text if not unicodedata.combining(c)).lower()
+
+def _tokens(text):
+    return _TOKEN.findall(_normalise(text))
+
+from lastfm.artist import Artist
+from lastfm.util import Wormhole
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+"""Module for taking consistent snapshots of the profile of a user"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from threading import Lock
+
+class UserSnapshot(object):
+    """
+    The profile of a user as it was at one time: the info, the top artists,
+    albums and tracks for some periods, the friends, the neighbours, the
+    recent tracks and the top tags. All the web service calls needed are
+    planned up front and made concurrently, within the rate limit of the
+    Api, instead of one at a time as the properties of the user are read.
+
+    A snapshot holds plain values rather than entities, so it can be pickled
+    or turned into JSON, stored and served from a cache. It is read-only: the
+    sections are tuples of read-only dicts, one per row, and the periodic
+    sections are read-only dicts of them keyed by period.
+
+        >>> s = user.snapshot(periods = ['overall', '7day'])
+        >>> s.top_artists['7day'][0]['name']
+        u'Cher'
+    """
+    SECTIONS = ['info', 'top_artists', 'top_albums', 'top_tracks',
+                'friends', 'neighbours', 'recent_tracks', 'top_tags']
+    """Sections of a snapshot"""
+
+    PERIODIC_SECTIONS = ['top_artists', 'top_albums', 'top_tracks']
+    """Sections fetched once per period"""
+
+    PERIODS = ['overall', '7day', '3month', '6month', '12month']
+    """Periods of the top charts"""
+
+    __slots__ = ['_user', '_taken_at', '_periods', '_data', '_errors']
+
+    def __init__(self, user, taken_at, periods, data, errors = None):
+        """
+        Create a snapshot from its values. Use L{take} or L{User.snapshot}
+        to take one from the web service.
+
+        @param user:        name of the user
+        @type user:         L{str}
+        @param taken_at:    time of the snapshot, as a UNIX timestamp
+        @type taken_at:     L{int}
+        @param periods:     periods of the periodic sections
+        @type periods:      L{list} of L{str}
+        @param data:        the sections, keyed by name
+        @type data:         L{dict}
+        @param errors:      messages of the errors of the sections which could
+                            not be fetched, keyed by name (optional)
+        @type errors:       L{dict}
+        """
+        object.__setattr__(self, '_user', user)
+        object.__setattr__(self, '_taken_at', taken_at)
+        object.__setattr__(self, '_periods', tuple(periods))
+        object.__setattr__(self, '_data', _freeze(data))
+        object.__setattr__(self, '_errors', _freeze(errors or {}))
+
+    @property
+    def user(self):
+        """name of the user"""
+        return self._user
+
+    @property
+    def taken_at(self):
+        """time of the snapshot, as a UNIX timestamp"""
+        return self._taken_at
+
+    @property
+    def periods(self):
+        """periods of the periodic sections"""
+        return self._periods
+
+    @property
+    def sections(self):
+        """names of the sections in the snapshot"""
+        return tuple(s for s in UserSnapshot.SECTIONS if s in self._data)
+
+    @property
+    def errors(self):
+        """
+        messages of the errors of the calls which failed, keyed by section,
+        and by period for the periodic sections. The periods fetched of a
+        periodic section are kept when others failed.
+        """
+        return self._errors
+
+    def __getattr__(self, name):
+        if name in UserSnapshot.SECTIONS:
+            if name not in self._data and name in self._errors:
+                error = self._errors[name]
+                if isinstance(error, dict):
+                    error = "; ".join("%s: %s" % e for e in sorted(error.items()))
+                raise LastfmError("section %s could not be fetched: %s" % (name, error))
+            try:
+                return self._data[name]
+            except KeyError:
+                raise AttributeError("section %s is not in the snapshot" % name)
+        raise AttributeError("'UserSnapshot' object has no attribute '%s'" % name)
+
+    def __setattr__(self, name, value):
+        raise TypeError("a snapshot can not be modified")
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        UserSnapshot.__init__(self, state['user'], state['taken_at'], state['periods'],
+                              state['data'], state['errors'])
+
+    def to_dict(self):
+        """
+        The values of the snapshot, as plain dicts and lists.
+
+        @return:    the snapshot, as read back by L{from_dict}
+        @rtype:     L{dict}
+        """
+        return {
+            'user': self._user,
+            'taken_at': self._taken_at,
+            'periods': list(self._periods),
+            'data': _thaw(self._data),
+            'errors': _thaw(self._errors),
+        }
+
+    @staticmethod
+    def from_dict(values):
+        """
+        Recreate a snapshot from its values.
+
+        @param values:    the values, as given by L{to_dict}
+        @type values:     L{dict}
+
+        @return:          the snapshot
+        @rtype:           L{UserSnapshot}
+        """
+        return UserSnapshot(values['user'], values['taken_at'], values['periods'],
+                            values['data'], values.get('errors'))
+
+    def to_json(self):
+        """
+        The snapshot as JSON.
+
+        @rtype:    L{str}
+        """
+        return json.dumps(self.to_dict())
+
+    @staticmethod
+    def from_json(text):
+        """
+        Recreate a snapshot from JSON.
+
+        @param text:    the JSON, as given by L{to_json}
+        @type text:     L{str}
+
+        @return:        the snapshot
+        @rtype:         L{UserSnapshot}
+        """
+        return UserSnapshot.from_dict(json.loads(text))
+
+    @staticmethod
+    def plan(user, periods = None, sections = None):
+        """
+        The web service calls needed for a snapshot.
+
+        @param user:        name of the user
+        @type user:         L{str}
+        @param periods:     periods of the periodic sections, only 'overall'
+                            if not given (optional)
+        @type periods:      L{list} of L{str}
+        @param sections:    the sections, all of them if not given (optional)
+        @type sections:     L{list} of L{str}
+
+        @return:            the calls, as (section, period, parameters) triplets,
+                            with a None period for the non periodic sections
+        @rtype:             L{list} of L{tuple}
+
+        @raise InvalidParametersError: A section or a period is not known.
+        """
+        if periods is None:
+            periods = ['overall']
+        if sections is None:
+            sections = UserSnapshot.SECTIONS
+        for s in sections:
+            if s not in _CALLS:
+                raise InvalidParametersError("unknown section %s" % s)
+        for p in periods:
+            if p not in UserSnapshot.PERIODS:
+                raise InvalidParametersError("unknown period %s" % p)
+        calls = []
+        for s in UserSnapshot.SECTIONS:
+            if s not in sections:
+                continue
+            method = _CALLS[s][0]
+            if s in UserSnapshot.PERIODIC_SECTIONS:
+                for p in periods:
+                    calls.append((s, p, {'method': method, 'user': user, 'period': p}))
+            else:
+                calls.append((s, None, {'method': method, 'user': user}))
+        return calls
+
+    @staticmethod
+    def take(api, user, periods = None, sections = None, workers = 4):
+        """
+        Take a snapshot of the profile of a user.
+
+        @param api:         an instance of L{Api}
+        @type api:          L{Api}
+        @param user:        name of the user
+        @type user:         L{str}
+        @param periods:     periods of the periodic sections, only 'overall'
+                            if not given (optional)
+        @type periods:      L{list} of L{str}
+        @param sections:    the sections, all of them if not given (optional)
+        @type sections:     L{list} of L{str}
+        @param workers:     number of calls made concurrently (optional)
+        @type workers:      L{int}
+
+        @return:            the snapshot. The sections, or the periods of
+                            the periodic sections, which could not be
+                            fetched are in its errors.
+        @rtype:             L{UserSnapshot}
+        """
+        if periods is None:
+            periods = ['overall']
+        calls = UserSnapshot.plan(user, periods, sections)
+        data = {}
+        lock = Lock()
+        taken_at = int(time.time())
+        def fetch(call):
+            section, period, params = call
+            method, tag, row, decoder = _CALLS[section]
+            # recent tracks change all the time, the others are cached
+            element = api._fetch_data(params, no_cache = (section == 'recent_tracks')).find(tag)
+            if row is None:
+                value = decoder(element)
+            else:
+                value = decoder.decode_all(element, row)
+            with lock:
+                if period is None:
+                    data[section] = value
+                else:
+                    data.setdefault(section, {})[period] = value
+
+        errors = {}
+        # any error, of the call or of the decoding, fails the section only
+        for (section, period, params), e in run_workers(fetch, calls, workers, (Exception,)):
+            if period is None:
+                errors[section] = str(e)
+            else:
+                errors.setdefault(section, {})[period] = str(e)
+        return UserSnapshot(user, taken_at, periods, data, errors)
+
+    def __repr__(self):
+        return "<lastfm.UserSnapshot: %s at %s>" % (self._user, self._taken_at)
+
+class _FrozenDict(dict):
+    """A read-only dict"""
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("a snapshot can not be modified")
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (_FrozenDict, (dict(self),))
+
+    def __hash__(self):
+        return hash(tuple(sorted(self.items())))
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return _FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _thaw(value):
+    if isinstance(value, dict):
+        return dict((k, _thaw(v)) for k, v in value.items())
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+import time
+
+from lastfm.error import InvalidParametersError, LastfmError
+from lastfm.util import run_workers
+from lastfm.util.decoder import Decoder, integer, number
+from lastfm.user import _RECENT_TRACK, _TOP_ALBUM, _TOP_ARTIST, _TOP_TRACK
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+_INFO = Decoder(
+    name = 'name',
+    real_name = 'realname',
+    url = 'url',
+    image = 'image[size]',
+    country = 'country',
+    age = ('age', integer),
+    gender = 'gender',
+    subscriber = 'subscriber',
+    playcount = ('playcount', integer),
+    registered = ('registered@unixtime', integer),
+)
+_FRIEND = Decoder(
+    name = 'name',
+    real_name = 'realname',
+    url = 'url',
+    image = 'image[size]',
+)
+_NEIGHBOUR = Decoder(
+    name = 'name',
+    real_name = 'realname',
+    url = 'url',
+    image = 'image',
+    match = ('match', number),
+)
+_TOP_TAG = Decoder(
+    name = 'name',
+    url = 'url',
+    count = ('count', integer),
+)
+
+_CALLS = {
+    # section: method, response element, row element or None, decoder
+    'info': ('user.getInfo', 'user', None, _INFO),
+    'top_artists': ('user.getTopArtists', 'topartists', 'artist', _TOP_ARTIST),
+    'top_albums': ('user.getTopAlbums', 'topalbums', 'album', _TOP_ALBUM),
+    'top_tracks': ('user.getTopTracks', 'toptracks', 'track', _TOP_TRACK),
+    'friends': ('user.getFriends', 'friends', 'user', _FRIEND),
+    'neighbours': ('user.getNeighbours', 'neighbours', 'user', _NEIGHBOUR),
+    'recent_tracks': ('user.getRecentTracks', 'recenttracks', 'track', _RECENT_TRACK),
+    'top_tags': ('user.getTopTags', 'toptags', 'tag', _TOP_TAG),
+}
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+"""Module for incrementally syncing the recent tracks of many users"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from threading import Lock
+
+class RecentTracksSync(object):
+    """
+    Incremental poller for the recent tracks of a set of users. For every user
+    it remembers the time of the latest scrobble seen (the high-water mark) and
+    only asks for the tracks played since then, dropping the ones already
+    reported at the boundary. Users are polled on an adaptive schedule: the
+    poll interval of a user shrinks while they are listening and grows while
+    they are idle. The state can be saved to a file and restored on the next run.
+    """
+    MIN_INTERVAL = 60
+    """Shortest interval between two polls of the same user, in seconds"""
+
+    MAX_INTERVAL = 3600
+    """Longest interval between two polls of the same user, in seconds"""
+
+    PAGE_SIZE = 200
+    """Number of tracks fetched per page of recent tracks"""
+
+    def __init__(self, api, path = None,
+                 min_interval = MIN_INTERVAL,
+                 max_interval = MAX_INTERVAL):
+        """
+        Create a poller, restoring its state from the file if it exists.
+
+        @param api:             an instance of L{Api}
+        @type api:              L{Api}
+        @param path:            path of the file the state is kept in (optional)
+        @type path:             L{str}
+        @param min_interval:    shortest poll interval, in seconds (optional)
+        @type min_interval:     L{int}
+        @param max_interval:    longest poll interval, in seconds (optional)
+        @type max_interval:     L{int}
+        """
+        self._api = api
+        self._path = path
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._users = {}
+        self._lock = Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    @property
+    def users(self):
+        """
+        names of the polled users
+        @rtype: L{list} of L{str}
+        """
+        return sorted(self._users.keys())
+
+    def add_user(self, user, since = None):
+        """
+        Start polling a user. Adding a user already polled does nothing.
+
+        @param user:     the user
+        @type user:      L{User} OR L{str}
+        @param since:    report the tracks played after this time, only the tracks
+                         played after the first poll if not given (optional)
+        @type since:     C{datetime.datetime}
+        """
+        name = getattr(user, 'name', user)
+        with self._lock:
+            if name not in self._users:
+                self._users[name] = {
+                    'since': since is not None and int(calendar.timegm(since.timetuple())) or None,
+                    'seen': [],
+                    'interval': self._min_interval,
+                    'next_poll': 0,
+                    'now_playing': None
+                }
+
+    def remove_user(self, user):
+        """
+        Stop polling a user.
+
+        @param user:     the user
+        @type user:      L{User} OR L{str}
+        """
+        with self._lock:
+            self._users.pop(getattr(user, 'name', user), None)
+
+    def high_water_mark(self, user):
+        """
+        Get the time of the latest scrobble seen for a user.
+
+        @param user:     the user
+        @type user:      L{User} OR L{str}
+
+        @return:         the time, or None if nothing was seen yet
+        @rtype:          C{datetime.datetime}
+        """
+        since = self._users[getattr(user, 'name', user)]['since']
+        return since is not None and datetime.utcfromtimestamp(since) or None
+
+    def next_poll_in(self, now = None):
+        """
+        Get the time until the next user is due.
+
+        @param now:    the current UNIX time (optional)
+        @type now:     L{float}
+
+        @return:       seconds until the next poll, 0 if a user is due already
+                       and None if no user is polled
+        @rtype:        L{float}
+        """
+        now = now or time.time()
+        with self._lock:
+            if not self._users:
+                return None
+            return max(0, min(s['next_poll'] for s in self._users.values()) - now)
+
+    def poll(self, now = None, callback = None):
+        """
+        Poll the users which are due, and save the state if a path is set.
+        Errors while polling a user are logged and the user is retried on the
+        next interval.
+
+        @param now:         the current UNIX time (optional)
+        @type now:          L{float}
+        @param callback:    function called with the user name, the new tracks and
+                            the track being played now for each polled user (optional)
+        @type callback:     C{function}
+
+        @return:            user name to new tracks mapping, the tracks of each
+                            user in the order they were played
+        @rtype:             L{dict}
+        """
+        now = now or time.time()
+        with self._lock:
+            due = [n for (n, s) in self._users.items() if s['next_poll'] <= now]
+        results = {}
+        for name in due:
+            try:
+                tracks, now_playing = self._poll_user(name)
+            except LastfmError as ex:
+                logging.log_silenced_exceptions(ex)
+                self._schedule(name, now, active = False)
+                continue
+            self._schedule(name, now, active = bool(tracks) or now_playing is not None)
+            results[name] = tracks
+            if callback is not None:
+                callback(name, tracks, now_playing)
+        if self._path is not None:
+            self.save()
+        return results
+
+    def run(self, callback, stop = None):
+        """
+        Keep polling the users, sleeping until the next one is due.
+
+        @param callback:    function called with the user name, the new tracks and
+                            the track being played now for each polled user
+        @type callback:     C{function}
+        @param stop:        function returning True when the polling should end (optional)
+        @type stop:         C{function}
+        """
+        while stop is None or not stop():
+            wait = self.next_poll_in()
+            if wait is None:
+                break
+            if wait > 0:
+                time.sleep(wait)
+            self.poll(callback = callback)
+
+    def save(self):
+        """Write the state to the file."""
+        with self._lock:
+            state = dict((n, dict(s)) for (n, s) in self._users.items())
+        temp_path = "%s.tmp" % self._path
+        fp = open(temp_path, 'w')
+        try:
+            json.dump(state, fp)
+        finally:
+            fp.close()
+        if os.path.exists(self._path):
+            os.remove(self._path)
+        os.rename(temp_path, self._path)
+
+    def load(self):
+        """Read the state from the file, replacing the current one."""
+        fp = open(self._path)
+        try:
+            state = json.load(fp)
+        finally:
+            fp.close()
+        with self._lock:
+            self._users = dict((n, dict(s, seen = [tuple(k) for k in s['seen']]))
+                               for (n, s) in state.items())
+
+    def _poll_user(self, name):
+        with self._lock:
+            state = dict(self._users[name])
+        since = state['since']
+        tracks = self._fetch_tracks(User(self._api, name = name), since)
+
+        now_playing = None
+        seen = set(state['seen'])
+        new = []
+        for t in tracks:
+            if t.played_on is None:
+                if now_playing is None:
+                    now_playing = t
+                continue
+            key = self._key(t)
+            if since is not None and (key[0] < since or key in seen):
+                continue
+            # a track scrobbled while paging shows up again on the next page
+            seen.add(key)
+            new.append((key, t))
+        new.reverse()
+
+        if since is None:
+            # first poll of a user added without a start time: only mark the boundary
+            state['since'] = new and new[-1][0][0] or int(time.time())
+            state['seen'] = [k for (k, t) in new if k[0] == state['since']]
+            new = []
+        elif new:
+            latest = max(k[0] for (k, t) in new)
+            if latest != state['since']:
+                state['seen'] = []
+            state['since'] = latest
+            state['seen'] = list(set(state['seen']) |
+                                 set(k for (k, t) in new if k[0] == latest))
+        state['now_playing'] = now_playing is not None and \
+            [now_playing.artist.name, now_playing.name] or None
+        with self._lock:
+            if name in self._users:
+                self._users[name].update(state)
+        return ([t for (k, t) in new], now_playing)
+
+    def _fetch_tracks(self, user, since):
+        # all the tracks played since the mark, most recent first. The mark is
+        # only moved once every page is fetched, so that none is skipped.
+        if since is None:
+            return user.get_recent_tracks()
+        params = user._default_params({'method': 'user.getRecentTracks',
+                                       'limit': RecentTracksSync.PAGE_SIZE,
+                                       'from': since})
+        tracks = []
+        page = 1
+        while True:
+            params['page'] = page
+            data = self._api._fetch_data(params, no_cache = True).find('recenttracks')
+            tracks.extend(user._create_recent_track(t) for t in data.findall('track'))
+            if page >= int(data.attrib.get('totalPages') or 1):
+                return tracks
+            page += 1
+
+    def _schedule(self, name, now, active):
+        with self._lock:
+            if name not in self._users:
+                return
+            state = self._users[name]
+            if active:
+                state['interval'] = max(self._min_interval, state['interval'] / 2)
+            else:
+                state['interval'] = min(self._max_interval, state['interval'] * 2)
+            state['next_poll'] = now + state['interval']
+
+    @staticmethod
+    def _key(track):
+        return (int(calendar.timegm(track.played_on.timetuple())),
+                track.artist.name, track.name)
+
+    def __repr__(self):
+        return "<lastfm.RecentTracksSync: %s user(s)>" % len(self._users)
+
+from datetime import datetime
+import calendar
+import os
+import time
+
+from lastfm.error import LastfmError
+from lastfm.user import User
+from lastfm.util import logging
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
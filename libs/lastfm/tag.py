@@ -58,24 +58,24 @@ class Tag(LastfmBase):
                 Album(
                       self._api,
                       subject = self,
-                      name = a.findtext('name'),
+                      name = r['name'],
                       artist = Artist(
                                       self._api,
                                       subject = self,
-                                      name = a.findtext('artist/name'),
-                                      mbid = a.findtext('artist/mbid'),
-                                      url = a.findtext('artist/url'),
+                                      name = r['artist_name'],
+                                      mbid = r['artist_mbid'],
+                                      url = r['artist_url'],
                                       ),
-                      mbid = a.findtext('mbid'),
-                      url = a.findtext('url'),
-                      image = dict([(i.get('size'), i.text) for i in a.findall('image')]),
+                      mbid = r['mbid'],
+                      url = r['url'],
+                      image = r['image'],
                       stats = Stats(
-                                    subject = a.findtext('name'),
-                                    tagcount = a.findtext('tagcount') and int(a.findtext('tagcount')) or None,
-                                    rank = a.attrib['rank'].strip() and int(a.attrib['rank']) or None
+                                    subject = r['name'],
+                                    tagcount = r['tagcount'],
+                                    rank = r['rank']
                                     )
                       )
-                for a in data.findall('album')
+                for r in _TOP_ALBUM.decode_all(data, 'album')
                 ]
 
     @top_property("top_albums")
@@ -92,18 +92,18 @@ class Tag(LastfmBase):
                 Artist(
                        self._api,
                        subject = self,
-                       name = a.findtext('name'),
-                       mbid = a.findtext('mbid'),
+                       name = r['name'],
+                       mbid = r['mbid'],
                        stats = Stats(
-                                     subject = a.findtext('name'),
-                                     rank = a.attrib['rank'].strip() and int(a.attrib['rank']) or None,
-                                     tagcount = a.findtext('tagcount') and int(a.findtext('tagcount')) or None
+                                     subject = r['name'],
+                                     rank = r['rank'],
+                                     tagcount = r['tagcount']
                                      ),
-                       url = a.findtext('url'),
-                       streamable = (a.findtext('streamable') == "1"),
-                       image = dict([(i.get('size'), i.text) for i in a.findall('image')]),
+                       url = r['url'],
+                       streamable = (r['streamable'] == "1"),
+                       image = r['image'],
                        )
-                for a in data.findall('artist')
+                for r in _TOP_ARTIST.decode_all(data, 'artist')
                 ]
 
     @top_property("top_artists")
@@ -120,25 +120,25 @@ class Tag(LastfmBase):
                 Track(
                       self._api,
                       subject = self,
-                      name = t.findtext('name'),
+                      name = r['name'],
                       artist = Artist(
                                       self._api,
                                       subject = self,
-                                      name = t.findtext('artist/name'),
-                                      mbid = t.findtext('artist/mbid'),
-                                      url = t.findtext('artist/url'),
+                                      name = r['artist_name'],
+                                      mbid = r['artist_mbid'],
+                                      url = r['artist_url'],
                                       ),
-                      mbid = t.findtext('mbid'),
+                      mbid = r['mbid'],
                       stats = Stats(
-                                    subject = t.findtext('name'),
-                                    rank = t.attrib['rank'].strip() and int(t.attrib['rank']) or None,
-                                    tagcount = t.findtext('tagcount') and int(t.findtext('tagcount')) or None
+                                    subject = r['name'],
+                                    rank = r['rank'],
+                                    tagcount = r['tagcount']
                                     ),
-                      streamable = (t.findtext('streamable') == '1'),
-                      full_track = (t.find('streamable').attrib['fulltrack'] == '1'),
-                      image = dict([(i.get('size'), i.text) for i in t.findall('image')]),
+                      streamable = (r['streamable'] == '1'),
+                      full_track = (r['full_track'] == '1'),
+                      image = r['image'],
                       )
-                for t in data.findall('track')
+                for r in _TOP_TRACK.decode_all(data, 'track')
                 ]
 
     @top_property("top_tracks")
@@ -218,4 +218,38 @@ from lastfm.artist import Artist
 from lastfm.error import InvalidParametersError
 from lastfm.playlist import Playlist
 from lastfm.stats import Stats
-from lastfm.track import Track
\ No newline at end of file
+from lastfm.track import Track
+from lastfm.util.decoder import Decoder, integer
+
+_TOP_ALBUM = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    url = 'url',
+    artist_name = 'artist/name',
+    artist_mbid = 'artist/mbid',
+    artist_url = 'artist/url',
+    image = 'image[size]',
+    rank = ('@rank', integer),
+    tagcount = ('tagcount', integer),
+)
+_TOP_ARTIST = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    url = 'url',
+    streamable = 'streamable',
+    image = 'image[size]',
+    rank = ('@rank', integer),
+    tagcount = ('tagcount', integer),
+)
+_TOP_TRACK = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    artist_name = 'artist/name',
+    artist_mbid = 'artist/mbid',
+    artist_url = 'artist/url',
+    streamable = 'streamable',
+    full_track = 'streamable@fulltrack',
+    image = 'image[size]',
+    rank = ('@rank', integer),
+    tagcount = ('tagcount', integer),
+)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+"""Module for computing the similarity of tags from their co-occurrence on artists"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from threading import Lock
+
+class TagCooccurrence(object):
+    """
+    A tag x tag co-occurrence matrix, built from the top tags of a set of
+    artists. Two tags co-occur when they are both among the top tags of an
+    artist. The counts are weighted by their pointwise mutual information,
+    so that the tags given to most artists, like 'rock', do not come out as
+    similar to every other tag. The similar tags of the whole catalogue are
+    then read offline rather than with one C{tag.getSimilar} call per tag.
+
+    The tag assignments are collected concurrently through the Api, so they
+    come from the file cache when present, and are kept in a sparse artist x
+    tag matrix; both matrices are saved in a compact binary file.
+    """
+    WEIGHTINGS = ['count', 'pmi', 'npmi']
+    """Weightings of the co-occurrence counts: the raw count, the positive
+    pointwise mutual information, and the positive PMI normalised between
+    0 and 1"""
+
+    def __init__(self, api, max_tags = 20, min_count = 1):
+        """
+        Create an empty matrix.
+
+        @param api:          an instance of L{Api}
+        @type api:           L{Api}
+        @param max_tags:     number of top tags of an artist taken into account (optional)
+        @type max_tags:      L{int}
+        @param min_count:    smallest tag count, between 0 and 100, for a tag
+                             to be assigned to an artist (optional)
+        @type min_count:     L{int}
+        """
+        self._api = api
+        self._max_tags = max_tags
+        self._min_count = min_count
+        self._assignments = SparseMatrix('i')
+        self._matrix = None
+        self._weighting = None
+        self._lock = Lock()
+
+    @property
+    def artists(self):
+        """
+        names of the artists whose tags are collected
+        @rtype: L{list} of L{str}
+        """
+        return self._assignments.row_labels
+
+    @property
+    def tags(self):
+        """
+        names of the tags of the matrix
+        @rtype: L{list} of L{str}
+        """
+        return self.matrix.row_labels
+
+    @property
+    def matrix(self):
+        """
+        the weighted tag x tag matrix, built with the 'pmi' weighting if
+        L{build} was not called
+        @rtype: L{SparseMatrix}
+        """
+        if self._matrix is None:
+            self.build()
+        return self._matrix
+
+    @property
+    def weighting(self):
+        """weighting of the matrix built"""
+        return self._weighting
+
+    def add_assignments(self, artist, tags):
+        """
+        Add the top tags of an artist. Adding the tags of an artist again
+        replaces them.
+
+        @param artist:    name of the artist
+        @type artist:     L{str}
+        @param tags:      tag name to count mapping, the counts being between
+                          0 and 100
+        @type tags:       L{dict}
+        """
+        top = sorted(((c, t.lower()) for t, c in tags.iteritems() if c >= self._min_count),
+                     reverse = True)[:self._max_tags]
+        with self._lock:
+            self._assignments.clear_row(artist)
+            self._assignments.row_id(artist)
+            for count, tag in top:
+                self._assignments.append(artist, tag, max(count, 1))
+            self._matrix = None
+
+    def add_artists(self, artists, workers = 4):
+        """
+        Collect the top tags of many artists concurrently.
+
+        @param artists:    the artists
+        @type artists:     L{list} of L{Artist} OR L{str}
+        @param workers:    number of artists fetched concurrently (optional)
+        @type workers:     L{int}
+
+        @return:           the artists whose tags could not be fetched, and the errors
+        @rtype:            L{list} of (L{str}, L{Exception})
+        """
+        def collect(name):
+            data = self._api._fetch_data({'method': 'artist.getTopTags',
+                                          'artist': name}).find('toptags')
+            self.add_assignments(name, dict((r['name'], r['count'] or 0)
+                                            for r in _TOP_TAG.decode_all(data, 'tag')))
+        seen = set(self._assignments.row_labels)
+        names = []
+        for a in artists:
+            name = getattr(a, 'name', a)
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+        return run_workers(collect, names, workers)
+
+    def add_tags(self, tags, workers = 4):
+        """
+        Collect the top tags of the top artists of many tags, all fetched
+        concurrently.
+
+        @param tags:       the tags
+        @type tags:        L{list} of L{Tag} OR L{str}
+        @param workers:    number of tags or artists fetched concurrently (optional)
+        @type workers:     L{int}
+
+        @return:           the tags and artists whose data could not be
+                           fetched, and the errors
+        @rtype:            L{list} of (L{str}, L{Exception})
+        """
+        artists = []
+        lock = Lock()
+        def collect(name):
+            found = [a.name for a in Tag(self._api, name = name).top_artists]
+            with lock:
+                artists.extend(found)
+        failures = run_workers(collect, [getattr(t, 'name', t) for t in tags], workers)
+        return failures + self.add_artists(artists, workers)
+
+    def build(self, weighting = 'pmi', min_cooccurrence = 1):
+        """
+        Count the co-occurrences of the tags and weight them.
+
+        @param weighting:           one of L{WEIGHTINGS} (optional)
+        @type weighting:            L{str}
+        @param min_cooccurrence:    smallest number of artists two tags have
+                                    to share to be related (optional)
+        @type min_cooccurrence:     L{int}
+
+        @return:                    the weighted tag x tag matrix
+        @rtype:                     L{SparseMatrix}
+
+        @raise InvalidParametersError: If the weighting is not supported then
+                                       an exception is raised.
+        """
+        if weighting not in TagCooccurrence.WEIGHTINGS:
+            raise InvalidParametersError("weighting has to be one of %s" % TagCooccurrence.WEIGHTINGS)
+        with self._lock:
+            tag_labels = self._assignments.col_labels
+            artists = 0
+            counts = defaultdict(int)
+            pairs = defaultdict(int)
+            for artist, indices, values in self._assignments.iterrows():
+                artists += 1
+                indices = sorted(indices)
+                for i in xrange(len(indices)):
+                    counts[indices[i]] += 1
+                    for j in xrange(i + 1, len(indices)):
+                        pairs[(indices[i], indices[j])] += 1
+
+            matrix = SparseMatrix('d')
+            for t in sorted(counts):
+                matrix.row_id(tag_labels[t])
+                matrix.col_id(tag_labels[t])
+            for (a, b), n in pairs.iteritems():
+                if n < min_cooccurrence:
+                    continue
+                if weighting == 'count':
+                    weight = float(n)
+                else:
+                    weight = math.log(float(n) * artists / (counts[a] * counts[b]))
+                    if weighting == 'npmi' and weight > 0:
+                        weight = n < artists and weight / -math.log(float(n) / artists) or 1.0
+                if weight <= 0:
+                    continue
+                matrix.append(tag_labels[a], tag_labels[b], weight)
+                matrix.append(tag_labels[b], tag_labels[a], weight)
+            matrix.tocsr()
+            self._matrix = matrix
+            self._weighting = weighting
+        return matrix
+
+    def similar(self, tag, limit = 10):
+        """
+        Get the tags most related to a tag.
+
+        @param tag:      the tag
+        @type tag:       L{Tag} OR L{str}
+        @param limit:    number of tags returned (optional)
+        @type limit:     L{int}
+
+        @return:         (name, weight) pairs, most related first
+        @rtype:          L{list} of L{tuple}
+        """
+        row = self.matrix.row(getattr(tag, 'name', tag).lower())
+        return heapq.nlargest(limit, row.iteritems(), key = lambda x: x[1])
+
+    def weight(self, tag1, tag2):
+        """
+        Get the weight of the co-occurrence of two tags.
+
+        @param tag1:    the first tag
+        @type tag1:     L{Tag} OR L{str}
+        @param tag2:    the second tag
+        @type tag2:     L{Tag} OR L{str}
+
+        @return:        the weight, 0 if the tags are not related
+        @rtype:         L{float}
+        """
+        row = self.matrix.row(getattr(tag1, 'name', tag1).lower())
+        return row.get(getattr(tag2, 'name', tag2).lower(), 0.0)
+
+    def save(self, path):
+        """
+        Write the tag assignments and the matrix built to a file.
+
+        @param path:    path of the file
+        @type path:     L{str}
+        """
+        matrix = self.matrix
+        fp = open(path, 'wb')
+        try:
+            cPickle.dump((self._max_tags, self._min_count, self._weighting),
+                         fp, cPickle.HIGHEST_PROTOCOL)
+            self._assignments.save(fp)
+            matrix.save(fp)
+        finally:
+            fp.close()
+
+    @staticmethod
+    def load(api, path):
+        """
+        Read a matrix written by L{save}.
+
+        @param api:     an instance of L{Api}
+        @type api:      L{Api}
+        @param path:    path of the file
+        @type path:     L{str}
+
+        @return:        the matrix, to which more artists can be added
+        @rtype:         L{TagCooccurrence}
+        """
+        fp = open(path, 'rb')
+        try:
+            max_tags, min_count, weighting = cPickle.load(fp)
+            cooccurrence = TagCooccurrence(api, max_tags, min_count)
+            cooccurrence._assignments = SparseMatrix.load(fp)
+            cooccurrence._matrix = SparseMatrix.load(fp)
+            cooccurrence._weighting = weighting
+        finally:
+            fp.close()
+        return cooccurrence
+
+    def __repr__(self):
+        return "<lastfm.TagCooccurrence: %s artists, %s tags>" % self._assignments.shape
+
+from collections import defaultdict
+import cPickle
+import heapq
+import math
+
+from lastfm.artist import _TOP_TAG
+from lastfm.error import InvalidParametersError
+from lastfm.tag import Tag
+from lastfm.util import SparseMatrix, run_workers
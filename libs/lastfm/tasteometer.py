@@ -61,7 +61,237 @@ class Tasteometer(object):
         
             
     
+    @staticmethod
+    def build_index(api, users, period = None, metric = 'cosine', limit = None):
+        """
+        Build a local taste index for a set of users from their top artists,
+        so that the users can be compared to each other without calling
+        C{tasteometer.compare} for every pair.
+        
+        @param api:       an instance of L{Api}
+        @type api:        L{Api}
+        @param users:     the users to index
+        @type users:      L{list} of L{User}
+        @param period:    period of the top artists, as for L{User.get_top_artists} (optional)
+        @type period:     L{str}
+        @param metric:    one of L{TasteIndex.METRICS} (optional)
+        @type metric:     L{str}
+        @param limit:     number of neighbours kept for each user, all if not given (optional)
+        @type limit:      L{int}
+        
+        @return:          the built index
+        @rtype:           L{TasteIndex}
+        """
+        index = TasteIndex(api, metric)
+        for u in users:
+            index.add_user(u, period)
+        index.build(limit)
+        return index
+    
     def __repr__(self):
         return "<lastfm.Tasteometer: %s%% match>" % (self.score*100)
+
+class TasteIndex(object):
+    """
+    A local tasteometer over a set of weighted artist vectors. The similarity
+    of all the pairs is computed in one pass over the artist postings (a sparse
+    matrix product), and the neighbours of every user are kept sorted so that
+    lookups do not touch the network or recompute any score.
+    """
+    METRICS = ['cosine', 'overlap']
+    """Supported similarity metrics"""
+    
+    def __init__(self, api, metric = 'cosine'):
+        """
+        Create an empty index.
+        
+        @param api:       an instance of L{Api}
+        @type api:        L{Api}
+        @param metric:    'cosine' for the cosine of the playcount vectors or 'overlap'
+                          for the summed minimum of the normalised playcounts (optional)
+        @type metric:     L{str}
+        
+        @raise InvalidParametersError: If the metric is not supported then an
+                                       exception is raised.
+        """
+        if metric not in TasteIndex.METRICS:
+            raise InvalidParametersError("metric has to be one of %s" % TasteIndex.METRICS)
+        self._api = api
+        self._metric = metric
+        self._vectors = SparseMatrix('d')
+        self._neighbours = None
+        
+    @property
+    def metric(self):
+        """similarity metric of the index"""
+        return self._metric
+    
+    @property
+    def names(self):
+        """names of the indexed vectors"""
+        return self._vectors.row_labels
+    
+    def add_vector(self, name, weights):
+        """
+        Add a weighted artist vector to the index. Adding a vector for a name
+        already present adds the weights up.
+        
+        @param name:       name of the vector, usually a user name
+        @type name:        L{str}
+        @param weights:    artist name to weight mapping
+        @type weights:     L{dict}
+        """
+        for artist, weight in weights.iteritems():
+            if weight:
+                self._vectors.append(name, artist, float(weight))
+        self._neighbours = None
+        
+    def add_user(self, user, period = None):
+        """
+        Add the top artists of a user, weighted by playcount. The top artists are
+        fetched through the Api, so they come from the file cache when present.
+        
+        @param user:      the user
+        @type user:       L{User}
+        @param period:    period of the top artists, as for L{User.get_top_artists} (optional)
+        @type period:     L{str}
+        """
+        self.add_vector(user.name, dict(
+            (a.name, a.stats and a.stats.playcount or 1)
+            for a in user.get_top_artists(period)))
+        
+    def add_history(self, history):
+        """
+        Add the artist playcounts of a listening history, summed over its weeks.
+        
+        @param history:    an artist chart history
+        @type history:     L{ListeningHistory}
+        """
+        if history.chart_type != 'artist':
+            raise InvalidParametersError("an artist chart history is required")
+        weights = {}
+        for artist, indices, counts in history.matrix.iterrows():
+            weights[artist] = sum(counts)
+        self.add_vector(history.subject.name, weights)
+        
+    def build(self, limit = None):
+        """
+        Compute the similarity of all the pairs of vectors and sort the neighbours
+        of every vector. Called lazily by the lookup methods if needed.
+        
+        @param limit:    number of neighbours kept for each vector, all if not given (optional)
+        @type limit:     L{int}
+        """
+        names = self._vectors.row_labels
+        rows = []
+        postings = defaultdict(list)
+        for name, indices, weights in self._vectors.iterrows():
+            r = self._vectors.row_id(name)
+            rows.append(r)
+            for c, w in zip(indices, self._normalise(weights)):
+                postings[c].append((r, w))
         
-from lastfm.artist import Artist
\ No newline at end of file
+        scores = defaultdict(lambda: defaultdict(float))
+        combine = self._metric == 'cosine' and (lambda x, y: x*y) or min
+        for posting in postings.itervalues():
+            for i in xrange(len(posting)):
+                r1, w1 = posting[i]
+                for j in xrange(i + 1, len(posting)):
+                    r2, w2 = posting[j]
+                    s = combine(w1, w2)
+                    scores[r1][r2] += s
+                    scores[r2][r1] += s
+        
+        neighbours = {}
+        for r in rows:
+            ranked = scores[r].items()
+            if limit is not None:
+                ranked = heapq.nlargest(limit, ranked, key = lambda x: x[1])
+            else:
+                ranked.sort(key = lambda x: x[1], reverse = True)
+            neighbours[names[r]] = [(names[n], s) for (n, s) in ranked]
+        self._neighbours = neighbours
+        
+    def neighbours(self, name, limit = None):
+        """
+        Get the nearest neighbours of a vector.
+        
+        @param name:     name of the vector
+        @type name:      L{str} OR L{User}
+        @param limit:    maximum number of neighbours returned (optional)
+        @type limit:     L{int}
+        
+        @return:         (name, score) pairs, most similar first
+        @rtype:          L{list} of L{tuple}
+        """
+        if self._neighbours is None:
+            self.build()
+        name = getattr(name, 'name', name)
+        ranked = self._neighbours.get(name, [])
+        return limit is not None and ranked[:limit] or ranked[:]
+    
+    def score(self, name1, name2):
+        """
+        Get the similarity score of two vectors.
+        
+        @param name1:    name of the first vector
+        @type name1:     L{str} OR L{User}
+        @param name2:    name of the second vector
+        @type name2:     L{str} OR L{User}
+        
+        @return:         the score, between 0 and 1
+        @rtype:          L{float}
+        """
+        v1 = self._weights(getattr(name1, 'name', name1))
+        v2 = self._weights(getattr(name2, 'name', name2))
+        combine = self._metric == 'cosine' and (lambda x, y: x*y) or min
+        return sum(combine(w, v2[a]) for (a, w) in v1.iteritems() if a in v2)
+        
+    def compare(self, name1, name2, limit = None):
+        """
+        Compare two vectors, like L{Tasteometer.compare} does remotely.
+        
+        @param name1:    name of the first vector
+        @type name1:     L{str} OR L{User}
+        @param name2:    name of the second vector
+        @type name2:     L{str} OR L{User}
+        @param limit:    maximum number of shared artists returned (optional)
+        @type limit:     L{int}
+        
+        @return:         the comparison
+        @rtype:          L{Tasteometer}
+        """
+        v1 = self._weights(getattr(name1, 'name', name1))
+        v2 = self._weights(getattr(name2, 'name', name2))
+        shared = [a for a in v1 if a in v2]
+        shared.sort(key = lambda a: v1[a] + v2[a], reverse = True)
+        if limit is not None:
+            shared = shared[:limit]
+        return Tasteometer(
+                           score = self.score(name1, name2),
+                           matches = len([a for a in v1 if a in v2]),
+                           artists = [Artist(self._api, name = a) for a in shared]
+                           )
+    
+    def _normalise(self, weights):
+        if self._metric == 'cosine':
+            norm = math.sqrt(sum(w*w for w in weights))
+        else:
+            norm = sum(weights)
+        return [w/norm for w in weights]
+    
+    def _weights(self, name):
+        row = self._vectors.row(name)
+        normalised = self._normalise(row.values())
+        return dict(zip(row.keys(), normalised))
+    
+    def __repr__(self):
+        return "<lastfm.TasteIndex: %s vectors, %s>" % (len(self.names), self._metric)
+        
+from collections import defaultdict
+import heapq
+import math
+
+from lastfm.artist import Artist
+from lastfm.error import InvalidParametersError
+from lastfm.util import SparseMatrix
\ No newline at end of file
@@ -9,7 +9,8 @@ from lastfm.base import LastfmBase
 from lastfm.mixin import chartable, mixin
 import lastfm.playlist
 from lastfm.decorators import (
-    cached_property, top_property, authentication_required, depaginate)
+    cached_property, top_property, authentication_required, depaginate,
+    async_callback)
 
 @chartable('album', 'artist', 'track', 'tag')
 @mixin("crawlable", "shoutable", "cacheable", "property_adder")
@@ -91,10 +92,10 @@ class User(LastfmBase):
         if page is not None:
             params.update({'page': page})
 
-        data = self._api._fetch_data(params).find('events')
+        data = self._api._fetch_data(params, stream = True)
         total_pages = int(data.attrib['totalPages'])
         yield total_pages
-        for e in data.findall('event'):
+        for e in data.rows('event'):
             yield Event.create_from_data(self._api, e)
 
     @cached_property
@@ -109,10 +110,10 @@ class User(LastfmBase):
             params.update({'limit': limit})
         if page is not None:
             params.update({'page': page})
-        data = self._api._fetch_data(params, sign = True, session = True).find('events')
+        data = self._api._fetch_data(params, sign = True, session = True, stream = True)
         total_pages = int(data.attrib['totalPages'])
         yield total_pages
-        for e in data.findall('event'):
+        for e in data.rows('event'):
             yield Event.create_from_data(self._api, e)
 
     @cached_property
@@ -213,67 +214,73 @@ class User(LastfmBase):
                 Track(
                     self._api,
                     subject = self,
-                    name = t.findtext('name'),
+                    name = r['name'],
                     artist = Artist(
                         self._api,
                         subject = self,
-                        name = t.findtext('artist/name'),
-                        mbid = t.findtext('artist/mbid'),
-                        url = t.findtext('artist/url'),
+                        name = r['artist_name'],
+                        mbid = r['artist_mbid'],
+                        url = r['artist_url'],
                     ),
-                    mbid = t.findtext('mbid'),
-                    image = dict([(i.get('size'), i.text) for i in t.findall('image')]),
-                    loved_on = datetime(*(
-                        time.strptime(
-                            t.findtext('date').strip(),
-                            '%d %b %Y, %H:%M'
-                            )[0:6])
-                        )
+                    mbid = r['mbid'],
+                    image = r['image'],
+                    loved_on = r['date']
                     )
-                for t in data.findall('track')
+                for r in _LOVED_TRACK.decode_all(data, 'track')
                 ]
 
-    def get_recent_tracks(self, limit = None):
+    def get_recent_tracks(self, limit = None, since = None):
+        """
+        Get the tracks recently played by the user, most recent first. The
+        track being played now, if any, is included with played_on set to None.
+        
+        @param limit:    maximum number of tracks returned (optional)
+        @type limit:     L{int}
+        @param since:    only return the tracks played at or after this time (optional)
+        @type since:     C{datetime.datetime}
+        
+        @return:         recently played tracks
+        @rtype:          L{list} of L{Track}
+        """
         params = self._default_params({'method': 'user.getRecentTracks'})
         if limit is not None:
             params.update({'limit': limit})
+        if since is not None:
+            params.update({'from': int(calendar.timegm(since.timetuple()))})
         data = self._api._fetch_data(params, no_cache = True).find('recenttracks')
-        return [
-                Track(
-                      self._api,
-                      subject = self,
-                      name = t.findtext('name'),
-                      artist = Artist(
-                                      self._api,
-                                      subject = self,
-                                      name = t.findtext('artist'),
-                                      mbid = t.find('artist').attrib['mbid'],
-                                      ),
-                      album = Album(
-                                    self._api,
-                                    subject = self,
-                                    name = t.findtext('album'),
-                                    artist = Artist(
-                                                    self._api,
-                                                    subject = self,
-                                                    name = t.findtext('artist'),
-                                                    mbid = t.find('artist').attrib['mbid'],
-                                                    ),
-                                    mbid = t.find('album').attrib['mbid'],
-                                    ),
-                      mbid = t.findtext('mbid'),
-                      streamable = (t.findtext('streamable') == '1'),
-                      url = t.findtext('url'),
-                      image = dict([(i.get('size'), i.text) for i in t.findall('image')]),
-                      played_on = datetime(*(
-                                           time.strptime(
-                                                         t.findtext('date').strip(),
-                                                         '%d %b %Y, %H:%M'
-                                                         )[0:6])
-                                           )
-                      )
-                      for t in data.findall('track')
-                      ]
+        return [self._create_recent_track(t) for t in data.findall('track')]
+
+    def _create_recent_track(self, t):
+        r = _RECENT_TRACK(t)
+        played_on = None
+        if r['date_uts']:
+            played_on = timestamp(r['date_uts'])
+        elif r['date'] is not None:
+            played_on = _recent_date(r['date'])
+        artist = Artist(
+                        self._api,
+                        subject = self,
+                        name = r['artist'],
+                        mbid = r['artist_mbid'],
+                        )
+        return Track(
+                     self._api,
+                     subject = self,
+                     name = r['name'],
+                     artist = artist,
+                     album = Album(
+                                   self._api,
+                                   subject = self,
+                                   name = r['album'],
+                                   artist = artist,
+                                   mbid = r['album_mbid'],
+                                   ),
+                     mbid = r['mbid'],
+                     streamable = (r['streamable'] == '1'),
+                     url = r['url'],
+                     image = r['image'],
+                     played_on = played_on
+                     )
 
     @property
     def recent_tracks(self):
@@ -295,24 +302,24 @@ class User(LastfmBase):
                 Album(
                      self._api,
                      subject = self,
-                     name = a.findtext('name'),
+                     name = r['name'],
                      artist = Artist(
                                      self._api,
                                      subject = self,
-                                     name = a.findtext('artist/name'),
-                                     mbid = a.findtext('artist/mbid'),
-                                     url = a.findtext('artist/url'),
+                                     name = r['artist_name'],
+                                     mbid = r['artist_mbid'],
+                                     url = r['artist_url'],
                                      ),
-                     mbid = a.findtext('mbid'),
-                     url = a.findtext('url'),
-                     image = dict([(i.get('size'), i.text) for i in a.findall('image')]),
+                     mbid = r['mbid'],
+                     url = r['url'],
+                     image = r['image'],
                      stats = Stats(
-                                   subject = a.findtext('name'),
-                                   playcount = a.findtext('playcount').strip() and int(a.findtext('playcount')),
-                                   rank = a.attrib['rank'].strip() and int(a.attrib['rank'])
+                                   subject = r['name'],
+                                   playcount = r['playcount'],
+                                   rank = r['rank']
                                    )
                      )
-                for a in data.findall('album')
+                for r in _TOP_ALBUM.decode_all(data, 'album')
                 ]
 
     @cached_property
@@ -335,18 +342,18 @@ class User(LastfmBase):
                 Artist(
                        self._api,
                        subject = self,
-                       name = a.findtext('name'),
-                       mbid = a.findtext('mbid'),
+                       name = r['name'],
+                       mbid = r['mbid'],
                        stats = Stats(
-                                     subject = a.findtext('name'),
-                                     rank = a.attrib['rank'].strip() and int(a.attrib['rank']) or None,
-                                     playcount = a.findtext('playcount').strip() and int(a.findtext('playcount')) or None
+                                     subject = r['name'],
+                                     rank = r['rank'],
+                                     playcount = r['playcount']
                                      ),
-                       url = a.findtext('url'),
-                       streamable = (a.findtext('streamable') == "1"),
-                       image = dict([(i.get('size'), i.text) for i in a.findall('image')]),
+                       url = r['url'],
+                       streamable = (r['streamable'] == "1"),
+                       image = r['image'],
                        )
-                for a in data.findall('artist')
+                for r in _TOP_ARTIST.decode_all(data, 'artist')
                 ]
 
     @cached_property
@@ -390,25 +397,25 @@ class User(LastfmBase):
                 Track(
                       self._api,
                       subject = self,
-                      name = t.findtext('name'),
+                      name = r['name'],
                       artist = Artist(
                                       self._api,
                                       subject = self,
-                                      name = t.findtext('artist/name'),
-                                      mbid = t.findtext('artist/mbid'),
-                                      url = t.findtext('artist/url'),
+                                      name = r['artist_name'],
+                                      mbid = r['artist_mbid'],
+                                      url = r['artist_url'],
                                       ),
-                      mbid = t.findtext('mbid'),
+                      mbid = r['mbid'],
                       stats = Stats(
-                                    subject = t.findtext('name'),
-                                    rank = t.attrib['rank'].strip() and int(t.attrib['rank']) or None,
-                                    playcount = t.findtext('playcount') and int(t.findtext('playcount')) or None
+                                    subject = r['name'],
+                                    rank = r['rank'],
+                                    playcount = r['playcount']
                                     ),
-                      streamable = (t.findtext('streamable') == '1'),
-                      full_track = (t.find('streamable').attrib['fulltrack'] == '1'),
-                      image = dict([(i.get('size'), i.text) for i in t.findall('image')]),
+                      streamable = (r['streamable'] == '1'),
+                      full_track = (r['full_track'] == '1'),
+                      image = r['image'],
                       )
-                for t in data.findall('track')
+                for r in _TOP_TRACK.decode_all(data, 'track')
                 ]
 
     @cached_property
@@ -461,6 +468,34 @@ class User(LastfmBase):
     def library(self):
         return self._library
 
+    @async_callback
+    def snapshot(self, periods = None, sections = None, workers = 4, callback = None):
+        """
+        Take a snapshot of the profile of the user. The web service calls of
+        all the sections are made concurrently, instead of one at a time as
+        the properties of the user are read, and the snapshot can be stored
+        and served from a cache.
+
+        @param periods:     periods of the top artists, albums and tracks,
+                            only 'overall' if not given (optional)
+        @type periods:      L{list} of L{str}
+        @param sections:    the sections, all of L{UserSnapshot.SECTIONS}
+                            if not given (optional)
+        @type sections:     L{list} of L{str}
+        @param workers:     number of calls made concurrently (optional)
+        @type workers:      L{int}
+        @param callback:    callback function for asynchronous invocation (optional)
+        @type callback:     C{function}
+
+        @return:            the snapshot
+        @rtype:             L{UserSnapshot}
+
+        @see:               L{async_callback}
+        """
+        if not self.name:
+            raise InvalidParametersError("user has to be provided.")
+        return UserSnapshot.take(self._api, self.name, periods, sections, workers)
+
     @staticmethod
     def get_info(api, name):
         user = User(api, name = name)
@@ -557,7 +592,7 @@ class User(LastfmBase):
                     params['artist'] = isinstance(artist, Artist) and artist.name or artist
                     params['track'] = track
             self._api._post_data(params)
-            self._data = None
+            self._raw = None
 
         @staticmethod
         def _hash_func(*args, **kwds):
@@ -591,11 +626,11 @@ class User(LastfmBase):
                 params.update({'page': page})
 
             try:
-                data = self._api._fetch_data(params).find('albums')            
+                data = self._api._fetch_data(params, stream = True)
                 total_pages = int(data.attrib['totalPages'])
                 yield total_pages
     
-                for a in data.findall('album'):
+                for a in data.rows('album'):
                     yield Album(
                                 self._api,
                                 subject = self,
@@ -649,11 +684,11 @@ class User(LastfmBase):
                 params.update({'page': page})
 
             try:
-                data = self._api._fetch_data(params).find('artists')
+                data = self._api._fetch_data(params, stream = True)
                 total_pages = int(data.attrib['totalPages'])
                 yield total_pages
                 
-                for a in data.findall('artist'):
+                for a in data.rows('artist'):
                     yield Artist(
                                  self._api,
                                  subject = self,
@@ -694,11 +729,11 @@ class User(LastfmBase):
                 params.update({'page': page})
             
             try:
-                data = self._api._fetch_data(params).find('tracks')
+                data = self._api._fetch_data(params, stream = True)
                 total_pages = int(data.attrib['totalPages'])
                 yield total_pages
                 
-                for t in data.findall('track'):
+                for t in data.rows('track'):
                     yield Track(
                                 self._api,
                                 subject = self,
@@ -744,6 +779,39 @@ class User(LastfmBase):
             self._api._post_data(params)
             self._tracks = None
 
+        def export(self, path,
+                   entity = 'tracks',
+                   format = 'jsonl',
+                   checkpoint = None,
+                   limit = None,
+                   callback = None):
+            """
+            Export a section of the library to a file, page by page, resuming a
+            previously interrupted export of the same file.
+
+            @param path:          path of the output file
+            @type path:           L{str}
+            @param entity:        'albums' OR 'artists' OR 'tracks' (optional)
+            @type entity:         L{str}
+            @param format:        'jsonl' OR 'csv' (optional)
+            @type format:         L{str}
+            @param checkpoint:    path of the checkpoint file (optional)
+            @type checkpoint:     L{str}
+            @param limit:         number of records fetched per page (optional)
+            @type limit:          L{int}
+            @param callback:      function called with the page number and the total
+                                  number of pages after each page is written (optional)
+            @type callback:       C{function}
+
+            @return:              the number of records exported
+            @rtype:               L{int}
+
+            @see:                 L{LibraryExporter}
+            """
+            from lastfm.export import LibraryExporter
+            return LibraryExporter(self, entity, path, format,
+                                   checkpoint, limit).run(callback)
+
         def _default_params(self, extra_params = None):
             if not self.user.name:
                 raise InvalidParametersError("user has to be provided.")
@@ -766,6 +834,7 @@ class User(LastfmBase):
             return "<lastfm.User.Library: for user '%s'>" % self.user.name
 
 from datetime import datetime
+import calendar
 import time
 
 from lastfm.api import Api
@@ -778,3 +847,64 @@ from lastfm.stats import Stats
 from lastfm.tag import Tag
 from lastfm.tasteometer import Tasteometer
 from lastfm.track import Track
+from lastfm.util.decoder import Decoder, date, integer, timestamp
+
+_recent_date = date('%d %b %Y, %H:%M')
+
+_LOVED_TRACK = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    artist_name = 'artist/name',
+    artist_mbid = 'artist/mbid',
+    artist_url = 'artist/url',
+    image = 'image[size]',
+    date = ('date', _recent_date),
+)
+_RECENT_TRACK = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    artist = 'artist',
+    artist_mbid = 'artist@mbid',
+    album = 'album',
+    album_mbid = 'album@mbid',
+    streamable = 'streamable',
+    url = 'url',
+    image = 'image[size]',
+    date = 'date',
+    date_uts = 'date@uts',
+)
+_TOP_ALBUM = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    url = 'url',
+    artist_name = 'artist/name',
+    artist_mbid = 'artist/mbid',
+    artist_url = 'artist/url',
+    image = 'image[size]',
+    rank = ('@rank', integer),
+    playcount = ('playcount', integer),
+)
+_TOP_ARTIST = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    url = 'url',
+    streamable = 'streamable',
+    image = 'image[size]',
+    rank = ('@rank', integer),
+    playcount = ('playcount', integer),
+)
+_TOP_TRACK = Decoder(
+    name = 'name',
+    mbid = 'mbid',
+    artist_name = 'artist/name',
+    artist_mbid = 'artist/mbid',
+    artist_url = 'artist/url',
+    streamable = 'streamable',
+    full_track = 'streamable@fulltrack',
+    image = 'image[size]',
+    rank = ('@rank', integer),
+    playcount = ('playcount', integer),
+)
+
+# imported last, the snapshots decode the responses with the decoders above
+from lastfm.snapshot import UserSnapshot
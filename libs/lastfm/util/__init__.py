@@ -3,11 +3,20 @@ __version__ = "0.2"
 __license__ = "GNU Lesser General Public License"
 __package__ = "lastfm.util"
 
+from lastfm.util.decoder import Decoder
+from lastfm.util.dispatcher import Dispatcher
 from lastfm.util.wormhole import Wormhole
 from lastfm.util._lazylist import lazylist
 from lastfm.util.safelist import SafeList
-from lastfm.util.filecache import FileCache
+from lastfm.util.filecache import FileCache, SharedCache
 from lastfm.util.objectcache import ObjectCache
+from lastfm.util.ratelimiter import RateLimiter, SharedRateLimiter
+from lastfm.util.responsecursor import ResponseCursor
+from lastfm.util.sparsematrix import SparseMatrix
+from lastfm.util.metrics import Metrics
+from lastfm.util.workers import run_workers
 
-__all__ = ['Wormhole', 'lazylist', 'SafeList',
-           'FileCache', 'ObjectCache']
\ No newline at end of file
+__all__ = ['Decoder', 'Dispatcher', 'Wormhole', 'lazylist', 'SafeList',
+           'FileCache', 'SharedCache', 'ObjectCache', 'RateLimiter',
+           'SharedRateLimiter', 'ResponseCursor', 'SparseMatrix', 'Metrics',
+           'run_workers']
\ No newline at end of file
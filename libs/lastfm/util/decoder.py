@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""Module for decoding the XML elements of the web service responses"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.util"
+
+_TEXT, _ATTRIBUTE, _COLLECT, _LIST, _NESTED = range(5)
+
+class Decoder(object):
+    """
+    A decoder turning an XML element into a dict of field values, in one pass
+    over the children of the element. The fields are declared once, with the
+    path of their value in the element and an optional converter:
+
+        - C{'name'}: text of the child C{<name>}
+        - C{'@rank'}: attribute C{rank} of the element
+        - C{'artist@mbid'}: attribute C{mbid} of the child C{<artist>}
+        - C{'artist/name'}: text of the child C{<name>} of the child C{<artist>}
+        - C{'image[size]'}: dict of the texts of the children C{<image>},
+          keyed by their attribute C{size}
+        - C{'artist[]'}: list of the texts of the children C{<artist>}
+
+    Tags may be qualified with their namespace, as in C{'{ns}point/{ns}lat'}.
+
+    and compiled into a table from the tag of a child to the fields it holds,
+    so that each child is visited once whatever the number of fields read
+    from it. Like C{findtext}, the value is read from the first child with
+    the tag, a missing value is None and an empty text is an empty string.
+    Converters are not called for missing values.
+
+        >>> row = Decoder(name = 'name', rank = ('@rank', int))
+        >>> row(ElementTree.XML('<artist rank="1"><name>Cher</name></artist>'))
+        {'name': 'Cher', 'rank': 1}
+    """
+    def __init__(self, **fields):
+        """
+        Compile a decoder.
+
+        @param fields:    the fields, each one a path or a (path, converter) pair
+        @type fields:     L{dict}
+        """
+        self._fields = fields
+        self._defaults = dict((k, None) for k in fields)
+        self._own = []
+        self._collected = []
+        self._listed = []
+        self._children = {}
+        nested = {}
+        for key, spec in fields.items():
+            if isinstance(spec, tuple):
+                path, converter = spec
+            else:
+                path, converter = spec, None
+            if path.startswith('@'):
+                self._own.append((key, path[1:], converter))
+            elif _step(path) < len(path):
+                split = _step(path)
+                nested.setdefault(path[:split], {})[key] = (path[split + 1:], converter)
+            elif path.endswith('[]'):
+                self._listed.append(key)
+                self._child(path[:-2]).append((key, _LIST, None, converter))
+            elif path.endswith(']'):
+                tag, attribute = path[:-1].split('[', 1)
+                self._collected.append(key)
+                self._child(tag).append((key, _COLLECT, attribute, converter))
+            elif '@' in path:
+                tag, attribute = path.split('@', 1)
+                self._child(tag).append((key, _ATTRIBUTE, attribute, converter))
+            else:
+                self._child(path).append((key, _TEXT, None, converter))
+        for tag, sub_fields in nested.items():
+            self._child(tag).append((None, _NESTED, Decoder(**sub_fields), None))
+
+    def _child(self, tag):
+        return self._children.setdefault(tag, [])
+
+    def __call__(self, element):
+        """
+        Decode an element.
+
+        @param element:    the element
+        @type element:     C{xml.etree.ElementTree.Element}
+
+        @return:           the values of the fields
+        @rtype:            L{dict}
+        """
+        values = self._defaults.copy()
+        for key in self._collected:
+            values[key] = {}
+        for key in self._listed:
+            values[key] = []
+        for key, attribute, converter in self._own:
+            value = element.get(attribute)
+            if converter is not None and value is not None:
+                value = converter(value)
+            values[key] = value
+        children = self._children
+        for child in element:
+            fields = children.get(child.tag)
+            if fields is None:
+                continue
+            for key, kind, argument, converter in fields:
+                if kind is _COLLECT:
+                    value = child.text
+                    if converter is not None and value is not None:
+                        value = converter(value)
+                    values[key][child.get(argument)] = value
+                    continue
+                if kind is _LIST:
+                    value = child.text
+                    if converter is not None and value is not None:
+                        value = converter(value)
+                    values[key].append(value)
+                    continue
+                if kind is _NESTED:
+                    for key, value in argument(child).iteritems():
+                        if values[key] is None:
+                            values[key] = value
+                    continue
+                # like findtext, the first of the repeated children is read
+                if values[key] is not None:
+                    continue
+                if kind is _TEXT:
+                    value = child.text or ''
+                else:
+                    value = child.get(argument)
+                if converter is not None and value is not None:
+                    value = converter(value)
+                values[key] = value
+        return values
+
+    def decode_all(self, element, tag):
+        """
+        Decode the children of an element having a tag. The children of
+        a streamed response are decoded as they are parsed.
+
+        @param element:    the parent element, or a streamed response
+        @type element:     C{xml.etree.ElementTree.Element} or L{ResponseCursor}
+        @param tag:        tag of the decoded children
+        @type tag:         L{str}
+
+        @return:           the values of the fields of each child, in order
+        @rtype:            L{list} of L{dict}
+        """
+        return [self(child) for child in element if child.tag == tag]
+
+def _step(path):
+    # the end of the first tag of a path, skipping the namespace of the tag
+    start = 0
+    if path.startswith('{'):
+        start = path.find('}') + 1
+    split = path.find('/', start)
+    if split < 0:
+        return len(path)
+    return split
+
+def integer(text):
+    """
+    Convert a count to an int. Counts with a fraction, like the weights of
+    the tag charts, are truncated, and blank counts are None.
+    """
+    try:
+        return int(text)
+    except ValueError:
+        text = text.strip()
+        if not text:
+            return None
+        return int(float(text))
+
+def number(text):
+    """Convert a number to an int, or to a float if it has a fraction. Blank numbers are None."""
+    try:
+        return int(text)
+    except ValueError:
+        text = text.strip()
+        if not text:
+            return None
+        return float(text)
+
+def timestamp(text):
+    """Convert a UNIX timestamp to a C{datetime.datetime} in UTC."""
+    return datetime.utcfromtimestamp(int(text))
+
+def date(format):
+    """
+    Make a converter of the dates in a format.
+
+    @param format:    the format, as understood by C{time.strptime}
+    @type format:     L{str}
+
+    @return:          the converter, returning None for blank dates
+    @rtype:           C{function}
+    """
+    def convert(text):
+        text = text.strip()
+        if not text:
+            return None
+        return datetime(*time.strptime(text, format)[0:6])
+    return convert
+
+from datetime import datetime
+import time
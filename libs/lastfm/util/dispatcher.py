@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""Module for handing work over to a single background thread"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.util"
+
+from threading import Lock, Thread
+import os
+import Queue
+import sys
+
+_STOP = object()
+_fork_lock = Lock()
+
+class Dispatcher(object):
+    """
+    A bounded queue drained by one background thread. Items are handed to the
+    handler in batches of whatever has piled up, so that a burst of events
+    costs one handler call instead of one per event. When the queue is full the
+    items are either dropped or the caller blocks, depending on the policy.
+    """
+    POLICIES = ['drop', 'block']
+    """Supported policies for a full queue"""
+
+    def __init__(self, handler, maxsize = 10000, policy = 'drop',
+                 batch_size = 500, name = None):
+        """
+        Create a dispatcher. The thread is started on the first submitted item.
+
+        @param handler:       function called in the background thread with a
+                              L{list} of submitted items
+        @type handler:        C{function}
+        @param maxsize:       maximum number of items waiting in the queue (optional)
+        @type maxsize:        L{int}
+        @param policy:        'drop' to discard the items submitted while the queue
+                              is full, 'block' to wait for room (optional)
+        @type policy:         L{str}
+        @param batch_size:    maximum number of items handed to the handler at once (optional)
+        @type batch_size:     L{int}
+        @param name:          name of the background thread (optional)
+        @type name:           L{str}
+        """
+        if policy not in Dispatcher.POLICIES:
+            raise ValueError("policy has to be one of %s" % Dispatcher.POLICIES)
+        self._handler = handler
+        self._queue = Queue.Queue(maxsize)
+        self._policy = policy
+        self._batch_size = batch_size
+        self._name = name
+        self._thread = None
+        self._pid = os.getpid()
+        self._lock = Lock()
+        self._dropped = 0
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @property
+    def dropped(self):
+        """
+        number of items dropped because the queue was full
+        @rtype: L{int}
+        """
+        return self._dropped
+
+    @property
+    def pending(self):
+        """
+        approximate number of items waiting in the queue
+        @rtype: L{int}
+        """
+        return self._queue.qsize()
+
+    def submit(self, item):
+        """
+        Queue an item for the handler.
+
+        @param item:    the item
+        @type item:     any value
+
+        @return:        False if the item was dropped, True otherwise
+        @rtype:         L{bool}
+        """
+        if self._thread is None or self._pid != os.getpid():
+            self._start()
+        if self._policy == 'block':
+            self._queue.put(item)
+            return True
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except Queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+    def flush(self):
+        """Wait until every item queued so far has been handled."""
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self):
+        """Handle the items queued so far and stop the background thread."""
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _start(self):
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            if self._thread is None:
+                thread = Thread(target = self._run, name = self._name)
+                thread.setDaemon(True)
+                thread.start()
+                self._thread = thread
+
+    def _reset(self):
+        # the thread is not carried over a fork, and the locks of the queue
+        # may have been held by it: the child starts afresh, leaving the
+        # items queued before the fork to the parent
+        with _fork_lock:
+            if self._pid == os.getpid():
+                return
+            self._lock = Lock()
+            self._queue = Queue.Queue(self._queue.maxsize)
+            self._thread = None
+            self._dropped = 0
+            self._pid = os.getpid()
+
+    def _run(self):
+        queue = self._queue
+        while True:
+            batch = [queue.get()]
+            try:
+                while len(batch) < self._batch_size:
+                    batch.append(queue.get_nowait())
+            except Queue.Empty:
+                pass
+            stop = _STOP in batch
+            items = [i for i in batch if i is not _STOP]
+            try:
+                if items:
+                    self._handler(items)
+            except Exception, e:
+                sys.stderr.write("%s: error in dispatcher handler: %s\n" % (self._name, e))
+            for i in batch:
+                queue.task_done()
+            if stop:
+                break
+
+    def __repr__(self):
+        return "<lastfm.util.Dispatcher: %s, %s pending, %s dropped>" % \
+            (self._policy, self.pending, self._dropped)
@@ -16,6 +16,8 @@ else:
     def md5hash(string):
         return md5(string).hexdigest()
     
+from contextlib import contextmanager
+from threading import Lock
 import os
 import tempfile
 
@@ -24,9 +26,11 @@ class _FileCacheError(Exception):
 
 class FileCache(object):
     DEPTH = 3
+    LOCKS = 64
 
     def __init__(self,root_directory=None):
         self._InitializeRootDirectory(root_directory)
+        self._locks = [Lock() for i in xrange(self.LOCKS)]
 
     def Get(self,key):
         path = self._GetPath(key)
@@ -42,7 +46,8 @@ class FileCache(object):
             os.makedirs(directory)
         if not os.path.isdir(directory):
             raise _FileCacheError('%s exists but is not a directory' % directory)
-        temp_fd, temp_path = tempfile.mkstemp()
+        # written next to the entry, so that the rename is atomic
+        temp_fd, temp_path = tempfile.mkstemp(dir=directory)
         temp_fp = os.fdopen(temp_fd, 'w')
         temp_fp.write(data)
         temp_fp.close()
@@ -61,6 +66,13 @@ class FileCache(object):
         if os.path.exists(path):
             os.remove(path)
 
+    @contextmanager
+    def Lock(self,key):
+        '''Hold a lock on a key, for one thread at a time to refresh it.'''
+        lock = self._locks[int(md5hash(key)[:8], 16) % self.LOCKS]
+        with lock:
+            yield
+
     def GetCachedTime(self,key):
         path = self._GetPath(key)
         if os.path.exists(path):
@@ -100,3 +112,46 @@ class FileCache(object):
 
     def _GetPrefix(self,hashed_key):
         return os.path.sep.join(hashed_key[0:FileCache.DEPTH])
+
+
+class SharedCache(FileCache):
+    '''
+    A FileCache shared by all the processes on a host. Locking a key locks it
+    for the threads of all the processes, so that a stale entry is fetched
+    once while the others wait for it, and the cache gives out rate limiters
+    shared by the processes.
+
+    Use it with: api.set_cache(cache) and
+    api.set_rate_limiter(cache.GetRateLimiter(api.api_key))
+    '''
+    LOCKS = 256
+
+    def __init__(self,root_directory=None):
+        if fcntl is None:
+            raise ImportError('fcntl is needed to share a cache between processes')
+        FileCache.__init__(self, root_directory)
+        self._lock_directory = os.path.join(self._root_directory, 'locks')
+        if not os.path.exists(self._lock_directory):
+            os.makedirs(self._lock_directory)
+
+    @contextmanager
+    def Lock(self,key):
+        index = int(md5hash(key)[:8], 16) % self.LOCKS
+        with self._locks[index]:
+            fd = os.open(os.path.join(self._lock_directory, '%02x' % index),
+                         os.O_RDWR | os.O_CREAT, 0666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def GetRateLimiter(self,name):
+        '''Get the rate limiter shared by the processes for a name, like an API key.'''
+        from lastfm.util.ratelimiter import SharedRateLimiter
+        return SharedRateLimiter(os.path.join(self._root_directory, 'ratelimit', md5hash(name)))
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
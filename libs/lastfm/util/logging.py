@@ -5,61 +5,107 @@ __version__ = "0.2"
 __license__ = "GNU Lesser General Public License"
 __package__ = "lastfm.util"
 
-from contextlib import contextmanager, nested
-from threading import Lock
 from lastfm.util import Wormhole
+from lastfm.util.dispatcher import Dispatcher
 from datetime import datetime
+import atexit
 import sys
 
 api = None
-lock = Lock()
+
+# log records are queued here and written by the dispatcher thread, so that
+# logging costs the request path no more than putting a tuple in a queue
+_dispatcher = None
+_logfiles = {}
 
 def set_api(api_):
     global api
     api = api_
 
-@contextmanager
-def logfile():
-    if api._logfile is None:
-        try:
-            yield sys.stdout
-        finally:
-            pass
-    else:
-        try:
-            log = None
+def configure(maxsize = 10000, policy = 'drop', batch_size = 500):
+    """
+    Set up the queue the log records are written through. Records queued
+    with the previous settings are written out first.
+
+    @param maxsize:       maximum number of records waiting to be written (optional)
+    @type maxsize:        L{int}
+    @param policy:        'drop' to discard the records logged while the queue is
+                          full, 'block' to wait for room (optional)
+    @type policy:         L{str}
+    @param batch_size:    maximum number of records written at once (optional)
+    @type batch_size:     L{int}
+    """
+    global _dispatcher
+    old, _dispatcher = _dispatcher, Dispatcher(_write, maxsize, policy,
+                                               batch_size, 'lastfm-logging')
+    if old is not None:
+        old.stop()
+
+def flush():
+    """Wait until the records logged so far are written to the log file."""
+    _dispatcher.flush()
+
+def close():
+    """Write the records logged so far and close the log files."""
+    _dispatcher.stop()
+    for log in _logfiles.values():
+        if log is not sys.stdout:
+            log.close()
+    _logfiles.clear()
+
+def dropped():
+    """
+    Number of records dropped because the queue was full.
+
+    @rtype: L{int}
+    """
+    return _dispatcher.dropped
+
+def _log(fmt, *args):
+    _dispatcher.submit((api._logfile, datetime.now(), fmt, args))
+
+def _logfile(path):
+    if path not in _logfiles:
+        if path is None:
+            _logfiles[path] = sys.stdout
+        else:
             try:
-                log = open(api._logfile, 'at')
-                yield log
+                _logfiles[path] = open(path, 'at')
             except IOError:
                 sys.stderr.write("could not open log file, logging to stdout\n")
-                yield sys.stdout
-        finally:
-            if log is not None:
-                log.close()
+                _logfiles[path] = sys.stdout
+    return _logfiles[path]
+
+def _write(records):
+    logs = set()
+    for path, time, fmt, args in records:
+        log = _logfile(path)
+        log.write(fmt.format(time, *args))
+        logs.add(log)
+    for log in logs:
+        log.flush()
 
 @Wormhole.exit('lfm-api-url')
 def log_url(url, *args, **kwargs):
     if api._debug >= api.DEBUG_LEVELS['LOW']:
-        with nested(logfile(), lock) as (log, l):
-            log.write("{0}: URL fetched: {1}\n".format(datetime.now(), url))
-        
+        _log("{0}: URL fetched: {1}\n", url)
+
 @Wormhole.exit('lfm-obcache-register')
 def log_object_registration((inst, already_registered), *args, **kwargs):
     if api._debug >= api.DEBUG_LEVELS['MEDIUM']:
-        with nested(logfile(), lock) as (log, l):
-            if already_registered:
-                log.write("{0}: already registered: {1}\n".format(datetime.now(), repr(inst)))
-            else:
-                log.write("{0}: not already registered: {1}\n".format(datetime.now(), inst.__class__))
+        if already_registered:
+            _log("{0}: already registered: {1!r}\n", inst)
+        else:
+            _log("{0}: not already registered: {1}\n", inst.__class__)
 
 @Wormhole.exit('lfm-api-raw-data')
 def log_raw_data(raw_data, *args, **kwargs):
     if api._debug >= api.DEBUG_LEVELS['HIGH']:
-        with nested(logfile(), lock) as (log, l):
-            log.write("{0}: RAW DATA\n {1}\n".format(datetime.now(), raw_data))
-            
+        _log("{0}: RAW DATA\n {1}\n", raw_data)
+
 def log_silenced_exceptions(ex):
     if api._debug >= api.DEBUG_LEVELS['LOW']:
-        with nested(logfile(), lock) as (log, l):
-            log.write("{0}: Silenced Exception: {1}\n".format(datetime.now(), ex))
\ No newline at end of file
+        _log("{0}: Silenced Exception: {1}\n", ex)
+
+configure()
+atexit.register(close)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""Module for collecting latency and traffic metrics through the wormhole"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.util"
+
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock, local
+from lastfm.util import Wormhole
+
+class Histogram(object):
+    """A latency histogram with fixed, roughly logarithmic buckets"""
+    BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+               0.1, 0.2, 0.5, 1, 2, 5, 10)
+    """Upper bounds of the buckets, in seconds. Slower calls go to an overflow bucket."""
+
+    def __init__(self):
+        self._counts = [0] * (len(Histogram.BUCKETS) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def add(self, value):
+        self._counts[bisect_left(Histogram.BUCKETS, value)] += 1
+        self._count += 1
+        self._total += value
+        self._max = max(self._max, value)
+
+    @property
+    def count(self):
+        return self._count
+
+    def to_dict(self):
+        return {
+            'count': self._count,
+            'total': self._total,
+            'mean': self._count and self._total/self._count or 0.0,
+            'max': self._max,
+            'buckets': [(b, c) for (b, c) in
+                        zip(list(Histogram.BUCKETS) + [None], self._counts) if c]
+        }
+
+class Metrics(object):
+    """
+    A wormhole exit which records, per topic and per web service method, the
+    latency histograms of the calls, the bytes fetched, the file cache hits,
+    the XML parse times and the L{ObjectCache} hits. Install it to start
+    recording, and read the numbers with L{snapshot} or L{export}.
+    """
+    TOPICS = ['lfm-api-url', 'lfm-api-raw-data', 'lfm-api-network',
+              'lfm-api-parse', 'lfm-api-processed-data', 'lfm-obcache-register']
+    """Topics the metrics are collected from"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._local = local()
+        self._exits = {
+            'lfm-api-url': self._on_url,
+            'lfm-api-raw-data': self._on_raw_data,
+            'lfm-api-network': self._on_network,
+            'lfm-api-parse': self._on_parse,
+            'lfm-api-processed-data': self._on_processed_data,
+            'lfm-obcache-register': self._on_register,
+        }
+        self.reset()
+
+    def install(self):
+        """Subscribe the metrics to the wormhole topics and enable the wormhole."""
+        for topic in Metrics.TOPICS:
+            Wormhole.add_exit(topic, self._exits[topic])
+        Wormhole.enable()
+
+    def uninstall(self):
+        """Unsubscribe the metrics from the wormhole topics."""
+        for topic in Metrics.TOPICS:
+            Wormhole.remove_exit(topic, self._exits[topic])
+
+    def reset(self):
+        """Discard everything recorded so far."""
+        with self._lock:
+            self._topics = defaultdict(Histogram)
+            self._methods = defaultdict(lambda: {
+                'requests': 0,
+                'network': 0,
+                'cache_hits': 0,
+                'bytes': 0,
+                'latency': Histogram(),
+                'parse': Histogram(),
+            })
+            self._object_cache = defaultdict(lambda: {'registered': 0, 'reused': 0})
+
+    def snapshot(self):
+        """
+        The metrics recorded so far.
+
+        @return:    a dict with the keys 'topics' (latency histogram per topic),
+                    'methods' (requests, network fetches, cache hits, bytes fetched,
+                    latency and parse time histograms per web service method) and
+                    'object_cache' (new and reused registrations per class)
+        @rtype:     L{dict}
+        """
+        with self._lock:
+            methods = {}
+            for m, s in self._methods.items():
+                methods[m] = dict(s, latency = s['latency'].to_dict(),
+                                  parse = s['parse'].to_dict())
+            return {
+                'topics': dict((t, h.to_dict()) for (t, h) in self._topics.items()),
+                'methods': methods,
+                'object_cache': dict((c, dict(s)) for (c, s) in self._object_cache.items()),
+            }
+
+    def export(self, fp):
+        """
+        Write a snapshot of the metrics to a file as JSON.
+
+        @param fp:    a file object opened for writing
+        @type fp:     C{file}
+        """
+        json.dump(self.snapshot(), fp, indent = 2, sort_keys = True)
+
+    def _record(self, topic):
+        elapsed = Wormhole.elapsed()
+        if elapsed is not None:
+            self._topics[topic].add(elapsed)
+        return elapsed
+
+    def _on_url(self, url, *args, **kwargs):
+        with self._lock:
+            self._record('lfm-api-url')
+
+    def _on_network(self, url_data, api, opener, url, data = None, *args, **kwargs):
+        self._local.network = True
+        method = _method_from_url(url) or _method_from_query(data)
+        with self._lock:
+            self._record('lfm-api-network')
+            s = self._methods[method]
+            s['network'] += 1
+
+    def _on_raw_data(self, url_data, api, url, parameters = None, *args, **kwargs):
+        method = (parameters or {}).get('method') or _method_from_url(url)
+        self._local.method = method
+        network = getattr(self._local, 'network', False)
+        self._local.network = False
+        with self._lock:
+            elapsed = self._record('lfm-api-raw-data')
+            s = self._methods[method]
+            s['requests'] += 1
+            s['bytes'] += url_data and len(url_data) or 0
+            if not network:
+                s['cache_hits'] += 1
+            if elapsed is not None:
+                s['latency'].add(elapsed)
+
+    def _on_parse(self, data, *args, **kwargs):
+        method = getattr(self._local, 'method', None)
+        with self._lock:
+            elapsed = self._record('lfm-api-parse')
+            if elapsed is not None:
+                self._methods[method]['parse'].add(elapsed)
+
+    def _on_processed_data(self, data, *args, **kwargs):
+        with self._lock:
+            self._record('lfm-api-processed-data')
+
+    def _on_register(self, retval, *args, **kwargs):
+        inst, already_registered = retval
+        with self._lock:
+            self._record('lfm-obcache-register')
+            s = self._object_cache[inst.__class__.__name__]
+            if already_registered:
+                s['reused'] += 1
+            else:
+                s['registered'] += 1
+
+    def __repr__(self):
+        return "<lastfm.util.Metrics: %s request(s)>" % \
+            sum(s['requests'] for s in self._methods.values())
+
+def _method_from_url(url):
+    return _method_from_query(urlparse.urlparse(url)[4])
+
+def _method_from_query(query):
+    return query and dict(cgi.parse_qsl(query)).get('method') or None
+
+import cgi
+import urlparse
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
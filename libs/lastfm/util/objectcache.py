@@ -40,6 +40,12 @@ class ObjectCache(object):
             _registry[cls_name][key] = ob
             return (ob, False)
 
+    @staticmethod
+    @Wormhole.entrance('lfm-obcache-init')
+    def initialised(ob):
+        """Called once a newly registered entity is initialised."""
+        return ob
+
     @property
     def stats(self):
         counts = {}
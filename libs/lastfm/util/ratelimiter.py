@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Module for spacing out the requests to the web service"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.util"
+
+from threading import Lock
+import time
+
+class RateLimiter(object):
+    """Hands out request start times at least an interval apart, within a process"""
+    def __init__(self):
+        self._lock = Lock()
+        self._next = 0.0
+
+    def reserve(self, interval):
+        """
+        Reserve the start time of a request.
+
+        @param interval:    minimum time between the starts of two requests, in seconds
+        @type interval:     L{float}
+
+        @return:            time to wait before starting the request, in seconds
+        @rtype:             L{float}
+        """
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next)
+            self._next = start + interval
+        return start - now
+
+class SharedRateLimiter(RateLimiter):
+    """
+    A L{RateLimiter} shared by all the processes on a host. The next start
+    time is kept in a memory mapped file, locked while it is updated, so the
+    processes using the same file together respect one request budget.
+    """
+    def __init__(self, path):
+        """
+        Create a rate limiter.
+
+        @param path:    path of the file holding the budget, one file per API key
+        @type path:     L{str}
+        """
+        super(SharedRateLimiter, self).__init__()
+        if fcntl is None:
+            raise ImportError("fcntl is needed to share a rate limiter between processes")
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._path = path
+        self._open()
+
+    def reserve(self, interval):
+        # the thread lock is taken first, as a flock does not exclude the
+        # threads sharing the file descriptor
+        with self._lock:
+            # nor the processes sharing it: a file opened before a fork is
+            # opened again by the child
+            if self._pid != os.getpid():
+                self.close()
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                start = max(now, _SLOT.unpack(self._map[:_SLOT.size])[0])
+                self._map[:_SLOT.size] = _SLOT.pack(start + interval)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return start - now
+
+    def close(self):
+        """Release the memory map and the file."""
+        self._map.close()
+        os.close(self._fd)
+
+    def _open(self):
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0666)
+        if os.fstat(self._fd).st_size < _SLOT.size:
+            os.ftruncate(self._fd, _SLOT.size)
+        self._map = mmap.mmap(self._fd, _SLOT.size)
+        self._pid = os.getpid()
+
+    def __repr__(self):
+        return "<lastfm.util.SharedRateLimiter: %s>" % self._path
+
+import mmap
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_SLOT = struct.Struct('d')
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""Module for reading the rows of a web service response as it is parsed"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.util"
+
+class ResponseCursor(object):
+    """
+    A cursor over the rows of a web service response, parsed incrementally.
+    The attributes of the response element, like the number of pages, are
+    read as soon as the cursor is created, and the rows are handed out one
+    at a time as their closing tag is parsed. A row is cleared once the next
+    one is asked for, so the response is never held in memory as a tree,
+    and the first row is available before the rest of the response is parsed.
+    """
+    def __init__(self, xml, check):
+        """
+        Start parsing a response.
+
+        @param xml:      the response
+        @type xml:       L{str}
+        @param check:    function called with the response if its status is
+                         not ok, expected to raise the error of the response
+        @type check:     C{function}
+        """
+        self._events = ElementTree.iterparse(StringIO.StringIO(xml), ('start', 'end'))
+        self._element = None
+        self._done = False
+        depth = 0
+        for event, elem in self._events:
+            if event == 'end':
+                # a response without a response element
+                self._done = True
+                break
+            depth += 1
+            if depth == 1 and elem.get('status') != 'ok':
+                check(xml)
+            if depth == 2:
+                self._element = elem
+                break
+
+    @property
+    def tag(self):
+        """
+        tag of the response element
+        @rtype: L{str}
+        """
+        return self._element is not None and self._element.tag or None
+
+    @property
+    def attrib(self):
+        """
+        attributes of the response element
+        @rtype: L{dict}
+        """
+        return self._element is not None and self._element.attrib or {}
+
+    def get(self, key, default = None):
+        """
+        Get an attribute of the response element, like C{Element.get}.
+
+        @param key:        name of the attribute
+        @type key:         L{str}
+        @param default:    value if the attribute is missing
+        @type default:     L{str}
+
+        @return:           value of the attribute
+        @rtype:            L{str}
+        """
+        return self.attrib.get(key, default)
+
+    def rows(self, tag = None):
+        """
+        Iterate over the children of the response element. Can be called once.
+
+        @param tag:    only the children with this tag (optional)
+        @type tag:     L{str}
+
+        @return:       the children, each one valid until the next is read
+        @rtype:        C{generator} of C{xml.etree.ElementTree.Element}
+        """
+        if self._done or self._element is None:
+            return
+        self._done = True
+        depth = 0
+        for event, elem in self._events:
+            if event == 'start':
+                depth += 1
+                continue
+            if depth == 0:
+                # the end of the response element
+                break
+            depth -= 1
+            if depth == 0:
+                if tag is None or elem.tag == tag:
+                    yield elem
+                # the rows read are dropped from the response element too
+                del self._element[:]
+
+    def __iter__(self):
+        return self.rows()
+
+    def __repr__(self):
+        return "<lastfm.util.ResponseCursor: %s>" % self.tag
+
+import StringIO
+import sys
+
+if sys.version_info >= (2, 5):
+    import xml.etree.cElementTree as ElementTree
+else:
+    try:
+        import cElementTree as ElementTree
+    except ImportError:
+        try:
+            import ElementTree
+        except ImportError:
+            from lastfm.error import LastfmError
+            raise LastfmError("Install ElementTree package for using python-lastfm")
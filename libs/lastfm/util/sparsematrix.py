@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""Module for a compact labelled sparse matrix"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.util"
+
+from array import array
+from threading import Lock
+
+class SparseMatrix(object):
+    """
+    A sparse matrix with labelled rows and columns. Cells are appended in
+    coordinate (COO) form, kept in flat typed arrays, and compacted on demand
+    into compressed sparse row (CSR) form for reading. Appending the same
+    cell twice adds the values up.
+    """
+    def __init__(self, typecode = 'i'):
+        """
+        Create an empty matrix.
+
+        @param typecode:    the L{array} typecode of the cell values, 'i' for
+                            counts and 'd' for weights (optional)
+        @type typecode:     L{str}
+        """
+        self._typecode = typecode
+        self._rows = array('i')
+        self._cols = array('i')
+        self._values = array(typecode)
+        self._row_labels = []
+        self._row_index = {}
+        self._col_labels = []
+        self._col_index = {}
+        self._csr = None
+        self._lock = Lock()
+
+    @property
+    def shape(self):
+        """
+        number of rows and columns of the matrix
+        @rtype: L{tuple}
+        """
+        return (len(self._row_labels), len(self._col_labels))
+
+    @property
+    def nnz(self):
+        """
+        number of stored cells
+        @rtype: L{int}
+        """
+        return len(self.tocsr()[1])
+
+    @property
+    def row_labels(self):
+        """
+        labels of the rows, in row index order
+        @rtype: L{list}
+        """
+        return self._row_labels[:]
+
+    @property
+    def col_labels(self):
+        """
+        labels of the columns, in column index order
+        @rtype: L{list}
+        """
+        return self._col_labels[:]
+
+    def has_row(self, label):
+        return label in self._row_index
+
+    def has_col(self, label):
+        return label in self._col_index
+
+    def row_id(self, label):
+        """
+        Get the index of a row, adding the row if it is not present.
+
+        @param label:    the row label
+        @type label:     any hashable value
+
+        @return:         the row index
+        @rtype:          L{int}
+        """
+        try:
+            return self._row_index[label]
+        except KeyError:
+            self._row_index[label] = len(self._row_labels)
+            self._row_labels.append(label)
+            return self._row_index[label]
+
+    def col_id(self, label):
+        """
+        Get the index of a column, adding the column if it is not present.
+
+        @param label:    the column label
+        @type label:     any hashable value
+
+        @return:         the column index
+        @rtype:          L{int}
+        """
+        try:
+            return self._col_index[label]
+        except KeyError:
+            self._col_index[label] = len(self._col_labels)
+            self._col_labels.append(label)
+            return self._col_index[label]
+
+    def append(self, row, col, value):
+        """
+        Add a value to a cell.
+
+        @param row:      the row label
+        @type row:       any hashable value
+        @param col:      the column label
+        @type col:       any hashable value
+        @param value:    the value to add
+        @type value:     L{int} OR L{float}
+        """
+        with self._lock:
+            self._rows.append(self.row_id(row))
+            self._cols.append(self.col_id(col))
+            self._values.append(value)
+            self._csr = None
+
+    def append_column(self, col, cells):
+        """
+        Add a whole column at once.
+
+        @param col:      the column label
+        @type col:       any hashable value
+        @param cells:    (row label, value) pairs of the column
+        @type cells:     iterable of L{tuple}
+        """
+        with self._lock:
+            c = self.col_id(col)
+            for row, value in cells:
+                self._rows.append(self.row_id(row))
+                self._cols.append(c)
+                self._values.append(value)
+            self._csr = None
+
+    def clear_row(self, label):
+        """
+        Remove the cells of a row. The row keeps its index, so that it can be
+        appended to again.
+
+        @param label:    the row label
+        @type label:     any hashable value
+        """
+        with self._lock:
+            if label not in self._row_index:
+                return
+            r = self._row_index[label]
+            keep = [k for k in xrange(len(self._rows)) if self._rows[k] != r]
+            self._rows = array('i', (self._rows[k] for k in keep))
+            self._cols = array('i', (self._cols[k] for k in keep))
+            self._values = array(self._typecode, (self._values[k] for k in keep))
+            self._csr = None
+
+    def tocsr(self):
+        """
+        The matrix in compressed sparse row form. Cells of a row are sorted by
+        column index and duplicate cells are summed.
+
+        @return:    (indptr, indices, data) arrays. The cells of row i are
+                    at positions indptr[i] to indptr[i+1] of indices and data.
+        @rtype:     L{tuple} of L{array}
+        """
+        with self._lock:
+            if self._csr is None:
+                self._csr = self._build_csr()
+                self._compact()
+            return self._csr
+
+    def row(self, label):
+        """
+        Get the cells of a row.
+
+        @param label:    the row label
+        @type label:     any hashable value
+
+        @return:         column label to value mapping of the non-empty cells
+        @rtype:          L{dict}
+        """
+        if label not in self._row_index:
+            return {}
+        indptr, indices, data = self.tocsr()
+        r = self._row_index[label]
+        col_labels = self._col_labels
+        return dict((col_labels[indices[k]], data[k])
+                    for k in xrange(indptr[r], indptr[r+1]))
+
+    def column(self, label):
+        """
+        Get the cells of a column.
+
+        @param label:    the column label
+        @type label:     any hashable value
+
+        @return:         row label to value mapping of the non-empty cells
+        @rtype:          L{dict}
+        """
+        if label not in self._col_index:
+            return {}
+        indptr, indices, data = self.tocsr()
+        c = self._col_index[label]
+        row_labels = self._row_labels
+        cells = {}
+        for r in xrange(len(indptr) - 1):
+            for k in xrange(indptr[r], indptr[r+1]):
+                if indices[k] == c:
+                    cells[row_labels[r]] = data[k]
+                    break
+        return cells
+
+    def iterrows(self):
+        """
+        Iterate over the non-empty rows of the matrix.
+
+        @return:    (row label, column indices, values) for each row. The indices
+                    and values are slices of the CSR arrays.
+        @rtype:     iterator of L{tuple}
+        """
+        indptr, indices, data = self.tocsr()
+        for r in xrange(len(indptr) - 1):
+            start, end = indptr[r], indptr[r+1]
+            if start != end:
+                yield (self._row_labels[r], indices[start:end], data[start:end])
+
+    def save(self, fp):
+        """
+        Write the matrix to a file.
+
+        @param fp:    a file object opened for binary writing
+        @type fp:     C{file}
+        """
+        cPickle.dump(self.__getstate__(), fp, cPickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(fp):
+        """
+        Read a matrix written by L{save}.
+
+        @param fp:    a file object opened for binary reading
+        @type fp:     C{file}
+
+        @return:      the matrix
+        @rtype:       L{SparseMatrix}
+        """
+        m = SparseMatrix.__new__(SparseMatrix)
+        m.__setstate__(cPickle.load(fp))
+        return m
+
+    def _build_csr(self):
+        rows, cols, values = self._rows, self._cols, self._values
+        n_rows = len(self._row_labels)
+        order = sorted(xrange(len(rows)), key = lambda k: (rows[k], cols[k]))
+        indptr = array('i', [0] * (n_rows + 1))
+        indices = array('i')
+        data = array(self._typecode)
+        last = None
+        for k in order:
+            cell = (rows[k], cols[k])
+            if cell == last:
+                data[-1] += values[k]
+            else:
+                indices.append(cols[k])
+                data.append(values[k])
+                indptr[rows[k] + 1] += 1
+                last = cell
+        for r in xrange(n_rows):
+            indptr[r + 1] += indptr[r]
+        return (indptr, indices, data)
+
+    def _compact(self):
+        # rewrite the COO arrays from the CSR form, dropping duplicate cells,
+        # so that repeated appends and compactions keep the storage flat
+        indptr, indices, data = self._csr
+        rows = array('i')
+        for r in xrange(len(indptr) - 1):
+            rows.extend([r] * (indptr[r+1] - indptr[r]))
+        self._rows = rows
+        self._cols = array('i', indices)
+        self._values = array(self._typecode, data)
+
+    def __getstate__(self):
+        self.tocsr()
+        return {
+            'typecode': self._typecode,
+            'rows': self._rows.tostring(),
+            'cols': self._cols.tostring(),
+            'values': self._values.tostring(),
+            'row_labels': self._row_labels,
+            'col_labels': self._col_labels
+        }
+
+    def __setstate__(self, state):
+        self._typecode = state['typecode']
+        self._rows = array('i')
+        self._rows.fromstring(state['rows'])
+        self._cols = array('i')
+        self._cols.fromstring(state['cols'])
+        self._values = array(self._typecode)
+        self._values.fromstring(state['values'])
+        self._row_labels = list(state['row_labels'])
+        self._row_index = dict((l, i) for (i, l) in enumerate(self._row_labels))
+        self._col_labels = list(state['col_labels'])
+        self._col_index = dict((l, i) for (i, l) in enumerate(self._col_labels))
+        self._csr = None
+        self._lock = Lock()
+
+    def __repr__(self):
+        return "<lastfm.util.SparseMatrix: %sx%s>" % self.shape
+
+import cPickle
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Module for calling a function on many items over a few threads"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm.util"
+
+from collections import deque
+from threading import Lock, Thread
+
+def run_workers(func, items, workers = 4, errors = None):
+    """
+    Call a function on each item, over a few threads taking the items in
+    turn, and wait for all the calls to complete. An error raised by a call
+    is logged and collected, and the other calls go on.
+
+    @param func:       function called with each item
+    @type func:        C{function}
+    @param items:      the items
+    @type items:       L{list}
+    @param workers:    number of calls made concurrently (optional)
+    @type workers:     L{int}
+    @param errors:     exception classes collected, L{LastfmError} and
+                       L{IOError} if not given (optional)
+    @type errors:      L{tuple}
+
+    @return:           the items whose call failed, and the errors
+    @rtype:            L{list} of (item, L{Exception})
+    """
+    if errors is None:
+        errors = (LastfmError, IOError)
+    pending = deque(items)
+    failures = []
+    lock = Lock()
+    def work():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                item = pending.popleft()
+            try:
+                func(item)
+            except errors, e:
+                logging.log_silenced_exceptions(e)
+                with lock:
+                    failures.append((item, e))
+
+    threads = [Thread(target = work) for i in xrange(min(workers, len(pending)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return failures
+
+from lastfm.error import LastfmError
+from lastfm.util import logging
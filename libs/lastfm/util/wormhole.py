@@ -6,84 +6,190 @@ __license__ = "GNU Lesser General Public License"
 __package__ = "lastfm.util"
 
 from collections import defaultdict
-from decorator import decorator
-from threading import Lock
+from functools import wraps
+from threading import Lock, local
+import sys
+import time
 
 _lock = Lock()
+_timing = local()
+
+# topics which have at least one exit while the wormhole is enabled. This is
+# the only thing an entrance looks at when it is called, so that entrances
+# cost a single dict lookup while nobody is listening.
+_live = {}
 
 class Wormhole(object):
     _entrances = defaultdict(set)
     _exits = defaultdict(set)
+    # exits run even while the wormhole is disabled
+    _always = set()
     _enabled = False
-    
+
     @staticmethod
     def disable():
         with _lock:
             Wormhole._enabled = False
-        
+            Wormhole._update_live()
+
     @staticmethod
     def enable():
         with _lock:
             Wormhole._enabled = True
-    
+            Wormhole._update_live()
+
     @staticmethod
     def add_entrance(topic, entrance):
         wrapped = Wormhole.entrance(topic)(entrance)
         wrapped._orginal = entrance
         return wrapped
-    
+
     @staticmethod
-    def add_exit(topic, exit):
-        Wormhole._exits[topic].add(exit)
-    
+    def add_exit(topic, exit, always = False):
+        """
+        Add an exit to a topic.
+
+        @param topic:     the topic
+        @type topic:      L{str}
+        @param exit:      function called with the return value and the
+                          arguments of the entrances of the topic
+        @type exit:       C{function}
+        @param always:    run the exit even while the wormhole is disabled,
+                          without enabling the other exits (optional)
+        @type always:     L{bool}
+        """
+        with _lock:
+            Wormhole._exits[topic].add(exit)
+            if always:
+                Wormhole._always.add(exit)
+            Wormhole._update_live()
+
     @staticmethod
     def remove_entrance(topic, entrance):
         entrance = entrance._orginal
-        if topic in Wormhole._entrances:
-            if entrance in Wormhole._entrances[topic]:
-                Wormhole._entrances[topic].remove(entrance)
+        with _lock:
+            if topic in Wormhole._entrances:
+                if entrance in Wormhole._entrances[topic]:
+                    Wormhole._entrances[topic].remove(entrance)
         return entrance
-    
+
     @staticmethod
     def remove_exit(topic, exit):
-        if topic in Wormhole._exits:
-            if exit in Wormhole._exits[topic]:
-                Wormhole._exits[topic].remove(exit)
-    
+        with _lock:
+            if topic in Wormhole._exits:
+                if exit in Wormhole._exits[topic]:
+                    Wormhole._exits[topic].remove(exit)
+            Wormhole._always.discard(exit)
+            Wormhole._update_live()
+
     @classmethod
     def entrance(cls, topic):
-        @decorator
-        def wrapper(func, *args, **kwargs):
-            Wormhole._entrances[topic].add(func)
-            retval = func(*args, **kwargs)
-            if topic in Wormhole._exits:
-                if Wormhole._enabled:
-                    if func in Wormhole._entrances[topic]:
-                        cls._jump(topic, retval, *args, **kwargs)
-            return retval
-        return wrapper
-    
+        def decorator(func):
+            with _lock:
+                Wormhole._entrances[topic].add(func)
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if topic not in _live:
+                    return func(*args, **kwargs)
+                start = time.time()
+                retval = func(*args, **kwargs)
+                if func in Wormhole._entrances[topic]:
+                    _timing.elapsed = time.time() - start
+                    cls._jump(topic, retval, *args, **kwargs)
+                return retval
+            return wrapper
+        return decorator
+
     @staticmethod
     def exit(topic):
         def wrapper(func):
-            Wormhole._exits[topic].add(func)
+            Wormhole.add_exit(topic, func)
             return func
         return wrapper
-    
+
+    @staticmethod
+    def elapsed():
+        """
+        Time taken by the entrance call whose exits are being run, in seconds.
+        Only meaningful inside an exit.
+
+        @rtype: L{float}
+        """
+        return getattr(_timing, 'elapsed', None)
+
+    @staticmethod
+    def _update_live():
+        # called with the lock held
+        _live.clear()
+        for topic, exits in Wormhole._exits.items():
+            if exits and (Wormhole._enabled or exits & Wormhole._always):
+                _live[topic] = True
+
+    @staticmethod
+    def _running(topic):
+        # the exits of a topic to run
+        if Wormhole._enabled:
+            return list(Wormhole._exits[topic])
+        return [f for f in Wormhole._exits[topic] if f in Wormhole._always]
+
     @staticmethod
     def _jump(topic, retval, *args, **kwargs):
         exceptions = []
-        for f in Wormhole._exits[topic]:
+        for f in Wormhole._running(topic):
             try:
                 f(retval, *args, **kwargs)
             except Exception as e:
                 exceptions.append(e)
         for e in exceptions:
             raise e
-        
+
 class ThreadedWormhole(Wormhole):
+    """
+    A wormhole which runs the exits in a background thread. The events are
+    queued and the exits are run one after the other by a single dispatcher
+    thread, so a burst of events does not start a burst of threads.
+    """
+    _dispatcher = None
+
+    @staticmethod
+    def configure(maxsize = 10000, policy = 'block', batch_size = 500):
+        """
+        Set up the queue the events are dispatched through. Events queued
+        with the previous settings are dispatched first.
+
+        @param maxsize:       maximum number of events waiting for the exits (optional)
+        @type maxsize:        L{int}
+        @param policy:        'drop' to discard the events raised while the queue is
+                              full, 'block' to wait for room (optional)
+        @type policy:         L{str}
+        @param batch_size:    maximum number of events taken off the queue at once (optional)
+        @type batch_size:     L{int}
+        """
+        old = ThreadedWormhole._dispatcher
+        ThreadedWormhole._dispatcher = Dispatcher(ThreadedWormhole._run_exits,
+            maxsize, policy, batch_size, 'lastfm-wormhole')
+        if old is not None:
+            old.stop()
+
+    @staticmethod
+    def flush():
+        """Wait until the exits have been run for the events raised so far."""
+        ThreadedWormhole._dispatcher.flush()
+
     @staticmethod
     def _jump(topic, retval, *args, **kwargs):
-        import threading
-        for f in Wormhole._exits[topic]:
-            threading.Thread(target = lambda: f(retval, *args, **kwargs)).start()
\ No newline at end of file
+        ThreadedWormhole._dispatcher.submit(
+            (Wormhole._running(topic), Wormhole.elapsed(), retval, args, kwargs))
+
+    @staticmethod
+    def _run_exits(events):
+        for exits, elapsed, retval, args, kwargs in events:
+            _timing.elapsed = elapsed
+            for f in exits:
+                try:
+                    f(retval, *args, **kwargs)
+                except Exception as e:
+                    sys.stderr.write("error in wormhole exit %s: %s\n" % (f.__name__, e))
+
+from lastfm.util.dispatcher import Dispatcher
+ThreadedWormhole.configure()
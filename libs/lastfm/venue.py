@@ -40,11 +40,11 @@ class Venue(LastfmBase):
         if page is not None:
             params.update({'page': page})
 
-        data = self._api._fetch_data(params).find('events')
+        data = self._api._fetch_data(params, stream = True)
         total_pages = int(data.attrib['totalPages'])
         yield total_pages
 
-        for e in data.findall('event'):
+        for e in data.rows('event'):
             yield Event.create_from_data(self._api, e)
 
     @cached_property
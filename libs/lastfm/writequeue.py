@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+"""Module for queueing and batching last.fm write operations"""
+
+__author__ = "Abhinav Sarkar <abhinav@abhinavsarkar.net>"
+__version__ = "0.2"
+__license__ = "GNU Lesser General Public License"
+__package__ = "lastfm"
+
+from threading import Event, Lock, Thread
+
+class WriteResult(object):
+    """The outcome of a write operation sent by a L{WriteQueue}"""
+    def __init__(self, item, method, params, error = None, attempts = 1):
+        self._item = item
+        self._method = method
+        self._params = params
+        self._error = error
+        self._attempts = attempts
+
+    @property
+    def item(self):
+        """
+        the item written to
+        @rtype: L{LastfmBase}
+        """
+        return self._item
+
+    @property
+    def method(self):
+        """
+        the web service method called
+        @rtype: L{str}
+        """
+        return self._method
+
+    @property
+    def params(self):
+        """
+        the parameters of the call
+        @rtype: L{dict}
+        """
+        return self._params
+
+    @property
+    def error(self):
+        """
+        the error of the last attempt, None if the write succeeded
+        @rtype: L{Exception}
+        """
+        return self._error
+
+    @property
+    def attempts(self):
+        """
+        number of times the call was made
+        @rtype: L{int}
+        """
+        return self._attempts
+
+    @property
+    def succeeded(self):
+        return self._error is None
+
+    def __repr__(self):
+        return "<lastfm.WriteResult: %s on %r %s>" % (self._method, self._item,
+            self._error is None and "succeeded" or "failed: %s" % self._error)
+
+class WriteQueue(object):
+    """
+    A write-behind queue for the last.fm write operations. The writes are only
+    recorded when requested, coalesced per item, and sent to last.fm when the
+    queue is flushed, either explicitly or periodically by a background thread.
+
+    Coalescing means that tags added to an item are sent together, ten to a
+    call, that only the last of the additions and removals of a tag before the
+    flush is sent, and that repeating a write before the flush sends it once.
+    The writes of an item are sent in order by one worker, the items are spread
+    over several workers. The requests still go through the rate limiting of
+    the L{Api}. Failures with a transient cause are retried with exponential
+    backoff, and the result of every write is reported.
+    """
+    TAGS_PER_CALL = 10
+    """Maximum number of tags added by one addTags call"""
+
+    def __init__(self, api, workers = 2, retries = 3, backoff = 1.0, callback = None):
+        """
+        Create a write queue.
+
+        @param api:         an instance of L{Api}, with a session key
+        @type api:          L{Api}
+        @param workers:     number of writes sent concurrently (optional)
+        @type workers:      L{int}
+        @param retries:     number of retries of a write failing with a transient
+                            error (optional)
+        @type retries:      L{int}
+        @param backoff:     wait before the first retry, in seconds. It doubles
+                            with each retry. (optional)
+        @type backoff:      L{float}
+        @param callback:    function called with the L{WriteResult} of each write,
+                            from the worker thread which sent it (optional)
+        @type callback:     C{function}
+        """
+        self._api = api
+        self._workers = workers
+        self._retries = retries
+        self._backoff = backoff
+        self._callback = callback
+        self._pending = {}
+        self._order = []
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._thread = None
+        self._stopped = Event()
+
+    @property
+    def pending(self):
+        """
+        number of writes waiting for the next flush
+        @rtype: L{int}
+        """
+        with self._lock:
+            return sum(len(p['add']) + len(p['remove']) + len(p['calls'])
+                       for p in self._pending.values())
+
+    def add_tags(self, item, tags):
+        """
+        Queue tags to be added to an album, artist, event or track.
+
+        @param item:    the item to tag
+        @type item:     L{Album} OR L{Artist} OR L{Event} OR L{Track}
+        @param tags:    the tags
+        @type tags:     L{list} of L{Tag} OR L{list} of L{str}
+        """
+        with self._lock:
+            pending = self._pending_for(item)
+            for tag in tags:
+                tag = _tag_name(tag)
+                if tag in pending['remove']:
+                    pending['remove'].remove(tag)
+                if tag not in pending['add']:
+                    pending['add'].append(tag)
+
+    def remove_tag(self, item, tag):
+        """
+        Queue a tag to be removed from an album, artist, event or track.
+
+        @param item:    the tagged item
+        @type item:     L{Album} OR L{Artist} OR L{Event} OR L{Track}
+        @param tag:     the tag
+        @type tag:      L{Tag} OR L{str}
+        """
+        tag = _tag_name(tag)
+        with self._lock:
+            pending = self._pending_for(item)
+            if tag in pending['add']:
+                pending['add'].remove(tag)
+            if tag not in pending['remove']:
+                pending['remove'].append(tag)
+
+    def love(self, track):
+        """
+        Queue a track to be loved.
+
+        @param track:    the track
+        @type track:     L{Track}
+        """
+        self._add_call(track, 'track.love', track._default_params({'method': 'track.love'}))
+
+    def ban(self, track):
+        """
+        Queue a track to be banned.
+
+        @param track:    the track
+        @type track:     L{Track}
+        """
+        self._add_call(track, 'track.ban', track._default_params({'method': 'track.ban'}))
+
+    def add_to_playlist(self, playlist, track):
+        """
+        Queue a track to be added to a playlist of the authenticated user.
+
+        @param playlist:    the playlist
+        @type playlist:     L{User.Playlist}
+        @param track:       the track
+        @type track:        L{Track}
+        """
+        self._add_call(playlist, 'playlist.addTrack',
+                       {'method': 'playlist.addTrack', 'playlistID': playlist.id,
+                        'artist': track.artist.name, 'track': track.name})
+
+    def add_to_library(self, library, item):
+        """
+        Queue an album, artist or track to be added to the library of the
+        authenticated user.
+
+        @param library:    the library
+        @type library:     L{User.Library}
+        @param item:       the item to add
+        @type item:        L{Album} OR L{Artist} OR L{Track}
+
+        @raise InvalidParametersError: The item is not an album, artist or track.
+        """
+        if isinstance(item, Artist):
+            params = {'method': 'library.addArtist', 'artist': item.name}
+        elif isinstance(item, Album):
+            params = {'method': 'library.addAlbum',
+                      'artist': item.artist.name, 'album': item.name}
+        elif isinstance(item, Track):
+            params = {'method': 'library.addTrack',
+                      'artist': item.artist.name, 'track': item.name}
+        else:
+            raise InvalidParametersError("only albums, artists and tracks can be added to a library")
+        self._add_call(library, params['method'], params)
+
+    def flush(self):
+        """
+        Send the queued writes and wait for them to complete.
+
+        @return:    the results of the writes sent
+        @rtype:     L{list} of L{WriteResult}
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending = [self._pending.pop(k) for k in self._order]
+                self._order = []
+            units = [u for u in (self._requests(p) for p in pending) if u]
+            if not units:
+                return []
+
+            results = []
+            def send(unit):
+                for request in unit:
+                    result = self._send(*request)
+                    results.append(result)
+                    if self._callback is not None:
+                        self._callback(result)
+            # the errors of the writes are in their results
+            run_workers(send, units, self._workers, ())
+            return results
+
+    def start(self, interval = 5):
+        """
+        Start a background thread flushing the queue periodically.
+
+        @param interval:    time between two flushes, in seconds (optional)
+        @type interval:     L{float}
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        def run():
+            while not self._stopped.is_set():
+                self._stopped.wait(interval)
+                self.flush()
+        self._thread = Thread(target = run, name = 'lastfm-write-queue')
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, after a last flush."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _pending_for(self, item):
+        # called with the lock held
+        key = (item.__class__.__name__, hash(item))
+        if key not in self._pending:
+            self._pending[key] = {'item': item, 'add': [], 'remove': [], 'calls': []}
+            self._order.append(key)
+        return self._pending[key]
+
+    def _add_call(self, item, method, params):
+        with self._lock:
+            calls = self._pending_for(item)['calls']
+            if (method, params) not in calls:
+                calls.append((method, params))
+
+    def _requests(self, pending):
+        item = pending['item']
+        name = item.__class__.__name__.lower()
+        requests = []
+        tags = pending['add']
+        for i in xrange(0, len(tags), WriteQueue.TAGS_PER_CALL):
+            method = '%s.addTags' % name
+            requests.append((item, method, item._default_params(
+                {'method': method, 'tags': ",".join(tags[i:i + WriteQueue.TAGS_PER_CALL])})))
+        for tag in pending['remove']:
+            method = '%s.removeTag' % name
+            requests.append((item, method, item._default_params({'method': method, 'tag': tag})))
+        for method, params in pending['calls']:
+            requests.append((item, method, params))
+        return requests
+
+    def _send(self, item, method, params):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self._api._post_data(dict(params))
+            except Exception, e:
+                if attempt > self._retries or not _is_transient(e):
+                    return WriteResult(item, method, params, e, attempt)
+                time.sleep(self._backoff * 2 ** (attempt - 1))
+                continue
+            _invalidate(item, method)
+            return WriteResult(item, method, params, None, attempt)
+
+    def __repr__(self):
+        return "<lastfm.WriteQueue: %s pending write(s)>" % self.pending
+
+def _tag_name(tag):
+    if isinstance(tag, Tag):
+        tag = tag.name
+    return tag.lower()
+
+def _is_transient(error):
+    return isinstance(error, (OperationFailedError, ServiceOfflineError, IOError))
+
+def _invalidate(item, method):
+    # drop the cached data made stale by a write, as the entity methods do
+    if method.endswith('.addTags') or method.endswith('.removeTag'):
+        item._tags = None
+    elif method == 'playlist.addTrack':
+        item._raw = None
+    elif method.startswith('library.add'):
+        setattr(item, "_%ss" % method[len('library.add'):].lower(), None)
+
+import time
+
+from lastfm.album import Album
+from lastfm.artist import Artist
+from lastfm.error import InvalidParametersError, OperationFailedError, ServiceOfflineError
+from lastfm.tag import Tag
+from lastfm.track import Track
+from lastfm.util import run_workers
@@ -16,6 +16,8 @@ from tweepy.cache import Cache, MemoryCache, FileCache
 from tweepy.auth import BasicAuthHandler, OAuthHandler
 from tweepy.streaming import Stream, StreamListener
 from tweepy.cursor import Cursor
+from tweepy.pool import ConnectionPool
+from tweepy.scheduler import RateLimitScheduler
 
 # Global, unauthenticated instance of API
 api = API()
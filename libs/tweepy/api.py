@@ -8,6 +8,8 @@ import mimetypes
 from tweepy.binder import bind_api
 from tweepy.error import TweepError
 from tweepy.parsers import *
+from tweepy.pool import ConnectionPool
+from tweepy.scheduler import RateLimitScheduler
 
 
 class API(object):
@@ -16,7 +18,8 @@ class API(object):
     def __init__(self, auth_handler=None,
             host='api.twitter.com', search_host='search.twitter.com',
              cache=None, secure=False, api_root='/1', search_root='',
-            retry_count=0, retry_delay=0, retry_errors=None):
+            retry_count=0, retry_delay=0, retry_errors=None,
+            connection_pool=None, scheduler=None):
         # you may access these freely
         self.auth = auth_handler
         self.host = host
@@ -28,6 +31,8 @@ class API(object):
         self.retry_count = retry_count
         self.retry_delay = retry_delay
         self.retry_errors = retry_errors
+        self.connection_pool = connection_pool or ConnectionPool()
+        self.scheduler = scheduler or RateLimitScheduler()
 
     """ statuses/public_timeline """
     public_timeline = bind_api(
@@ -2,7 +2,6 @@
 # Copyright 2009 Joshua Roesslein
 # See LICENSE
 
-import httplib
 import urllib
 import time
 
@@ -37,6 +36,9 @@ def bind_api(path, parser, allowed_param=[], method='GET', require_auth=False,
         retry_delay = kargs.pop('retry_delay', api.retry_delay)
         retry_errors = kargs.pop('retry_errors', api.retry_errors)
 
+        # check for scheduling priority
+        priority = kargs.pop('priority', api.scheduler.INTERACTIVE)
+
         # check for headers
         headers = kargs.pop('headers', {})
 
@@ -96,19 +98,17 @@ def bind_api(path, parser, allowed_param=[], method='GET', require_auth=False,
             scheme = 'http://'
         if search_api is False:
             host = api.host
+            bucket = 'rest'
         else:
             host = api.search_host
+            bucket = 'search'
 
         # Continue attempting request until successful
         # or maximum number of retries is reached.
         retries_performed = 0
         while retries_performed < retry_count + 1:
-            # Open connection
-            # FIXME: add timeout
-            if api.secure:
-                conn = httplib.HTTPSConnection(host)
-            else:
-                conn = httplib.HTTPConnection(host)
+            # Wait for the rate limit to allow the call
+            api.scheduler.acquire(bucket, priority)
 
             # Apply authentication
             if api.auth:
@@ -117,14 +117,23 @@ def bind_api(path, parser, allowed_param=[], method='GET', require_auth=False,
                         method, headers, parameters
                 )
 
-            # Build request
+            # Send request on a kept-alive connection of the pool
             try:
-                conn.request(method, url, headers=headers, body=post_data)
+                conn, resp = api.connection_pool.request(
+                        host, api.secure, method, url,
+                        headers=headers, body=post_data
+                )
             except Exception, e:
                 raise TweepError('Failed to send request: %s' % e)
 
-            # Get response
-            resp = conn.getresponse()
+            # Read the whole response so the connection can be reused
+            try:
+                body = resp.read()
+            except Exception, e:
+                api.connection_pool.discard(conn)
+                raise TweepError('Failed to read response: %s' % e)
+            api.connection_pool.release(conn)
+            api.scheduler.update(bucket, resp)
 
             # Exit request loop if non-retry error code
             if retry_errors is None:
@@ -132,22 +141,27 @@ def bind_api(path, parser, allowed_param=[], method='GET', require_auth=False,
             else:
                 if resp.status not in retry_errors: break
 
-            # Sleep before retrying request again
-            time.sleep(retry_delay)
+            # No retry is left, raise the error without waiting
+            if retries_performed == retry_count: break
+
+            # Hold off before retrying request again, backing off
+            # exponentially on server errors and 420
+            time.sleep(api.scheduler.backoff(
+                    bucket, resp, retries_performed, retry_delay))
             retries_performed += 1
 
         # If an error was returned, throw an exception
         api.last_response = resp
         if resp.status != 200:
             try:
-                error_msg = parse_error(json.loads(resp.read()))
+                error_msg = parse_error(json.loads(body))
             except Exception:
                 error_msg = "Twitter error response: status code = %s" % resp.status
             raise TweepError(error_msg)
 
         # Parse json respone body
         try:
-            jobject = json.loads(resp.read())
+            jobject = json.loads(body)
         except Exception, e:
             raise TweepError("Failed to parse json: %s" % e)
 
@@ -168,8 +182,6 @@ def bind_api(path, parser, allowed_param=[], method='GET', require_auth=False,
         except Exception, e:
             raise TweepError("Failed to parse response: %s" % e)
 
-        conn.close()
-
         # store result in cache
         if api.cache and method == 'GET':
             api.cache.store(url, out)
@@ -2,6 +2,10 @@
 # Copyright 2009 Joshua Roesslein
 # See LICENSE
 
+import Queue
+import sys
+import threading
+
 from tweepy.error import TweepError
 
 class Cursor(object):
@@ -16,15 +20,24 @@ class Cursor(object):
         else:
             raise TweepError('This method does not perform pagination')
 
-    def pages(self, limit=0):
-        """Return iterator for pages"""
+    def pages(self, limit=0, prefetch=0):
+        """Return iterator for pages
+            prefetch: number of pages fetched ahead in a background thread
+        """
         if limit > 0:
             self.iterator.limit = limit
+        if prefetch > 0:
+            return PrefetchIterator(self.iterator, prefetch)
         return self.iterator
 
-    def items(self, limit=0):
-        """Return iterator for items in each page"""
-        i = ItemIterator(self.iterator)
+    def items(self, limit=0, prefetch=0):
+        """Return iterator for items in each page
+            prefetch: number of pages fetched ahead in a background thread
+        """
+        if prefetch > 0:
+            i = ItemIterator(PrefetchIterator(self.iterator, prefetch))
+        else:
+            i = ItemIterator(self.iterator)
         i.limit = limit
         return i
 
@@ -42,6 +55,9 @@ class BaseIterator(object):
     def prev(self):
         raise NotImplementedError
 
+    def close(self):
+        pass
+
     def __iter__(self):
         return self
 
@@ -103,6 +119,8 @@ class ItemIterator(BaseIterator):
 
     def next(self):
         if self.limit > 0 and self.count == self.limit:
+            # stop the pages being fetched ahead
+            self.page_iterator.close()
             raise StopIteration
         if self.current_page is None or self.page_index == len(self.current_page) - 1:
             # Reached end of current page, get the next page...
@@ -125,3 +143,73 @@ class ItemIterator(BaseIterator):
         self.count -= 1
         return self.current_page[self.page_index]
 
+    def close(self):
+        self.page_iterator.close()
+
+class PrefetchIterator(BaseIterator):
+    """Fetches the pages of a page iterator ahead in a background thread
+
+    At most `prefetch` pages wait in the buffer, so the thread blocks when
+    the consumer falls behind. It stops once the iterator is closed or
+    garbage collected, when iteration ends early.
+    """
+
+    def __init__(self, page_iterator, prefetch):
+        self.page_iterator = page_iterator
+        self.queue = Queue.Queue(prefetch)
+        self.stopped = threading.Event()
+        self.thread = None
+        self.done = False
+
+    def next(self):
+        if self.done:
+            raise StopIteration
+        if self.thread is None:
+            # the thread must not refer to this iterator, or it would
+            # never be garbage collected
+            self.thread = threading.Thread(target=_prefetch,
+                    args=(self.page_iterator, self.queue, self.stopped))
+            self.thread.setDaemon(True)
+            self.thread.start()
+        page, error = self.queue.get()
+        if page is None:
+            self.done = True
+            if error is None:
+                raise StopIteration
+            # re-raise with the traceback of the prefetching thread
+            raise error[0], error[1], error[2]
+        return page
+
+    def prev(self):
+        raise TweepError('Can not page back when prefetching')
+
+    def close(self):
+        self.done = True
+        self.stopped.set()
+        # unblock the thread if it is waiting for room in the buffer
+        try:
+            while True:
+                self.queue.get_nowait()
+        except Queue.Empty:
+            pass
+
+    def __del__(self):
+        self.close()
+
+def _prefetch(page_iterator, queue, stopped):
+    while not stopped.isSet():
+        try:
+            item = (page_iterator.next(), None)
+        except StopIteration:
+            item = (None, None)
+        except Exception:
+            item = (None, sys.exc_info())
+        while not stopped.isSet():
+            try:
+                queue.put(item, timeout=0.1)
+                break
+            except Queue.Full:
+                continue
+        if item[0] is None:
+            return
+
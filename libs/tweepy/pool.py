@@ -0,0 +1,138 @@
+# Tweepy
+# Copyright 2009 Joshua Roesslein
+# See LICENSE
+
+import httplib
+import select
+import socket
+import threading
+import time
+
+
+class ConnectionPool(object):
+    """Pool of keep-alive HTTP connections, per scheme and host"""
+
+    def __init__(self, maxsize=4, idle_timeout=60, timeout=None):
+        """Initialize the pool
+            maxsize: most connections open at once to a host
+            idle_timeout: seconds after which an unused connection is closed
+            timeout: socket timeout of the connections [optional]
+        """
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = {}
+        self._open = {}
+        self._cond = threading.Condition()
+
+    def get(self, host, secure=False):
+        """Get a connection to a host, reusing an idle one if possible.
+        Blocks while maxsize connections to the host are in use.
+        """
+        key = (secure, host)
+        self._cond.acquire()
+        try:
+            while True:
+                self._evict(key)
+                idle = self._idle.get(key)
+                while idle:
+                    conn = idle.pop()[1]
+                    if self._usable(conn):
+                        return conn
+                    self._close(key, conn)
+                if self._open.get(key, 0) < self.maxsize:
+                    self._open[key] = self._open.get(key, 0) + 1
+                    break
+                self._cond.wait()
+        finally:
+            self._cond.release()
+
+        if secure:
+            conn_class = httplib.HTTPSConnection
+        else:
+            conn_class = httplib.HTTPConnection
+        if self.timeout is None:
+            conn = conn_class(host)
+        else:
+            conn = conn_class(host, timeout=self.timeout)
+        conn._pool_key = key
+        return conn
+
+    def release(self, conn):
+        """Return a connection whose response has been read to the pool.
+        Connections the server asked to close are dropped.
+        """
+        self._cond.acquire()
+        try:
+            if conn.sock is None:
+                self._close(conn._pool_key, conn)
+            else:
+                self._idle.setdefault(conn._pool_key, []).append((time.time(), conn))
+                self._cond.notifyAll()
+        finally:
+            self._cond.release()
+
+    def discard(self, conn):
+        """Close a connection in an unknown state instead of returning it"""
+        self._cond.acquire()
+        try:
+            self._close(conn._pool_key, conn)
+        finally:
+            self._cond.release()
+
+    def request(self, host, secure, method, url, body=None, headers={}):
+        """Send a request on a pooled connection.
+        Returns the connection and its response; release the connection
+        once the response is read. A request failing on a reused connection,
+        closed by the server while idle, is sent again on another one.
+        """
+        while True:
+            conn = self.get(host, secure)
+            reused = conn.sock is not None
+            sent = False
+            try:
+                conn.request(method, url, headers=headers, body=body)
+                sent = True
+                return conn, conn.getresponse()
+            except (httplib.HTTPException, socket.error):
+                self.discard(conn)
+                # only retry when the request can not have been processed
+                if not reused or (sent and method != 'GET'):
+                    raise
+
+    def clear(self):
+        """Close all the idle connections"""
+        self._cond.acquire()
+        try:
+            for key, idle in self._idle.items():
+                for since, conn in idle:
+                    self._close(key, conn)
+            self._idle.clear()
+        finally:
+            self._cond.release()
+
+    def count(self):
+        """Get count of connections currently open"""
+        return sum(self._open.values())
+
+    def _evict(self, key):
+        # close the connections idle for too long, the oldest being first
+        idle = self._idle.get(key)
+        now = time.time()
+        while idle and now - idle[0][0] >= self.idle_timeout:
+            self._close(key, idle.pop(0)[1])
+
+    def _usable(self, conn):
+        # an idle socket with data to read was closed by the server,
+        # or is out of sync with it
+        try:
+            readable = select.select([conn.sock], [], [], 0)[0]
+        except (select.error, socket.error, ValueError):
+            return False
+        return not readable
+
+    def _close(self, key, conn):
+        conn.close()
+        self._open[key] = self._open.get(key, 1) - 1
+        self._cond.notifyAll()
+
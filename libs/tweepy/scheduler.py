@@ -0,0 +1,172 @@
+# Tweepy
+# Copyright 2009 Joshua Roesslein
+# See LICENSE
+
+import random
+import threading
+import time
+
+
+class RateLimitScheduler(object):
+    """Schedules API calls within the rate limit
+
+    The remaining calls and the reset time are read from the rate limit
+    headers of every response, or from rate_limit_status. Interactive calls
+    go out at once while there are calls left. Background calls leave the
+    last `reserve` calls to the interactive ones, wait while interactive
+    calls are waiting, and are spread evenly over what is left of the window,
+    so bulk jobs use the whole budget without running out of it.
+    """
+
+    INTERACTIVE = 'interactive'
+    BACKGROUND = 'background'
+
+    # responses retried after an exponential backoff
+    backoff_errors = (420, 500, 502, 503, 504)
+
+    def __init__(self, reserve=10, backoff_base=1.0, backoff_max=300):
+        """Initialize the scheduler
+            reserve: number of calls of the window kept for interactive calls
+            backoff_base: delay before the first retry after a server error, in seconds
+            backoff_max: longest delay before a retry, in seconds
+        """
+        self.reserve = reserve
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._quotas = {}
+        self._cond = threading.Condition()
+
+    def acquire(self, bucket='rest', priority=INTERACTIVE):
+        """Wait until a call can be made and count it
+            bucket: the rate limit the call counts against
+            priority: INTERACTIVE or BACKGROUND
+        """
+        interactive = priority != RateLimitScheduler.BACKGROUND
+        self._cond.acquire()
+        try:
+            quota = self._quota(bucket)
+            if interactive:
+                quota.waiting += 1
+            try:
+                while True:
+                    delay = self._delay(quota, interactive, time.time())
+                    if delay is not None and delay <= 0:
+                        break
+                    self._cond.wait(delay)
+            finally:
+                if interactive:
+                    quota.waiting -= 1
+                    self._cond.notifyAll()
+            quota.take(interactive, time.time())
+        finally:
+            self._cond.release()
+
+    def update(self, bucket, resp):
+        """Read the rate limit headers of a response"""
+        remaining = resp.getheader('x-ratelimit-remaining')
+        reset = resp.getheader('x-ratelimit-reset')
+        if remaining is None or reset is None:
+            return
+        limit = resp.getheader('x-ratelimit-limit')
+        try:
+            self._set(bucket, limit and int(limit), int(remaining), int(reset))
+        except ValueError:
+            pass
+
+    def update_status(self, status, bucket='rest'):
+        """Read the result of API.rate_limit_status"""
+        self._set(bucket, status.get('hourly_limit'), status['remaining_hits'],
+                  status['reset_time_in_seconds'])
+
+    def sync(self, api):
+        """Fetch the rate limit status of an API"""
+        self.update_status(api.rate_limit_status())
+
+    def backoff(self, bucket, resp, attempt, min_delay=0):
+        """Get the delay before retrying after an error response.
+        On server errors and 420 it is the Retry-After header if given, or
+        an exponential delay with jitter, and all the calls of the bucket
+        are held off meanwhile.
+        """
+        if resp.status not in RateLimitScheduler.backoff_errors:
+            return min_delay
+        delay = None
+        retry_after = resp.getheader('retry-after')
+        if retry_after:
+            try:
+                delay = int(retry_after)
+            except ValueError:
+                pass
+        if delay is None:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+            delay *= random.uniform(0.5, 1.0)
+        delay = max(delay, min_delay)
+        self._cond.acquire()
+        try:
+            quota = self._quota(bucket)
+            quota.blocked_until = max(quota.blocked_until, time.time() + delay)
+        finally:
+            self._cond.release()
+        return delay
+
+    def remaining(self, bucket='rest'):
+        """Get the number of calls left in the window, None if unknown"""
+        return self._quota(bucket).remaining
+
+    def _quota(self, bucket):
+        try:
+            return self._quotas[bucket]
+        except KeyError:
+            return self._quotas.setdefault(bucket, _Quota())
+
+    def _set(self, bucket, limit, remaining, reset):
+        self._cond.acquire()
+        try:
+            quota = self._quota(bucket)
+            if limit:
+                quota.limit = limit
+            quota.remaining = remaining
+            quota.reset = reset
+            self._cond.notifyAll()
+        finally:
+            self._cond.release()
+
+    def _delay(self, quota, interactive, now):
+        # seconds to wait before the call, None to wait for a notification
+        if now < quota.blocked_until:
+            return quota.blocked_until - now
+        if quota.reset is not None and now >= quota.reset:
+            # a new window, its quota is known from the next response
+            quota.remaining = quota.limit
+            quota.reset = None
+        if interactive:
+            if quota.remaining is None or quota.remaining > 0:
+                return 0
+            return quota.reset is not None and quota.reset - now or 0
+        if quota.waiting:
+            return None
+        if quota.remaining is None or quota.reset is None:
+            return 0
+        usable = quota.remaining - self.reserve
+        if usable <= 0:
+            return quota.reset - now
+        # spread the calls left over the rest of the window
+        return quota.last_background + (quota.reset - now) / float(usable) - now
+
+
+class _Quota(object):
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.blocked_until = 0
+        self.last_background = 0
+        self.waiting = 0
+
+    def take(self, interactive, now):
+        if self.remaining is not None:
+            self.remaining -= 1
+        if not interactive:
+            self.last_background = now
+